@@ -0,0 +1,299 @@
+"""
+Reproducible benchmark of the upload pipeline on synthetic datasets.
+
+Datasets are generated from a seed with a given number of rows and a mix of column kinds
+(numeric, dirty numeric, mixed datetimes, timedeltas, complex, low-cardinality and free
+text), written to CSV bytes and put through the stages of an upload:
+
+    read       - format sniffing and pd.read_csv
+    infer      - infer_and_convert_data_types, with 'infer:<converter>' sub-stages summing
+                 the time spent in each try_convert_* function over all columns
+                 (and 'infer:classify' in the classifier of values)
+    serialize  - the process-file response (column profiles and the first page of rows)
+    persist    - Arrow file of the raw frame, as it's stored for later conversions
+
+Stages are recorded by instrumentation.Trace, the same way as stages of requests.
+Every stage records wall time, CPU time and peak of memory allocated during the stage
+(tracemalloc, numpy and pandas buffers included). Timing runs don't trace memory, its
+overhead would distort them, memory is measured in one extra traced run.
+
+Results are a JSON-serializable dict, compare() reports stages slower than a baseline.
+Run it with `python manage.py benchmark`.
+"""
+
+import io
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from . import dataframe_storage as dfs
+from . import file_format as ff
+from . import infer_data_types as idt
+from . import instrumentation
+
+KINDS = [
+    "numeric",
+    "dirty_numeric",
+    "mixed_datetime",
+    "timedelta",
+    "complex",
+    "low_cardinality",
+    "text",
+]
+STAGES = ["read", "infer", "serialize", "persist"]
+
+# stages slower than baseline by more than this ratio are regressions
+DEFAULT_TOLERANCE = 1.25
+# stages faster than this (seconds) are too noisy to compare
+MIN_COMPARED_SECONDS = 0.01
+# stages must also be slower by this many seconds to regress, timer and scheduling noise
+# of short stages easily exceeds the tolerance ratio
+MIN_SLOWDOWN_SECONDS = 0.05
+
+_WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+
+def _numeric(rng, rows):
+    return rng.normal(1000, 250, rows).round(3).astype(str)
+
+
+def _dirty_numeric(rng, rows):
+    values = rng.integers(-10_000, 10_000, rows).astype(str).astype(object)
+    dirty = rng.random(rows) < 0.05
+    values[dirty] = rng.choice(["N/A", "-", "unknown", ""], dirty.sum())
+    return values
+
+
+def _mixed_datetime(rng, rows):
+    seconds = rng.integers(0, 20 * 365 * 24 * 3600, rows)
+    dates = pd.Timestamp("2000-01-01") + pd.to_timedelta(seconds, unit="s")
+    layouts = [
+        dates.strftime("%Y-%m-%d %H:%M:%S"),
+        dates.strftime("%m/%d/%Y"),
+        dates.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    ]
+    choice = rng.integers(0, len(layouts), rows)
+    return np.choose(choice, [np.asarray(layout, dtype=object) for layout in layouts])
+
+
+def _timedelta(rng, rows):
+    seconds = pd.to_timedelta(rng.integers(0, 3 * 24 * 3600, rows), unit="s")
+    return np.asarray(seconds.astype(str), dtype=object)
+
+
+def _complex(rng, rows):
+    real = rng.integers(-99, 99, rows)
+    imag = rng.integers(0, 99, rows)
+    return np.char.add(np.char.add(real.astype(str), "+"), np.char.add(imag.astype(str), "j"))
+
+
+def _low_cardinality(rng, rows):
+    return rng.choice(_WORDS, rows)
+
+
+def _text(rng, rows):
+    words = rng.choice(_WORDS, rows)
+    return np.char.add(np.char.add(words, " "), rng.integers(0, rows * 10, rows).astype(str))
+
+
+_GENERATORS = {
+    "numeric": _numeric,
+    "dirty_numeric": _dirty_numeric,
+    "mixed_datetime": _mixed_datetime,
+    "timedelta": _timedelta,
+    "complex": _complex,
+    "low_cardinality": _low_cardinality,
+    "text": _text,
+}
+
+
+def make_dataset(rows, columns=len(KINDS), kinds=KINDS, seed=0):
+    """
+    Generates a synthetic dataset of text values, the same for the same arguments.
+
+    Args:
+        rows (int): number of rows.
+        columns (int): number of columns, kinds are repeated in order.
+        kinds (list): column kinds of KINDS.
+        seed (int): random seed.
+
+    Returns:
+        pd.DataFrame: columns named '<kind>_<n>'.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = kinds[i % len(kinds)]
+        data[f"{kind}_{i}"] = _GENERATORS[kind](rng, rows)
+    return pd.DataFrame(data)
+
+
+def to_csv_bytes(df):
+    return df.to_csv(index=False).encode()
+
+
+def default_serialize(df):
+    """Response of a converted frame without Django: profiles and the first page of rows."""
+    from . import column_profile as cp
+
+    cp.profile_dataframe(df)
+    return df.iloc[:100].to_json(orient="records", date_format="iso")
+
+
+def run_pipeline(data, trace, engine="classifier", serialize=default_serialize):
+    """Puts CSV bytes through the upload stages, recording each one to trace."""
+    with instrumentation.activate(trace):
+        with trace.stage("read"):
+            file_obj = io.BytesIO(data)
+            df = ff.read_upload(file_obj, ff.sniff_format(file_obj))
+
+        raw = df.copy(deep=False)
+        with trace.stage("infer"):
+            converted = idt.infer_and_convert_data_types(df, engine=engine)
+
+        with trace.stage("serialize"):
+            serialize(converted)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with trace.stage("persist"):
+                dfs.write_dataframe(raw, os.path.join(temp_dir, "raw.arrow"))
+
+
+def _median_stages(runs):
+    """
+    Median of every statistic of every stage over timing runs. Stages missing from a run
+    (a converter no column reached) count as zero in it.
+    """
+    names = dict.fromkeys(name for run in runs for name in run)
+    return {
+        name: {
+            key: statistics.median(run[name][key] if name in run else 0 for run in runs)
+            for key in ("seconds", "cpu_seconds", "calls")
+        }
+        for name in names
+    }
+
+
+def run_benchmark(
+    rows=(10_000, 100_000),
+    columns=len(KINDS),
+    kinds=KINDS,
+    repeat=3,
+    memory=True,
+    engine="classifier",
+    seed=0,
+    serialize=default_serialize,
+):
+    """
+    Runs the pipeline on a synthetic dataset of every row count.
+
+    Args:
+        rows (iterable): row counts of the datasets.
+        columns, kinds, seed: see make_dataset.
+        repeat (int): timing runs per dataset, statistics are their medians.
+        memory (bool): one more run traced by tracemalloc for peak memory of stages.
+        engine (str): inference engine.
+        serialize (callable): serialization stage of a converted frame.
+
+    Returns:
+        dict: {'environment': {...}, 'parameters': {...}, 'datasets': [{'rows', 'columns',
+            'csv_bytes', 'stages': {stage: {'seconds', 'cpu_seconds', 'calls'[, 'peak_bytes']}}}]}
+    """
+    datasets = []
+    for row_count in rows:
+        data = to_csv_bytes(make_dataset(row_count, columns, kinds, seed))
+        runs = []
+        for _ in range(repeat):
+            trace = instrumentation.Trace()
+            run_pipeline(data, trace, engine, serialize)
+            runs.append(trace.stages)
+        stages = _median_stages(runs)
+
+        if memory:
+            trace = instrumentation.Trace()
+            tracemalloc.start()
+            try:
+                run_pipeline(data, trace, engine, serialize)
+            finally:
+                tracemalloc.stop()
+            for name, stats in trace.stages.items():
+                stages[name]["peak_bytes"] = stats["peak_bytes"]
+
+        datasets.append(
+            {"rows": row_count, "columns": columns, "csv_bytes": len(data), "stages": stages}
+        )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "parameters": {
+            "kinds": list(kinds),
+            "repeat": repeat,
+            "engine": engine,
+            "seed": seed,
+        },
+        "datasets": datasets,
+    }
+
+
+def _dataset_key(results, dataset):
+    """Configuration a dataset was generated and inferred with."""
+    parameters = results.get("parameters", {})
+    return (
+        dataset["rows"],
+        dataset["columns"],
+        tuple(parameters.get("kinds", ())),
+        parameters.get("engine"),
+        parameters.get("seed"),
+    )
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares stage times of results with a baseline of the same datasets: same rows,
+    columns, kinds, seed and inference engine, datasets of other configurations are skipped.
+
+    Returns:
+        list: regressions {'rows', 'columns', 'stage', 'seconds', 'baseline', 'ratio'} of
+            stages slower than tolerance * baseline and by more than MIN_SLOWDOWN_SECONDS,
+            stages under MIN_COMPARED_SECONDS in both are skipped.
+    """
+    baseline_stages = {
+        _dataset_key(baseline, dataset): dataset["stages"] for dataset in baseline["datasets"]
+    }
+    regressions = []
+    for dataset in results["datasets"]:
+        before = baseline_stages.get(_dataset_key(results, dataset))
+        if before is None:
+            continue
+        for name, stats in dataset["stages"].items():
+            if name not in before:
+                continue
+            seconds, base = stats["seconds"], before[name]["seconds"]
+            if max(seconds, base) < MIN_COMPARED_SECONDS:
+                continue
+            ratio = seconds / base if base else float("inf")
+            if ratio > tolerance and seconds - base > MIN_SLOWDOWN_SECONDS:
+                regressions.append(
+                    {
+                        "rows": dataset["rows"],
+                        "columns": dataset["columns"],
+                        "stage": name,
+                        "seconds": seconds,
+                        "baseline": base,
+                        "ratio": round(ratio, 2),
+                    }
+                )
+    return regressions
@@ -0,0 +1,132 @@
+"""
+Approximate distinct counts: HyperLogLog sketch of column values.
+
+Values are hashed to 64 bits (pandas hash_array), the first PRECISION bits pick a register
+and the register keeps the longest run of leading zeros of the other bits. The estimate
+has a relative standard error of about 1.04 / sqrt(2 ** PRECISION) (1.6% by default),
+sketches of parts of a column (chunks, blocks) merge into the sketch of the whole column
+by the maximum of registers, memory is fixed (one byte per register).
+
+category_verdict decides the category threshold from a sketch when the estimate is
+clearly on one side of it, near the threshold it leaves the decision to an exact count.
+distinct_within goes through a column in blocks and stops as soon as it's decided.
+"""
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 12
+# estimates within this many standard errors of a threshold are not decided
+MARGIN_ERRORS = 4
+# blocks are hashed by their distinct values once the estimate is below this share of rows
+LOW_CARDINALITY = 0.1
+
+
+class HyperLogLog:
+    """
+    Sketch of the distinct values added to it.
+
+    Attributes:
+        precision (int): number of register index bits.
+        registers (np.ndarray): uint8 register per index.
+    """
+
+    def __init__(self, precision=PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def error(self):
+        """Relative standard error of the estimate."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add(self, values, categorize=False):
+        """
+        Adds values (a Series or array, missing values included as one more value).
+        categorize: hash distinct values once, faster when they repeat a lot.
+        """
+        values = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+        if values.dtype.kind in "US":
+            # hash_array hashes text of object arrays only
+            values = values.astype(object)
+        if not len(values):
+            return self
+        hashes = pd.util.hash_array(values, categorize=categorize)
+        index_bits = self.precision
+        rest_bits = 64 - index_bits
+        index = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # position of the first 1 bit of rest, rest_bits + 1 when rest is 0
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        nonzero = rest > 0
+        bit_length[nonzero] = np.frexp(rest[nonzero].astype(np.float64))[1]
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        """Adds the values of another sketch of the same precision."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            return m * np.log(m / zeros)
+        return float(raw)
+
+
+def category_verdict(sketch, non_null, unique_percent_max, remaining=0):
+    """
+    Decides from a sketch whether distinct values are at most unique_percent_max percent
+    of non_null values.
+
+    Args:
+        sketch (HyperLogLog): sketch of the values seen so far.
+        non_null (int): number of non-null values of the whole column.
+        unique_percent_max (float): threshold percentage of distinct values.
+        remaining (int): values not added to the sketch yet, each may be a new one.
+
+    Returns:
+        bool or None: True/False when the estimate is clearly below/above the threshold,
+            None near the threshold, an exact count decides then.
+    """
+    limit = non_null * unique_percent_max / 100
+    estimate = sketch.estimate()
+    margin = MARGIN_ERRORS * sketch.error * estimate
+    if estimate - margin > limit:
+        return False
+    if estimate + margin + remaining <= limit:
+        return True
+    return None
+
+
+def distinct_within(values, unique_percent_max, block_rows):
+    """
+    Decides whether distinct values are at most unique_percent_max percent of values,
+    adding blocks of values to a sketch until the verdict is clear.
+
+    Args:
+        values (pd.Series): non-null values.
+        unique_percent_max (float): threshold percentage of distinct values.
+        block_rows (int): values per block.
+
+    Returns:
+        bool or None: see category_verdict, None when it's still undecided at the end.
+    """
+    sketch = HyperLogLog()
+    size = len(values)
+    categorize = False
+    for start in range(0, size, block_rows):
+        seen = min(start + block_rows, size)
+        sketch.add(values.iloc[start:seen], categorize=categorize)
+        verdict = category_verdict(sketch, size, unique_percent_max, remaining=size - seen)
+        if verdict is not None:
+            return verdict
+        categorize = sketch.estimate() < seen * LOW_CARDINALITY
+    return None
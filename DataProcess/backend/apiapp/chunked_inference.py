@@ -0,0 +1,481 @@
+"""
+Streaming (chunked) CSV ingestion with incremental type inference.
+
+The upload is read twice in bounded chunks of raw text (any other source of raw text
+chunks, e.g. Excel sheets, goes through infer_and_convert_chunks the same way):
+    1. every chunk adds per-column type evidence (conversion failures per candidate type,
+       distinct values for category) to a ColumnEvidence accumulator;
+    2. the evidence is resolved into one schema for the whole file and each chunk is
+       converted with it, so all chunks end up with the same dtypes.
+
+Distinct values of a column are kept up to MAX_EXACT_DISTINCT of them, a HyperLogLog
+sketch merged over chunks estimates them beyond that. Columns the estimate doesn't rule
+out as category get their categories collected in one more pass over these columns only.
+
+Only one raw chunk is held in memory at a time. infer_and_convert_chunks concatenates the
+converted chunks into one frame, so its memory still grows with the converted data (and
+briefly doubles while concatenating); infer_and_write_chunks doesn't hold the converted
+frame, its chunks go to an on-disk column store. The decision rules are the same as
+infer_and_convert_data_types: numeric -> complex -> datetime -> timedelta -> category,
+each accepted when failures stay within the errors rate of the whole column.
+"""
+
+import gc
+
+import pandas as pd
+import numpy as np
+
+from . import infer_data_types as idt
+from .cardinality import HyperLogLog, category_verdict
+from .complex_parser import (
+    complex_text,
+    has_complex_marks,
+    parse_complex_column,
+    parse_complex_text,
+)
+from .datetime_formats import column_formats, convert_datetime, mixed_fallback
+from .distinct_conversion import convert_distinct
+from .file_format import binary_file
+
+# rows per chunk, keeps one raw chunk of a 52 columns file around 40-50 MB
+DEFAULT_CHUNK_ROWS = 100_000
+# distinct values of a column kept by the first pass, a sketch counts more of them
+MAX_EXACT_DISTINCT = 100_000
+
+# values pandas parser reads natively as booleans
+TRUE_VALUES = ["True", "TRUE", "true"]
+FALSE_VALUES = ["False", "FALSE", "false"]
+BOOL_MAP = {**{v: True for v in TRUE_VALUES}, **{v: False for v in FALSE_VALUES}}
+
+
+def _to_numeric(values):
+    return pd.to_numeric(values, errors="coerce")
+
+
+def _to_timedelta(values):
+    return pd.to_timedelta(values, errors="coerce")
+
+
+class ColumnEvidence:
+    """
+    Type evidence of one column accumulated over chunks.
+
+    Failure counters include null entries, the same way try_convert_* functions count NaNs
+    after conversion, so they can be compared directly to errors_rate * rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.numeric_failures = 0  # non-null values pd.to_numeric can't parse
+        self.bool_like = True  # all non-null values are pandas booleans
+        self.bool_values = set()  # booleans of a bool_like column
+        self.complex_ok = True
+        self.complex_marks = False  # any value has 'j' or '+'
+        self.complex_failures = 0
+        self.datetime_formats = []  # formats of all chunks, the first found first
+        self.datetime_failures = 0
+        self.timedelta_ok = True
+        self.timedelta_failures = 0
+        self.distinct = set()  # None once more than MAX_EXACT_DISTINCT
+        self.sketch = HyperLogLog()
+        self.deferred_chunks = []
+
+    @property
+    def non_null(self):
+        return self.rows - self.nulls
+
+    def update(self, column, chunk_no):
+        """
+        Adds evidence of the next chunk of raw (text) values.
+
+        While the column is numeric only, text type evidence of its chunks is deferred:
+        most columns stay numeric and never need it.
+
+        Args:
+            column (pd.Series): chunk of the column read as object dtype.
+            chunk_no (int): number of the chunk in the file.
+        """
+        nulls = int(column.isna().sum())
+        self.rows += len(column)
+        self.nulls += nulls
+
+        numeric = convert_distinct(column, _to_numeric)
+        self.numeric_failures += int(numeric.isna().sum()) - nulls
+        if self.bool_like:
+            values = column.dropna().unique()
+            self.bool_like = bool(pd.Series(values).isin(BOOL_MAP.keys()).all())
+            if self.bool_like:
+                self.bool_values.update(BOOL_MAP[value] for value in values)
+
+        if self.numeric_failures == 0:
+            self.deferred_chunks.append(chunk_no)
+        else:
+            self.update_text(column)
+
+    @property
+    def needs_backfill(self):
+        """True when deferred chunks turned out to be part of a text column."""
+        return bool(self.deferred_chunks) and self.numeric_failures > 0
+
+    def update_text(self, column):
+        """Adds evidence of text types (complex, datetime, timedelta, category) of a chunk."""
+        if self.complex_ok:
+            try:
+                text = complex_text(column)
+                self.complex_marks = self.complex_marks or has_complex_marks(text)
+                self.complex_failures += int(np.isnan(parse_complex_text(text)).sum())
+            except TypeError:
+                # try_convert_to_complex fails on a column with any missing value
+                self.complex_ok = False
+
+        # formats of all distinct value layouts of the chunk. Values they fail are parsed one
+        # by one with the mixed parser, unless the failures so far already rule datetime out
+        formats = column_formats(column)
+        mixed = self.datetime_failures <= idt.ERRORS_RATE * self.rows
+
+        def convert(values):
+            converted = convert_datetime(values, formats) if formats else None
+            return mixed_fallback(values, formats, converted) if mixed else converted
+
+        if formats or mixed:
+            converted = convert_distinct(column, convert)
+            self.datetime_failures += int(converted.isna().sum())
+        else:
+            self.datetime_failures += len(column)
+        for format in formats:
+            if format not in self.datetime_formats:
+                self.datetime_formats.append(format)
+
+        if self.timedelta_ok:
+            try:
+                converted = convert_distinct(column, _to_timedelta)
+                self.timedelta_failures += int(converted.isna().sum())
+            except (ValueError, TypeError):
+                self.timedelta_ok = False
+
+        uniques = column.dropna().unique()
+        # sketches of chunks merge into the sketch of the whole column
+        self.sketch.merge(HyperLogLog().add(uniques))
+        if self.distinct is not None:
+            self.distinct.update(uniques)
+            if len(self.distinct) > MAX_EXACT_DISTINCT:
+                self.distinct = None
+
+    def resolve(self, errors_rate=idt.ERRORS_RATE):
+        """
+        Picks the column type from the accumulated evidence.
+
+        Returns:
+            dict: type spec, e.g. {'type': 'date', 'formats': ['%m/%d/%Y']}.
+                Types are the ones of column definitions ('number', 'complex', 'date',
+                'duration', 'category', 'string') plus 'bool' for native booleans.
+                Specs of bool_like columns with missing values have 'booleans': True,
+                their values are converted as the booleans pandas parser reads.
+        """
+        budget = errors_rate * self.rows
+
+        # columns pandas parser reads natively as bool or numbers are never inferred
+        if self.bool_like and self.non_null:
+            if not self.nulls:
+                return {"type": "bool"}
+            # with missing values pandas keeps an object column of booleans, inferred
+            # like any other: numbers when the missing values are within the budget
+            if self.nulls <= budget:
+                return {"type": "number", "booleans": True}
+            percent_unique = len(self.bool_values) / self.non_null * 100
+            if percent_unique <= idt.CATEGORY_UNIQUE_PERCENT_MAX:
+                categories = sorted(self.bool_values)
+                return {"type": "category", "categories": categories, "booleans": True}
+            return {"type": "string", "booleans": True}
+        if self.numeric_failures == 0:
+            return {"type": "number"}
+
+        if self.nulls + self.numeric_failures <= budget:
+            return {"type": "number"}
+        if self.complex_ok and self.complex_marks and self.complex_failures <= budget:
+            return {"type": "complex"}
+
+        if self.datetime_formats and self.datetime_failures <= budget:
+            return {"type": "date", "formats": self.datetime_formats}
+
+        if self.timedelta_ok and self.timedelta_failures <= budget:
+            return {"type": "duration"}
+
+        if self.non_null and self.distinct is not None:
+            percent_unique = len(self.distinct) / self.non_null * 100
+            if percent_unique <= idt.CATEGORY_UNIQUE_PERCENT_MAX:
+                return {"type": "category", "categories": sorted(self.distinct)}
+        elif self.non_null:
+            verdict = category_verdict(
+                self.sketch, self.non_null, idt.CATEGORY_UNIQUE_PERCENT_MAX
+            )
+            if verdict is not False:
+                # too many distinct values were seen to keep them, see collect_categories
+                return {"type": "category", "categories": None}
+
+        return {"type": "string"}
+
+
+def read_csv_chunks(file_obj, chunksize=DEFAULT_CHUNK_ROWS, usecols=None, read_options=None):
+    """
+    Reads CSV file object from the beginning in chunks of raw text values.
+
+    Args:
+        usecols (list, optional): read only these columns.
+        read_options (dict, optional): more pd.read_csv arguments, e.g. sep, encoding, compression.
+
+    Returns:
+        Iterator[pd.DataFrame]: chunks with all columns of object dtype.
+    """
+    file_obj = binary_file(file_obj)
+    file_obj.seek(0)
+    return pd.read_csv(
+        file_obj,
+        dtype="object",
+        chunksize=chunksize,
+        usecols=usecols,
+        **(read_options or {}),
+    )
+
+
+def _csv_chunks(file_obj, chunksize, read_options):
+    """read_chunks function of a CSV file object, see collect_chunk_evidence."""
+    return lambda usecols=None: read_csv_chunks(file_obj, chunksize, usecols, read_options)
+
+
+def _chunks(read_chunks, usecols=None):
+    """
+    Chunks of read_chunks, cyclic garbage of a chunk is collected before the next one:
+    Series with a cached .str accessor reference each other, such chunk columns would
+    otherwise wait for a full collection and pile up over a large file.
+    """
+    for chunk in read_chunks(usecols):
+        yield chunk
+        gc.collect()
+
+
+def collect_type_evidence(file_obj, chunksize=DEFAULT_CHUNK_ROWS, read_options=None):
+    """
+    First pass over CSV file object, see collect_chunk_evidence.
+
+    Returns:
+        dict: column name -> ColumnEvidence, in file column order.
+    """
+    return collect_chunk_evidence(_csv_chunks(file_obj, chunksize, read_options))
+
+
+def collect_chunk_evidence(read_chunks):
+    """
+    First pass: accumulates per-column ColumnEvidence over all chunks.
+
+    Chunks deferred by numeric looking columns which later turned out to be text
+    are re-read for those columns only.
+
+    Args:
+        read_chunks (callable): read_chunks(usecols=None) reads the source from the
+            beginning in chunks of raw text values (of usecols columns only), the same
+            chunks on every call.
+
+    Returns:
+        dict: column name -> ColumnEvidence, in source column order.
+    """
+    evidence = {}
+    for chunk_no, chunk in enumerate(_chunks(read_chunks)):
+        for col in chunk.columns:
+            evidence.setdefault(col, ColumnEvidence()).update(chunk[col], chunk_no)
+
+    backfill = [col for col, ev in evidence.items() if ev.needs_backfill]
+    if backfill:
+        for chunk_no, chunk in enumerate(_chunks(read_chunks, backfill)):
+            for col in backfill:
+                if chunk_no in evidence[col].deferred_chunks:
+                    evidence[col].update_text(chunk[col])
+
+    return evidence
+
+
+def resolve_schema(evidence, errors_rate=idt.ERRORS_RATE):
+    """Resolves evidence of every column into the file schema {column: type spec}."""
+    return {col: ev.resolve(errors_rate) for col, ev in evidence.items()}
+
+
+def collect_categories(read_chunks, evidence, schema):
+    """
+    Counts distinct values of category columns of the schema without categories exactly,
+    in one more pass over these columns only: columns within the category threshold get
+    their categories, the others stay strings.
+
+    Args:
+        read_chunks (callable): see collect_chunk_evidence.
+        evidence (dict): column name -> ColumnEvidence of the first pass.
+        schema (dict): resolved schema, updated in place.
+
+    Returns:
+        dict: schema.
+    """
+    columns = [
+        col
+        for col, spec in schema.items()
+        if spec["type"] == "category" and spec["categories"] is None
+    ]
+    if not columns:
+        return schema
+
+    distinct = {col: set() for col in columns}
+    for chunk in _chunks(read_chunks, columns):
+        for col in columns:
+            distinct[col].update(chunk[col].dropna().unique())
+
+    for col in columns:
+        percent_unique = len(distinct[col]) / evidence[col].non_null * 100
+        if percent_unique <= idt.CATEGORY_UNIQUE_PERCENT_MAX:
+            schema[col] = {"type": "category", "categories": sorted(distinct[col])}
+        else:
+            schema[col] = {"type": "string"}
+    return schema
+
+
+def convert_column(column, spec):
+    """
+    Converts raw text column (or its chunk) to the type of spec.
+
+    Args:
+        column (pd.Series): object dtype values.
+        spec (dict): type spec from ColumnEvidence.resolve.
+
+    Returns:
+        pd.Series: converted column, the same dtype for every chunk of a column.
+    """
+    type = spec["type"]
+    if type == "bool":
+        return column.map(BOOL_MAP).astype("bool")
+    if spec.get("booleans"):
+        column = column.map(BOOL_MAP, na_action="ignore").astype("object")
+        if type == "number":
+            # chunks without missing values would stay bool, with them float
+            return column.astype("float64")
+    if type == "number":
+        return convert_distinct(column, _to_numeric)
+    if type == "complex":
+        return convert_distinct(column, parse_complex_column)
+    if type == "date":
+        return convert_distinct(column, lambda values: convert_datetime(values, spec["formats"]))
+    if type == "duration":
+        return convert_distinct(column, _to_timedelta)
+    if type == "category":
+        return pd.Series(
+            pd.Categorical(column, categories=spec["categories"]),
+            index=column.index,
+            name=column.name,
+        )
+    return column
+
+
+def convert_chunk(chunk, schema):
+    """Second pass: converts every column of a raw chunk with the file schema."""
+    return pd.DataFrame(
+        {col: convert_column(chunk[col], schema[col]) for col in chunk.columns},
+        index=chunk.index,
+    )
+
+
+def _align_datetime_chunks(converted, schema):
+    """
+    Gives chunks without any parsed datetime (naive NaT only) the time zone of the other
+    chunks of the column, otherwise concatenation falls back to object dtype.
+    """
+    for col, spec in schema.items():
+        if spec["type"] != "date":
+            continue
+        dtypes = {c[col].dtype for c in converted if c[col].notna().any()}
+        if len(dtypes) != 1:
+            continue
+        tz = getattr(dtypes.pop(), "tz", None)
+        if tz is None:
+            continue
+        for chunk in converted:
+            if chunk[col].dt.tz is None:
+                chunk[col] = chunk[col].dt.tz_localize(tz)
+
+
+def stream_infer_and_convert(
+    file_obj,
+    chunksize=DEFAULT_CHUNK_ROWS,
+    errors_rate=idt.ERRORS_RATE,
+    on_raw_chunk=None,
+    read_options=None,
+):
+    """
+    Reads CSV file object in chunks, infers column types on the whole file and converts it.
+
+    Args:
+        file_obj: seekable binary or text file object with CSV data.
+        chunksize (int): number of rows per chunk, bounds peak memory of parsing.
+        errors_rate (float): acceptable proportion of failed conversions per column.
+        on_raw_chunk (callable, optional): called with every raw chunk of the second pass,
+            e.g. to persist the initial data without keeping it all in memory.
+        read_options (dict, optional): more pd.read_csv arguments, see read_csv_chunks.
+
+    Returns:
+        tuple (pd.DataFrame, dict): converted DataFrame and the resolved schema.
+    """
+    return infer_and_convert_chunks(
+        _csv_chunks(file_obj, chunksize, read_options), errors_rate, on_raw_chunk
+    )
+
+
+def infer_schema(read_chunks, errors_rate=idt.ERRORS_RATE):
+    """Type evidence, schema and categories of a chunked source, see collect_chunk_evidence."""
+    evidence = collect_chunk_evidence(read_chunks)
+    return collect_categories(read_chunks, evidence, resolve_schema(evidence, errors_rate))
+
+
+def infer_and_convert_chunks(read_chunks, errors_rate=idt.ERRORS_RATE, on_raw_chunk=None):
+    """
+    Infers column types of a chunked source of raw text values and converts it.
+
+    Args:
+        read_chunks (callable): reads the source in chunks, see collect_chunk_evidence.
+        errors_rate, on_raw_chunk: see stream_infer_and_convert.
+
+    Returns:
+        tuple (pd.DataFrame, dict): converted DataFrame and the resolved schema.
+    """
+    converted = []
+    schema = infer_and_write_chunks(read_chunks, converted.append, errors_rate, on_raw_chunk)
+
+    if not converted:
+        return pd.DataFrame(columns=list(schema)), schema
+
+    _align_datetime_chunks(converted, schema)
+    df = pd.concat(converted, ignore_index=True)
+
+    # chunks with different time zone offsets can't share one datetime dtype
+    for col, spec in schema.items():
+        if spec["type"] == "date" and df[col].dtype == "object":
+            df[col] = pd.to_datetime(df[col], errors="coerce", utc=True)
+
+    return df, schema
+
+
+def infer_and_write_chunks(read_chunks, write, errors_rate=idt.ERRORS_RATE, on_raw_chunk=None):
+    """
+    Infers column types of a chunked source like infer_and_convert_chunks, but passes
+    converted chunks to write one by one instead of concatenating them: the converted
+    frame is never held in memory (out-of-core datasets, see column_store).
+
+    Args:
+        read_chunks (callable): see collect_chunk_evidence.
+        write (callable): called with every converted chunk, e.g. StoreWriter.write.
+        errors_rate, on_raw_chunk: see stream_infer_and_convert.
+
+    Returns:
+        dict: the resolved schema.
+    """
+    schema = infer_schema(read_chunks, errors_rate)
+    for chunk in _chunks(read_chunks):
+        if on_raw_chunk:
+            on_raw_chunk(chunk)
+        write(convert_chunk(chunk, schema))
+    return schema
@@ -0,0 +1,264 @@
+"""
+Vectorized column profiling: display width, null count, min/max and distinct count.
+
+Width is the length of the longest value as DataGrid shows it (the same as
+max(column.astype(str).str.len())). Where the dtype tells the text layout, it's computed
+from the column statistics without converting values to strings: digits of the max
+magnitude of numbers, fixed ISO layout of datetimes and durations, category labels.
+Only object columns are measured as text, once per distinct value. Floats of long
+fractions or in exponent notation get the length of the repr of the values a per-value
+bound doesn't rule out.
+
+Distinct values of long columns are estimated with a HyperLogLog sketch.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .cardinality import HyperLogLog
+
+# significant digits Python prints for a float at most, 0.1 + 0.2 -> '0.30000000000000004'
+FLOAT_REPR_DIGITS = 17
+# repr of floats below this magnitude (and from 1e16 up) is in exponent notation
+MIN_POSITIONAL = 1e-4
+MAX_POSITIONAL = 1e16
+# fractions with up to this many decimals are sized exactly, longer ones as full repr
+MAX_SHORT_DECIMALS = 6
+# text of missing values: 'nan', 'NaT', 'None'
+NULL_WIDTH = 4
+# columns of this many values or more get an estimated distinct count
+DISTINCT_SKETCH_MIN_ROWS = 50_000
+
+
+def _digits(value):
+    """Number of digits of the integer part of abs(value)."""
+    value = abs(value)
+    return len(str(int(value))) if value >= 1 else 1
+
+
+def _repr_bounds(values):
+    """
+    Upper bound of the repr length of each finite float: FLOAT_REPR_DIGITS significant
+    digits after the leading zeros of a small fraction, or in exponent notation
+    ('-1.2345678901234567e-05').
+    """
+    magnitude = np.abs(values)
+    exponent = np.floor(np.log10(magnitude, where=magnitude > 0, out=np.zeros(len(values))))
+    integer = exponent >= 0
+    int_digits = np.where(integer, exponent + 1, 1)
+    fraction = np.where(
+        integer,
+        np.maximum(FLOAT_REPR_DIGITS - int_digits, 1),
+        FLOAT_REPR_DIGITS - exponent - 1,  # leading zeros of the fraction included
+    )
+    positional = (magnitude >= MIN_POSITIONAL) & (magnitude < MAX_POSITIONAL) | (magnitude == 0)
+    scientific = FLOAT_REPR_DIGITS + 3 + np.where(np.abs(exponent) >= 100, 3, 2)
+    width = np.where(positional, int_digits + 1 + fraction, scientific)
+    # one more for the sign and for a log10 rounded across a power of ten
+    return (width + np.signbit(values) + 1).astype(np.int64)
+
+
+def _repr_width(values, integral_point=True):
+    """
+    Width of the longest repr of finite floats. Reprs are made in the order of their
+    bounds, only until the next bound is not above the longest repr so far.
+    """
+    # unique values keep one of 0.0 and -0.0
+    width = (4 if integral_point else 2) if np.signbit(values[values == 0]).any() else 0
+    values = np.unique(values)
+    bounds = _repr_bounds(values)
+    for i in np.argsort(bounds, kind="stable")[::-1]:
+        if bounds[i] <= width:
+            break
+        text = repr(float(values[i]))
+        if not integral_point and text.endswith(".0"):
+            text = text[:-2]
+        width = max(width, len(text))
+    return width
+
+
+def _float_width(values, integral_point=True):
+    """
+    Width of the longest float repr, values are finite floats.
+    Integers and short decimals of the positional range are sized from the max magnitude
+    and the shortest rounding which keeps all values, exact or slightly above the longest
+    repr; other values by their repr, see _repr_width.
+    integral_point: integral values are printed with '.0', not in complex parts.
+    """
+    if not len(values):
+        return 0
+    magnitude = np.abs(values)
+    if magnitude.max() >= MAX_POSITIONAL:
+        return _repr_width(values, integral_point)
+    sign = 1 if np.signbit(values).any() else 0
+    digits = _digits(magnitude.max())
+    if np.array_equal(np.round(values), values):
+        return sign + digits + (2 if integral_point else 0)
+    if magnitude[magnitude > 0].min() >= MIN_POSITIONAL:
+        for decimals in range(1, MAX_SHORT_DECIMALS + 1):
+            if np.array_equal(np.round(values, decimals), values):
+                return sign + digits + 1 + decimals
+    return _repr_width(values, integral_point)
+
+
+def _number_width(column, nulls):
+    values = column.dropna().to_numpy()
+    if column.dtype.kind == "f":
+        finite = values[np.isfinite(values)]
+        width = _float_width(finite)
+        if len(finite) < len(values):
+            width = max(width, 4)  # 'inf', '-inf'
+    elif len(values):
+        width = max(len(str(values.min())), len(str(values.max())))
+    else:
+        width = 0
+    return max(width, NULL_WIDTH if nulls else 0)
+
+
+def _datetime_width(column):
+    """
+    '2023-09-15' when all naive values are dates, else '2023-09-15 12:30:45[.fff][+00:00]',
+    fraction digits are the ones of the finest resolution present.
+    """
+    values = column.dropna()
+    if values.empty:
+        return 0
+    if values.dt.tz is not None:
+        return 19 + _fraction_width(values.dt.microsecond, values.dt.nanosecond) + 6
+    if not (values - values.dt.normalize()).any():
+        return 10
+    return 19 + _fraction_width(values.dt.microsecond, values.dt.nanosecond)
+
+
+def _fraction_width(microseconds, nanoseconds):
+    """Width of '.fff', '.ffffff' or '.fffffffff' second fractions, 0 for whole seconds."""
+    if nanoseconds.any():
+        return 10
+    if (microseconds % 1000).any():
+        return 7
+    if microseconds.any():
+        return 4
+    return 0
+
+
+def _timedelta_width(column):
+    """'-1 days +22:30:00[.ffffff]' layout of pandas Timedelta."""
+    values = column.dropna()
+    if values.empty:
+        return 0
+    days = values.dt.days
+    width = max(_digits(days.min()), _digits(days.max())) + len(" days 00:00:00")
+    if (days < 0).any():
+        width += 2  # '-' and '+'
+    # durations print microseconds even when milliseconds are enough
+    if values.dt.nanoseconds.any():
+        return width + 10
+    if values.dt.microseconds.any():
+        return width + 7
+    return width
+
+
+def _complex_width(column):
+    """'(1+2j)' layout of Python complex, parts are sized like floats, missing is '(nan+0j)'."""
+    values = column.to_numpy()
+    values = values[~np.isnan(values)]
+    width = 8 if len(values) < len(column) else 0
+    if not len(values):
+        return width
+    parts = _float_width(values.real, False) + _float_width(np.abs(values.imag), False)
+    return max(width, 4 + parts)
+
+
+def _text_width(column):
+    """Longest text of distinct values, None and NaN included."""
+    uniques = pd.unique(column.to_numpy())
+    if not len(uniques):
+        return 0
+    return int(pd.Series(uniques, dtype="object").astype(str).str.len().max())
+
+
+def _json_value(value):
+    """Statistic as a JSON value, None where it has no JSON representation."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, pd.Timedelta):
+        return value.isoformat()
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return float(value) if math.isfinite(value) else None
+    return None
+
+
+def _distinct(column, nulls):
+    """Distinct non-null values, estimated by a sketch for long columns."""
+    if len(column) < DISTINCT_SKETCH_MIN_ROWS:
+        return int(column.nunique())
+    values = column.dropna()
+    estimate = round(HyperLogLog().add(values, categorize=values.dtype == "object").estimate())
+    return min(int(estimate), len(column) - nulls)
+
+
+def profile_column(column):
+    """
+    Profiles one converted column.
+
+    Args:
+        column (pd.Series): column of any dtype produced by type inference.
+
+    Returns:
+        dict: {'width': int, 'nulls': int, 'min': ..., 'max': ..., 'distinct': int or None},
+            distinct is estimated for columns of DISTINCT_SKETCH_MIN_ROWS values or more,
+            min and max are JSON values (ISO text for datetimes and durations),
+            None for columns without order (text, category, complex).
+    """
+    dtype = column.dtype
+    nulls = int(column.isna().sum())
+    minimum = maximum = None
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        labels = dtype.categories[np.unique(column.cat.codes[column.cat.codes >= 0])]
+        width = _text_width(pd.Series(labels, dtype="object"))
+        width = max(width, 3 if nulls else 0)
+        distinct = len(labels)
+    else:
+        kind = dtype.kind
+        if kind == "b":
+            width = 5 if (~column).any() else 4
+        elif kind in "iuf":
+            width = _number_width(column, nulls)
+        elif kind == "M":
+            width = max(_datetime_width(column), 3 if nulls else 0)
+        elif kind == "m":
+            width = max(_timedelta_width(column), 3 if nulls else 0)
+        elif kind == "c":
+            width = _complex_width(column)
+        else:
+            width = _text_width(column)
+
+        if kind in "biufMm" and nulls < len(column):
+            minimum, maximum = column.min(), column.max()
+        try:
+            distinct = _distinct(column, nulls)
+        except TypeError:
+            # unhashable objects
+            distinct = None
+
+    return {
+        "width": int(width),
+        "nulls": nulls,
+        "min": _json_value(minimum),
+        "max": _json_value(maximum),
+        "distinct": distinct,
+    }
+
+
+def profile_dataframe(df):
+    """Profiles every column of a DataFrame, returns {column: profile}."""
+    return {col: profile_column(df[col]) for col in df.columns}
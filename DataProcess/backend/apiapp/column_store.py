@@ -0,0 +1,331 @@
+"""
+On-disk column store of converted frames larger than memory (out-of-core datasets).
+
+A store is a directory with an Arrow IPC file per column and manifest.json with the
+column order, the files and the number of rows. Column files hold a record batch (row
+group) per chunk they were written in, uncompressed, and are memory-mapped: a read takes
+only the columns and the row range it asks for, pages of the other rows and columns are
+never touched.
+
+Chunks of a column converted one by one may differ in dtype: integers in one chunk and
+floats with missing values in the next, naive NaT only in a chunk of time zone aware
+datetimes. StoreWriter keeps the dtype pandas.concat would give the chunks: when a chunk
+needs a wider one, the chunks written so far are rewritten in it. Datetimes of different
+time zones are combined in UTC, as the in-memory ingestion does.
+
+A store is a snapshot: write_columns writes new column files and returns a new store,
+readers of the previous snapshot keep their mapped files.
+
+Responses of all rows of a store are streamed from StoreRows, a window of rows and
+columns read a chunk (or a column) at a time: a store is never read into one frame.
+"""
+
+import json
+import os
+import uuid
+from contextlib import suppress
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from . import dataframe_storage as dfs
+
+MANIFEST = "manifest.json"
+# rows read at once by StoreRows
+DEFAULT_CHUNK_ROWS = 64 * 1024
+
+
+def _sample(column):
+    """A valid and a missing value of column, as far as it has them: enough for its dtype."""
+    return pd.concat([column[column.notna()].iloc[:1], column[column.isna()].iloc[:1]])
+
+
+def _common_dtype(sample, other):
+    """Dtype of the concatenation of columns with these samples."""
+    if sample.dtype.kind == "M" and other.dtype.kind == "M":
+        # chunks without any datetime take the time zone of the others, different
+        # time zones are combined in UTC (pandas.concat falls back to objects)
+        if not other.notna().any():
+            return sample.dtype
+        if not sample.notna().any() or sample.dtype == other.dtype:
+            return other.dtype
+        return pd.DatetimeTZDtype(tz="UTC")
+    return pd.concat([sample, other], ignore_index=True).dtype
+
+
+def _cast(column, dtype):
+    """Column in dtype of _common_dtype."""
+    if column.dtype == dtype:
+        return column
+    if column.dtype.kind == "M" and dtype.kind == "M":
+        # naive values are taken as UTC
+        values = column.array
+        tz = getattr(dtype, "tz", None)
+        values = values.tz_localize(tz) if values.tz is None else values.tz_convert(tz)
+        column = pd.Series(values, index=column.index, name=column.name)
+    return column.astype(dtype)
+
+
+def _to_table(column):
+    return dfs.dataframe_to_table(column.to_frame(), preserve_index=False)
+
+
+class _ColumnWriter:
+    """Column file of StoreWriter, a record batch per chunk in one dtype."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sample = None  # sample of the chunks written so far, in their dtype
+        self.schema = None
+        self._sink = None
+        self._writer = None
+
+    def write(self, column):
+        sample = _sample(column)
+        if self.sample is not None:
+            dtype = _common_dtype(self.sample, sample)
+            if dtype != self.sample.dtype:
+                self._rewrite(dtype)
+            column, sample = _cast(column, dtype), _cast(sample, dtype)
+            sample = _sample(pd.concat([self.sample, sample]))
+        self.sample = sample
+
+        table = _to_table(column)
+        if self._writer is None:
+            self._open(table.schema)
+        elif not table.schema.equals(self.schema, check_metadata=False):
+            try:
+                table = table.cast(self.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                # e.g. a column of missing values only so far has no value type yet
+                self._rewrite(self.sample.dtype, table.schema)
+        self._writer.write_table(table)
+
+    def _open(self, schema):
+        self.schema = schema
+        self._sink = pa.OSFile(self.path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def _rewrite(self, dtype, schema=None):
+        """Rewrites the chunks written so far in dtype (and Arrow schema)."""
+        self.close()
+        previous = self.path + ".previous"
+        os.replace(self.path, previous)
+        self._writer = None
+        for batch in dfs.read_batches(previous):
+            table = _to_table(_cast(batch.iloc[:, 0], dtype))
+            if self._writer is None:
+                self._open(schema or table.schema)
+            self._writer.write_table(table.cast(self.schema))
+        os.remove(previous)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+
+class StoreWriter:
+    """
+    Writes converted chunks of a frame into a new column store at directory.
+    All chunks must have the same columns.
+
+    Usage:
+        with StoreWriter(directory) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        store = writer.store
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.rows = 0
+        self.store = None
+        self._columns = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, chunk):
+        for col in chunk.columns:
+            if col not in self._columns:
+                file = f"{len(self._columns)}.arrow"
+                self._columns[col] = (file, _ColumnWriter(os.path.join(self.directory, file)))
+            self._columns[col][1].write(chunk[col])
+        self.rows += len(chunk)
+
+    def close(self):
+        for _, writer in self._columns.values():
+            writer.close()
+        manifest = {
+            "columns": list(self._columns),
+            "files": [file for file, _ in self._columns.values()],
+            "rows": self.rows,
+        }
+        _write_manifest(self.directory, manifest)
+        self.store = ColumnStore(self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file)
+    os.replace(path + ".tmp", path)
+
+
+class ColumnStore:
+    """
+    Converted frame in column files of a directory, see the module description.
+
+    Attributes:
+        directory (str): directory of the store.
+        columns (list): column names in frame order.
+    """
+
+    def __init__(self, directory, _tables=None):
+        self.directory = str(directory)
+        with open(os.path.join(self.directory, MANIFEST)) as file:
+            manifest = json.load(file)
+        self.columns = manifest["columns"]
+        self.rows = manifest["rows"]
+        self._files = dict(zip(self.columns, manifest["files"]))
+        # memory-mapped tables of the columns read so far
+        self._tables = dict(_tables or {})
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def nbytes(self):
+        """Size of the column files on disk."""
+        return sum(
+            os.path.getsize(os.path.join(self.directory, file)) for file in self._files.values()
+        )
+
+    def _table(self, col):
+        table = self._tables.get(col)
+        if table is None:
+            source = pa.memory_map(os.path.join(self.directory, self._files[col]))
+            table = self._tables[col] = pa.ipc.open_file(source).read_all()
+        return table
+
+    def read(self, columns=None, start=0, stop=None):
+        """
+        Reads rows start:stop of columns (all by default), like df[columns].iloc[start:stop].
+
+        Returns:
+            pd.DataFrame: the rows with their position in the frame as index.
+        """
+        columns = self.columns if columns is None else columns
+        stop = self.rows if stop is None else min(stop, self.rows)
+        start = min(start, stop)
+        index = pd.RangeIndex(start, stop)
+        frames = [
+            dfs.table_to_dataframe(self._table(col).slice(start, stop - start)) for col in columns
+        ]
+        if not frames:
+            return pd.DataFrame(index=index)
+        df = pd.concat(frames, axis=1)
+        df.index = index
+        return df
+
+    def column(self, col):
+        """Reads all rows of a column."""
+        return self.read([col])[col]
+
+    def table(self, columns=None, start=0, stop=None):
+        """
+        Rows start:stop of columns (all by default) as one Arrow table in the layout of
+        dataframe_storage, slices of the mapped files: nothing is copied or converted.
+        """
+        columns = self.columns if columns is None else columns
+        stop = self.rows if stop is None else min(stop, self.rows)
+        start = min(start, stop)
+        tables = [self._table(col).slice(start, stop - start) for col in columns]
+        # pandas metadata of a column file describes its column only
+        pandas = [json.loads(table.schema.metadata[b"pandas"]) for table in tables]
+        metadata = {
+            b"pandas": json.dumps(
+                {
+                    **(pandas[0] if pandas else {}),
+                    "index_columns": [],
+                    "columns": [entry for meta in pandas for entry in meta["columns"]],
+                }
+            ),
+            dfs.COLUMNS_KEY: json.dumps(columns),
+        }
+        schema = pa.schema([table.schema.field(0) for table in tables], metadata=metadata)
+        return pa.Table.from_arrays([table.column(0) for table in tables], schema=schema)
+
+    def write_columns(self, df):
+        """
+        Writes columns of df (all rows of each) as new column files.
+
+        Returns:
+            ColumnStore: the store with these columns replaced or added, this one is not changed.
+        """
+        files = dict(self._files)
+        for col in df.columns:
+            files[col] = f"{len(files)}-{uuid.uuid4().hex[:8]}.arrow"
+            dfs.write_dataframe(
+                df[[col]].reset_index(drop=True), os.path.join(self.directory, files[col])
+            )
+        columns = self.columns + [col for col in df.columns if col not in self._files]
+        _write_manifest(
+            self.directory,
+            {"columns": columns, "files": [files[col] for col in columns], "rows": self.rows},
+        )
+
+        for col in df.columns:
+            if col in self._files:
+                # this snapshot keeps the replaced file mapped, its space is freed with it
+                self._table(col)
+                with suppress(OSError):
+                    os.remove(os.path.join(self.directory, self._files[col]))
+        unchanged = {col: table for col, table in self._tables.items() if col not in df.columns}
+        return ColumnStore(self.directory, unchanged)
+
+
+class StoreRows:
+    """
+    Rows start:stop of columns of a store, read by streamed responses a chunk or
+    a column at a time.
+
+    Attributes:
+        store (ColumnStore): the store.
+        columns (list): column names.
+        start, stop (int): row range within the store.
+    """
+
+    def __init__(self, store, columns=None, start=0, stop=None):
+        self.store = store
+        self.columns = store.columns if columns is None else list(columns)
+        self.stop = len(store) if stop is None else min(stop, len(store))
+        self.start = min(start, self.stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def _ranges(self, chunk_rows):
+        for start in range(self.start, self.stop, chunk_rows):
+            yield start, min(start + chunk_rows, self.stop)
+
+    def frames(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Frames of chunk_rows rows, indexed by position in the store."""
+        for start, stop in self._ranges(chunk_rows):
+            yield self.store.read(self.columns, start, stop)
+
+    def tables(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Arrow tables of chunk_rows rows with the schema of ColumnStore.table, at least one."""
+        ranges = list(self._ranges(chunk_rows)) or [(self.start, self.stop)]
+        for start, stop in ranges:
+            yield self.store.table(self.columns, start, stop)
+
+    def column(self, col):
+        """All rows of one column."""
+        return self.store.read([col], self.start, self.stop)[col]
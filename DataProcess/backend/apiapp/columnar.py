@@ -0,0 +1,145 @@
+"""
+Column-oriented responses of converted frames: Arrow IPC stream and columnar JSON.
+
+Both carry the JSON response without "data" (column definitions, total rows, ...) and all
+rows of the frame column by column, column names are not repeated per row. Rows of a column
+store (column_store.StoreRows) are read a record batch or a column at a time.
+
+Arrow IPC stream: the response is JSON in the schema metadata (RESPONSE_KEY), rows are
+record batches of DEFAULT_CHUNK_ROWS rows with the dtypes of dataframe_storage: categories are
+dictionary arrays, datetimes timestamps, timedeltas durations, complex {real, imag} structs.
+
+Columnar JSON: the response with "columns": {name: column}, where a column is
+    {"type": "int64" | "float64" | ... | "bool" | "string", "values": [...]}
+    {"type": "datetime", "unit": "us", "tz": str | null, "values": [epoch microseconds]}
+    {"type": "timedelta", "unit": "us", "values": [microseconds]}
+    {"type": "complex", "real": [...], "imag": [...]}
+    {"type": "category", "categories": [...], "codes": [...]}  -1 codes are missing values
+Missing values are null, microseconds are exact in JavaScript numbers.
+"""
+
+import io
+import itertools
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from . import dataframe_storage as dfs
+from .column_store import StoreRows
+from .ndjson import json_default
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.dataprocess.columnar+json"
+
+# schema metadata with the JSON response
+RESPONSE_KEY = b"dataprocess:response"
+# rows per record batch
+DEFAULT_CHUNK_ROWS = 64 * 1024
+
+
+def _dumps(data):
+    return json.dumps(data, default=json_default)
+
+
+def arrow_stream(header, df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Generates Arrow IPC stream of a frame with header in the schema metadata.
+
+    Args:
+        header (dict): JSON response without "data".
+        df (pd.DataFrame or column_store.StoreRows): rows, those of a store are sent from
+            its mapped files without conversion.
+        chunk_rows (int): rows per record batch.
+
+    Returns:
+        Iterator[bytes]: a piece per record batch (the first with the schema), then the
+            end of stream marker.
+    """
+    if isinstance(df, StoreRows):
+        tables = df.tables(chunk_rows)
+    else:
+        tables = iter([dfs.dataframe_to_table(df, preserve_index=False)])
+    first = next(tables)
+    metadata = {**(first.schema.metadata or {}), RESPONSE_KEY: _dumps(header)}
+    schema = first.schema.with_metadata(metadata)
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for table in itertools.chain([first], tables):
+            for batch in table.to_batches(max_chunksize=chunk_rows):
+                writer.write_batch(batch)
+                yield _take(sink)
+    yield _take(sink)
+
+
+def _take(sink):
+    """Bytes written to sink since the last call."""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def arrow_message(header):
+    """Arrow IPC stream without rows, e.g. an error response, header is in the metadata."""
+    return b"".join(arrow_stream(header, pd.DataFrame()))
+
+
+def _values(column):
+    """JSON array of column values, NaN and NaT are null, datetimes in microseconds."""
+    return column.to_json(orient="values", date_unit="us")
+
+
+def column_json(column):
+    """
+    Columnar JSON of one column, see the module description.
+
+    Returns:
+        str: JSON object text.
+    """
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = pd.Series(dtype.categories)
+        return (
+            f'{{"type": "category", "categories": {_values(categories)}, '
+            f'"codes": {_values(column.cat.codes)}}}'
+        )
+    if dtype.kind == "M":
+        tz = getattr(dtype, "tz", None)
+        return (
+            f'{{"type": "datetime", "unit": "us", "tz": {_dumps(str(tz) if tz else None)}, '
+            f'"values": {_values(column)}}}'
+        )
+    if dtype.kind == "m":
+        return f'{{"type": "timedelta", "unit": "us", "values": {_values(column)}}}'
+    if dtype.kind == "c":
+        values, missing = column.to_numpy(), column.isna().to_numpy()
+        real = pd.Series(values.real).mask(missing)
+        imag = pd.Series(values.imag).mask(missing)
+        return f'{{"type": "complex", "real": {_values(real)}, "imag": {_values(imag)}}}'
+    if dtype.kind in "iufb":
+        return f'{{"type": {_dumps(str(dtype).lower())}, "values": {_values(column)}}}'
+    return f'{{"type": "string", "values": {_values(column)}}}'
+
+
+def columnar_json(header, df):
+    """
+    Generates columnar JSON of a frame: header fields and "columns", a column at a time.
+
+    Args:
+        header (dict): JSON response without "data".
+        df (pd.DataFrame or column_store.StoreRows): rows, columns of a store are read
+            one at a time.
+
+    Returns:
+        Iterator[bytes]: parts of one JSON object.
+    """
+    start = _dumps(header)[:-1]
+    yield f'{start}{", " if header else ""}"columns": {{'.encode()
+    for i, col in enumerate(df.columns):
+        separator = ", " if i else ""
+        column = df.column(col) if isinstance(df, StoreRows) else df[col]
+        yield f"{separator}{_dumps(str(col))}: {column_json(column)}".encode()
+    yield b"}}"
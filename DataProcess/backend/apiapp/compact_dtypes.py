@@ -0,0 +1,87 @@
+"""
+Memory-compact dtypes of converted DataFrames (opt-in compact mode).
+
+Numbers are downcast to the smallest width holding every value exactly: integers to
+int8..int64, floats with integral values (integer columns pandas promoted to float64
+because of missing values) to nullable Int8..Int64, other floats to float32 when no
+value changes. Text left as object dtype is stored as Arrow-backed strings, one buffer
+instead of a Python object per value. Other dtypes are already compact.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .lru_cache import frame_size
+
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+NULLABLE_INT_DTYPES = ["Int8", "Int16", "Int32", "Int64"]
+STRING_DTYPE = "string[pyarrow]"
+# floats beyond this magnitude may not be exact integers
+MAX_EXACT_INTEGER = 2**53
+
+
+def _int_width(minimum, maximum):
+    """Index of the smallest of INT_DTYPES holding minimum and maximum."""
+    for i, dtype in enumerate(INT_DTYPES):
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return i
+    return len(INT_DTYPES) - 1
+
+
+def _compact_float(column):
+    values = column.to_numpy()
+    present = values[~np.isnan(values)]
+    if (
+        len(present)
+        and np.isfinite(present).all()
+        and np.abs(present).max() <= MAX_EXACT_INTEGER
+        and np.array_equal(np.round(present), present)
+    ):
+        width = _int_width(present.min(), present.max())
+        if len(present) == len(values):
+            return column.astype(INT_DTYPES[width])
+        return column.astype(NULLABLE_INT_DTYPES[width])
+
+    single = values.astype(np.float32)
+    with np.errstate(over="ignore"):
+        if np.array_equal(single.astype(np.float64), values, equal_nan=True):
+            return column.astype(np.float32)
+    return column
+
+
+def compact_column(column):
+    """
+    Converts a column to its memory-compact dtype, values stay the same.
+
+    Returns:
+        pd.Series: compact column, column itself when its dtype is already compact.
+    """
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return column
+    if dtype.kind == "i":
+        return pd.to_numeric(column, downcast="integer")
+    if dtype.kind == "u":
+        return pd.to_numeric(column, downcast="unsigned")
+    if dtype.kind == "f":
+        return _compact_float(column)
+    if dtype == "object" and pd.api.types.infer_dtype(column, skipna=True) == "string":
+        return column.astype(STRING_DTYPE)
+    return column
+
+
+def compact_dataframe(df):
+    """
+    Converts every column of a converted DataFrame to its memory-compact dtype.
+
+    Returns:
+        tuple (pd.DataFrame, dict): compact DataFrame (df is not modified) and
+            {'before': bytes, 'after': bytes} memory used by the frame before and after.
+    """
+    before = frame_size(df)
+    compact = pd.DataFrame(
+        {col: compact_column(df[col]) for col in df.columns}, index=df.index
+    )
+    compact.columns = df.columns
+    return compact, {"before": before, "after": frame_size(compact)}
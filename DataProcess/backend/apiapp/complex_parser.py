@@ -0,0 +1,113 @@
+"""
+Vectorized complex number parsing with the rules of infer_data_types.parse_complex.
+
+Values are split into real and imaginary text by Arrow string kernels in one pass over
+the column ('a+bj', 'a+b', 'bj', 'a') and both parts are cast to float64 at once.
+The result is the one of column.apply(parse_complex) as a complex128 array.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# missing values parse_complex returns, complex128 keeps them as (nan+0j)
+COMPLEX_NAN = complex(np.nan, 0)
+
+
+def complex_text(column):
+    """
+    Arrow string array of a column of strings.
+
+    Raises:
+        TypeError: values other than strings (missing values included), parse_complex
+            fails on them too.
+    """
+    if pd.api.types.infer_dtype(column, skipna=False) not in ("string", "empty"):
+        raise TypeError("Complex numbers are parsed from strings only")
+    return pa.array(column.to_numpy(dtype="object"), type=pa.string())
+
+
+def has_complex_marks(text):
+    """Cheap pre-check: False when no value has 'j' or '+', then values are plain numbers."""
+    return bool(len(text)) and pc.any(pc.match_substring_regex(text, "[j+]")).as_py()
+
+
+def _parse_floats(text):
+    """
+    float() of every value of a string array.
+
+    Returns:
+        tuple (np.ndarray, np.ndarray): float64 values and mask of values float() parses,
+            'nan' text is a parsed NaN.
+    """
+    try:
+        values = pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+        return values, np.ones(len(values), dtype=bool)
+    except pa.ArrowInvalid:
+        pass
+    # values Arrow doesn't cast ('  2', '1_000', text): float() of each distinct value
+    codes, uniques = pd.factorize(text.to_numpy(zero_copy_only=False))
+    values = np.full(len(uniques), np.nan)
+    parsed = np.zeros(len(uniques), dtype=bool)
+    for i, value in enumerate(uniques):
+        try:
+            values[i] = float(value)
+            parsed[i] = True
+        except ValueError:
+            pass
+    return values[codes], parsed[codes]
+
+
+def parse_complex_text(text):
+    """
+    Parses a string array like parse_complex parses each value.
+
+    Returns:
+        np.ndarray: complex128 values, (nan+0j) where parse_complex returns NaN.
+    """
+    pluses = pc.count_substring(text, "+")
+    one_plus = pc.equal(pluses, 1)
+    # 'bj' without '+', parse_complex drops the last character
+    imaginary = pc.and_(pc.equal(pluses, 0), pc.match_substring(text, "j"))
+
+    # 'a+b' and 'a+bj' are split on '+', other values are replaced with '+' to split
+    parts = pc.split_pattern(pc.if_else(one_plus, text, "+"), "+", max_splits=1)
+    real_part = pc.list_element(parts, 0)
+    imag_part = pc.list_element(parts, 1)
+    imag_part = pc.if_else(
+        pc.ends_with(imag_part, "j"), pc.utf8_slice_codeunits(imag_part, 0, -1), imag_part
+    )
+
+    # parts of the other shapes are '0', so only text of the shape of a row is parsed
+    real, real_ok = _parse_floats(
+        pc.if_else(one_plus, real_part, pc.if_else(imaginary, "0", text))
+    )
+    imag, imag_ok = _parse_floats(
+        pc.if_else(
+            one_plus,
+            imag_part,
+            pc.if_else(imaginary, pc.utf8_slice_codeunits(text, 0, -1), "0"),
+        )
+    )
+
+    parsed = np.empty(len(text), dtype="complex128")
+    parsed.real = real
+    parsed.imag = imag
+    parsed[~(real_ok & imag_ok) | (pluses.to_numpy() > 1)] = COMPLEX_NAN
+    return parsed
+
+
+def parse_complex_column(column):
+    """
+    Vectorized column.apply(parse_complex) of a column of strings.
+
+    Raises:
+        TypeError: values other than strings, missing values included.
+
+    Returns:
+        pd.Series: complex128 column with the index of column.
+    """
+    return pd.Series(
+        parse_complex_text(complex_text(column)), index=column.index, name=column.name
+    )
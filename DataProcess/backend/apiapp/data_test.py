@@ -1,21 +1,54 @@
 # from django.test import TestCase
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from .infer_data_types import *
 from .misc import *
+from .chunked_inference import (
+    infer_and_convert_chunks,
+    infer_and_write_chunks,
+    stream_infer_and_convert,
+)
+from .type_classifier import CLASSES, classify_column, classify_value, classify_values
+from . import dataframe_storage as dfs
+from .lru_cache import LRUCache, column_size
+from .column_profile import profile_column
+from .file_format import content_hash, sniff_format, read_upload
+from .parallel_inference import infer_columns_parallel
+from .datetime_formats import (
+    MIXED_FORMAT,
+    convert_datetime,
+    infer_datetime_formats,
+    mixed_fallback,
+    shape_format,
+)
+from .complex_parser import parse_complex_column
+from .compact_dtypes import compact_column, compact_dataframe
+from . import benchmark
+from . import instrumentation
+from . import excel_reader
+from . import ndjson
+from . import columnar
+from . import dataset_query
+from . import column_store
+from . import jobs
 
 import pandas as pd
 import numpy as np
 import random
 import csv
+import datetime
 from faker import Faker
 
 import glob
+import gzip
 import io
+import json
 import os
+import tempfile
 
 import memory_profiler
 import gc
+import time
 
 
 # Sample CSV string
@@ -277,3 +310,1128 @@ class BulkTesting(TestCase):
                 infer_and_convert_data_types(df)
         except Exception as e:
             self.fail(f"file {str(file_name)} exception: {e}")
+
+
+class ChunkedInferenceTesting(TestCase):
+
+    def assert_same_dtypes(self, data, chunksize):
+        expected = infer_and_convert_data_types(pd.read_csv(io.BytesIO(data)))
+        df, _ = stream_infer_and_convert(io.BytesIO(data), chunksize=chunksize)
+
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertEqual(len(df), len(expected))
+        for col in expected.columns:
+            self.assertEqual(str(df[col].dtype), str(expected[col].dtype), col)
+
+    def test_stream_matches_inferred_dtypes(self):
+        for chunksize in [1, 2, 4, 1000]:
+            self.assert_same_dtypes(csv_string.encode(), chunksize)
+
+    def test_stream_times_and_month_years(self):
+        data = (
+            b"time,clock,month,mixed\n"
+            b"01:30:00,12:00 PM,March 2020,2020-01-05\n"
+            b"00:15:42,1:30 am,April 2021,01:30\n"
+            b"23:59,11:15:30 PM,may 2019,2020-01-06\n"
+        )
+        for chunksize in [1, 2, 100]:
+            self.assert_same_dtypes(data, chunksize)
+
+    def test_stream_files_match_inferred_dtypes(self):
+        for file_name in glob.glob("backend/apiapp/TestsData/*.csv"):
+            with open(file_name, "rb") as file:
+                data = file.read()
+            for chunksize in [2, 3]:
+                self.assert_same_dtypes(data, chunksize)
+
+    def test_stream_booleans_with_missing_values(self):
+        cases = {
+            "number": "a,b\n" + "True,1\n" * 10 + ",2\n",
+            "number, nulls in one chunk": "a,b\n" + "True,1\n" * 3 + ",2\n" + "False,1\n" * 6,
+            "category": "a,b\n" + "True,1\n" * 6 + ",2\n" * 4,
+            "string": "a,b\nTrue,1\nFalse,2\n" + ",3\n" * 3,
+        }
+        for label, data in cases.items():
+            expected = infer_and_convert_data_types(pd.read_csv(io.StringIO(data)))
+            for chunksize in [2, 3, 100]:
+                with self.subTest(label, chunksize=chunksize):
+                    df, _ = stream_infer_and_convert(io.StringIO(data), chunksize=chunksize)
+                    pd.testing.assert_frame_equal(df, expected)
+
+    def test_stream_category_keeps_all_categories(self):
+        data = "Grade\n" + "\n".join(["A", "B", "A", "C"] * 5)
+        df, schema = stream_infer_and_convert(io.StringIO(data), chunksize=3)
+
+        self.assertEqual(schema["Grade"]["type"], "category")
+        self.assertTrue(df["Grade"].dtype == "category")
+        self.assertEqual(list(df["Grade"].cat.categories), ["A", "B", "C"])
+
+    def test_stream_category_over_exact_distinct(self):
+        from unittest import mock
+        from . import chunked_inference
+
+        # categories beyond the kept distinct values are collected in one more pass
+        data = "Grade,Id\n" + "\n".join(f"g{i % 8},id{i}" for i in range(40))
+        with mock.patch.object(chunked_inference, "MAX_EXACT_DISTINCT", 4):
+            df, schema = stream_infer_and_convert(io.StringIO(data), chunksize=7)
+
+        self.assertEqual(schema["Grade"]["type"], "category")
+        self.assertEqual(list(df["Grade"].cat.categories), [f"g{i}" for i in range(8)])
+        self.assertEqual(schema["Id"]["type"], "string")
+
+
+class DistinctConversionTesting(TestCase):
+
+    def test_same_as_column(self):
+        from .distinct_conversion import convert_distinct
+
+        rng = np.random.default_rng(0)
+        values = rng.choice(["1/02/2020", "13/02/2020", "n/a", None, "  1/03/2020"], 5000)
+        column = pd.Series(values, index=range(10, 5010), name="Date", dtype="object")
+        calls = []
+
+        def convert(values):
+            calls.append(len(values))
+            return convert_datetime(values, ["%d/%m/%Y"])
+
+        converted = convert_distinct(column, convert)
+        self.assertEqual(calls, [4])  # distinct values without the missing one
+        pd.testing.assert_series_equal(converted, convert_datetime(column, ["%d/%m/%Y"]))
+
+        numbers = pd.Series([str(i) for i in range(5000)], dtype="object")
+        calls.clear()
+        converted = convert_distinct(numbers, lambda values: calls.append(1) or values)
+        self.assertEqual(calls, [1])  # all distinct, the column is converted as it is
+        self.assertIs(converted, numbers)
+
+
+class CardinalityTesting(TestCase):
+
+    def test_estimate_and_merge(self):
+        from .cardinality import HyperLogLog
+
+        values = pd.Series([f"v{i}" for i in range(20_000)] * 2)
+        sketch = HyperLogLog().add(values)
+        self.assertAlmostEqual(sketch.estimate() / 20_000, 1, delta=4 * sketch.error)
+
+        # sketches of parts merge into the sketch of the whole, hashing distinct values
+        # once gives the same registers
+        merged = HyperLogLog().add(values[:15_000]).merge(
+            HyperLogLog().add(values[15_000:], categorize=True)
+        )
+        np.testing.assert_array_equal(merged.registers, sketch.registers)
+        self.assertEqual(HyperLogLog().add(["a", "a", "b"]).estimate().round(), 2)
+
+    def test_category_detection(self):
+        from .cardinality import distinct_within
+
+        rng = np.random.default_rng(0)
+        size = CATEGORY_SKETCH_MIN_ROWS
+        low = pd.Series(rng.choice(["a", "b", "c"], size).astype(object))
+        unique = pd.Series([f"id{i}" for i in range(size)], dtype="object")
+        self.assertTrue(distinct_within(low, 50, 4096))
+        self.assertFalse(distinct_within(unique, 50, 4096))
+        # near the threshold the sketch doesn't decide
+        half = pd.Series([f"v{i % (size // 2)}" for i in range(size)], dtype="object")
+        self.assertIsNone(distinct_within(half, 50, 4096))
+
+        self.assertTrue(try_convert_to_category(low, CATEGORY_UNIQUE_PERCENT_MAX)[0])
+        self.assertFalse(try_convert_to_category(unique, CATEGORY_UNIQUE_PERCENT_MAX)[0])
+        self.assertTrue(try_convert_to_category(half, CATEGORY_UNIQUE_PERCENT_MAX)[0])
+
+
+class TypeClassifierTesting(TestCase):
+
+    def test_classify_value(self):
+        self.assertEqual(classify_value("  75"), "number")
+        self.assertEqual(classify_value("1+2j"), "complex")
+        self.assertEqual(classify_value("2023-09-15 12:30:45-05:00"), "date")
+        self.assertEqual(classify_value("  01:30:00"), "clock")
+        self.assertEqual(classify_value("P0DT1H30M"), "duration")
+        self.assertEqual(classify_value("Not Available"), "word")
+        self.assertEqual(classify_value("José Núñez"), "word")
+        self.assertEqual(classify_value("cat1"), "other")
+        self.assertEqual(classify_value(True), "object")
+
+    def test_classify_values(self):
+        values = np.array(["1.5", 7, "7j", None, "Alice", "01:30", "x1"], dtype="object")
+        classes = [CLASSES[i] for i in classify_values(values)]
+
+        self.assertEqual(
+            classes, ["number", "object", "complex", "object", "word", "clock", "other"]
+        )
+        self.assertEqual(classes, [classify_value(value) for value in values])
+
+    def test_histogram_rules_out_conversions(self):
+        column = pd.Series(["Alice", "Bob", "Alice", "1", None], dtype="object")
+        histogram = classify_column(column)
+
+        self.assertEqual(histogram.nulls, 1)
+        self.assertEqual(histogram.distinct, 3)
+        self.assertEqual(histogram.percent_unique, 75)
+        for candidate in ["numeric", "complex", "datetime", "timedelta"]:
+            self.assertFalse(histogram.could_convert(candidate, errors_rate=0.2))
+
+    def test_classifier_matches_cascade(self):
+        frames = [pd.read_csv(io.StringIO(csv_string))]
+        for file_name in glob.glob("backend/apiapp/TestsData/*.csv"):
+            frames.append(pd.read_csv(file_name))
+
+        for df in frames:
+            cascade = infer_and_convert_data_types(df.copy(), engine="cascade")
+            classifier = infer_and_convert_data_types(df.copy(), engine="classifier")
+            for col in df.columns:
+                self.assertEqual(
+                    str(classifier[col].dtype), str(cascade[col].dtype), col
+                )
+
+
+class SampleInferenceTesting(TestCase):
+
+    def test_get_sample_reproducible(self):
+        column = pd.Series(range(10000))
+        first = get_sample(column, 0, 100, random_state=0)
+        second = get_sample(column, 0, 100, random_state=0)
+
+        self.assertEqual(len(first), 100)
+        self.assertTrue(first.equals(second))
+
+    def test_sample_rejects_text_column(self):
+        column = pd.Series(["Alice", "Bob", "Carol", "1.5"] * 1000, dtype="object")
+        sample = get_sample(column, 0, SAMPLE_SIZE, random_state=SAMPLE_SEED)
+
+        self.assertFalse(
+            could_convert_sample("numeric", sample, len(column), 0.2, 0.95)
+        )
+        # 25% failures are not enough to reject with 80% failure budget
+        self.assertTrue(
+            could_convert_sample("numeric", sample, len(column), 0.8, 0.95)
+        )
+
+    def test_sample_engine_matches_cascade(self):
+        frames = [pd.read_csv(io.StringIO(csv_string))]
+        for file_name in glob.glob("backend/apiapp/TestsData/*.csv"):
+            frames.append(pd.read_csv(file_name))
+
+        for df in frames:
+            cascade = infer_and_convert_data_types(df.copy(), engine="cascade")
+            sampled = infer_and_convert_data_types(df.copy(), engine="sample")
+            for col in df.columns:
+                self.assertEqual(str(sampled[col].dtype), str(cascade[col].dtype), col)
+
+
+class DataFrameStorageTesting(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "df.arrow")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_converted_dtypes_round_trip(self):
+        df = infer_and_convert_data_types(pd.read_csv(io.StringIO(csv_string)))
+        dfs.write_dataframe(df, self.path)
+        loaded = dfs.read_dataframe(self.path)
+
+        self.assertEqual(list(loaded.columns), list(df.columns))
+        for col in df.columns:
+            self.assertEqual(loaded[col].dtype, df[col].dtype, col)
+        self.assertTrue(loaded["Sum"].equals(df["Sum"]))
+        self.assertEqual(list(loaded["Grade"].cat.categories), ["A", "B"])
+
+    def test_complex_columns_only(self):
+        df = pd.DataFrame({"a": [1 + 2j, 3j, -1], "b": [0j, 1 + 1j, 2]})
+        for preserve_index in (None, False):
+            table = dfs.dataframe_to_table(df, preserve_index=preserve_index)
+            self.assertEqual(table.num_rows, 3)
+            self.assertTrue(dfs.table_to_dataframe(table).equals(df))
+
+    def test_read_selected_columns(self):
+        df = pd.read_csv(io.StringIO(csv_string))
+        dfs.write_dataframe(df, self.path)
+        loaded = dfs.read_dataframe(self.path, columns=["Score", "Name"])
+
+        self.assertEqual(list(loaded.columns), ["Score", "Name"])
+        self.assertTrue(loaded["Name"].equals(df["Name"]))
+
+    def test_chunk_writer_text_chunks(self):
+        data = "a,b\n1,\n2,x\n3,y\n"
+        with dfs.ChunkWriter(self.path, as_text=True) as writer:
+            for chunk in pd.read_csv(io.StringIO(data), dtype="object", chunksize=1):
+                writer.write(chunk)
+        loaded = dfs.read_dataframe(self.path)
+
+        self.assertEqual(loaded["a"].tolist(), ["1", "2", "3"])
+        self.assertEqual(loaded["b"].tolist()[1:], ["x", "y"])
+
+
+class LRUCacheTesting(TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_bytes=10, ttl=60, sizeof=len)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.size, 8)
+
+    def test_too_large_value_not_cached(self):
+        cache = LRUCache(max_bytes=10, ttl=60, sizeof=len)
+        cache.put("a", "a" * 11)
+
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get("a"))
+
+    def test_expired_entry(self):
+        cache = LRUCache(max_bytes=10, ttl=-1, sizeof=len)
+        cache.put("a", "aaaa")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.size, 0)
+
+    def test_column_size(self):
+        rng = np.random.default_rng(0)
+        words = pd.Series(rng.choice(["a", "bb" * 20, "ccc" * 100], 50_000)).astype(object)
+        exact = words.memory_usage(deep=True, index=False)
+        self.assertAlmostEqual(column_size(words) / exact, 1, delta=0.05)
+
+        numbers = pd.Series(rng.random(50_000))
+        self.assertEqual(column_size(numbers), numbers.memory_usage(index=False))
+        short = words.iloc[:10]
+        self.assertEqual(column_size(short), short.memory_usage(deep=True, index=False))
+
+
+class ColumnProfileTesting(TestCase):
+
+    def test_width_matches_text_of_converted_columns(self):
+        df = pd.read_csv(io.StringIO(csv_string))
+        df = infer_and_convert_data_types(df)
+        df["Dates"] = pd.to_datetime(["2020-01-01"] * 5 + [None])
+        df["Stamps"] = pd.to_datetime(["2020-01-01 10:00:00.5"] * 6)
+
+        for col in df.columns:
+            with self.subTest(col=col, dtype=df[col].dtype):
+                self.assertEqual(
+                    profile_column(df[col])["width"],
+                    max(df[col].astype(str).str.len()),
+                )
+
+    def test_float_width_is_not_below_text(self):
+        column = pd.Series([10.5, -2.3, 0.001, 1e20, np.inf, np.nan])
+        self.assertGreaterEqual(
+            profile_column(column)["width"], max(column.astype(str).str.len())
+        )
+
+        rng = random.Random(0)
+        # leading zeros of small fractions, exponent notation below 1e-4 and from 1e16
+        for values in [
+            [rng.random() for _ in range(10_000)],
+            [-0.004454133120083229],
+            [1e20],
+            [1e20, 2.5],
+            [1.2345678901234567e-300, 5e-05],
+            [1.5e16, 123.25],
+            [0.0, -0.0, 1.5],
+        ]:
+            column = pd.Series(values, dtype="float64")
+            with self.subTest(values=values[:2]):
+                self.assertEqual(
+                    profile_column(column)["width"], max(column.astype(str).str.len())
+                )
+
+    def test_distinct_estimate(self):
+        column = pd.Series([f"v{i % 70_000}" for i in range(200_000)] + [None])
+        profile = profile_column(column)
+        # estimated by a sketch, not counted
+        self.assertNotEqual(profile["distinct"], 70_000)
+        self.assertAlmostEqual(profile["distinct"] / 70_000, 1, delta=0.05)
+        self.assertEqual(profile_column(column.iloc[:1000])["distinct"], 1000)
+
+    def test_statistics(self):
+        profile = profile_column(pd.Series([3, None, 1, 3], dtype="Int64"))
+        self.assertEqual(
+            profile, {"width": 4, "nulls": 1, "min": 1, "max": 3, "distinct": 2}
+        )
+
+        profile = profile_column(pd.Series(pd.to_datetime(["2020-01-02", "2020-01-01"])))
+        self.assertEqual(profile["min"], "2020-01-01T00:00:00")
+        self.assertEqual(profile["max"], "2020-01-02T00:00:00")
+
+
+class FileFormatTesting(TestCase):
+
+    def setUp(self):
+        self.df = pd.read_csv("backend/apiapp/TestsData/sample_data_test.csv")
+
+    def read(self, data):
+        file = io.BytesIO(data)
+        file_format = sniff_format(file)
+        return file_format, read_upload(file, file_format)
+
+    def test_text_formats(self):
+        cases = {
+            ",": self.df.to_csv(index=False).encode(),
+            "\t": self.df.to_csv(index=False, sep="\t").encode(),
+            ";": self.df.to_csv(index=False, sep=";").encode("utf-16"),
+        }
+        for sep, data in cases.items():
+            with self.subTest(sep=sep):
+                file_format, df = self.read(data)
+                self.assertEqual(file_format.sep, sep)
+                self.assertEqual(df.shape, self.df.shape)
+
+    def test_gzip_csv(self):
+        file_format, df = self.read(gzip.compress(self.df.to_csv(index=False).encode()))
+        self.assertEqual(file_format.compression, "gzip")
+        self.assertEqual(df.shape, self.df.shape)
+
+        # streaming reader gets the sniffed parameters
+        file = io.BytesIO(gzip.compress(self.df.to_csv(index=False).encode()))
+        df, _ = stream_infer_and_convert(
+            file, chunksize=4, read_options=file_format.csv_options()
+        )
+        self.assertEqual(df.shape, self.df.shape)
+
+    def test_binary_formats(self):
+        for kind, write in [("excel", self.df.to_excel), ("parquet", self.df.to_parquet)]:
+            with self.subTest(kind=kind):
+                data = io.BytesIO()
+                write(data, index=False)
+                file_format, df = self.read(data.getvalue())
+                self.assertEqual(file_format.kind, kind)
+                self.assertEqual(df.shape, self.df.shape)
+
+    def test_content_hash(self):
+        data = self.df.to_csv(index=False).encode()
+        file = io.BytesIO(data)
+        file.seek(5)
+
+        digest = content_hash(file)
+        self.assertEqual(file.tell(), 0)
+        self.assertEqual(digest, content_hash(io.BytesIO(data)))
+        self.assertNotEqual(digest, content_hash(io.BytesIO(data + b"\n")))
+
+    def test_unknown_binary(self):
+        with self.assertRaises(ValueError):
+            sniff_format(io.BytesIO(b"\x00\x01\x02 not a table"))
+
+
+class ParallelInferenceTesting(TestCase):
+
+    def test_same_as_serial(self):
+        df = pd.read_csv("backend/apiapp/TestsData/sample_data_test.csv")
+        df = pd.concat([df] * 2000, ignore_index=True)
+
+        for engine in ["classifier", "sample"]:
+            with self.subTest(engine=engine):
+                expected = infer_and_convert_data_types(df.copy(), engine=engine)
+                result = infer_and_convert_data_types(df.copy(), engine=engine, workers=2)
+                pd.testing.assert_frame_equal(result, expected)
+
+    def test_datetime_same_as_serial(self):
+        rng = np.random.default_rng(0)
+        times = pd.date_range("2020-01-01", periods=20000, freq="h")
+        iso = times.strftime("%Y-%m-%d %H:%M").to_numpy(dtype="object")
+        df = pd.DataFrame(
+            {
+                "day_first": times.strftime("%d/%m/%Y").to_numpy(dtype="object"),
+                "failures": np.where(rng.random(len(times)) < 0.1, "Not Available", iso),
+                "formats": np.where(
+                    rng.random(len(times)) < 0.5, iso, times.strftime("%m/%d/%Y")
+                ),
+            }
+        ).astype("object")
+        # month-first dates of the same layout converted before don't change the result
+        infer_and_convert_data_types(pd.DataFrame({"a": ["12/25/2020"] * 5 + ["01/02/2021"]}))
+
+        expected = infer_and_convert_data_types(df.copy())
+        result = infer_and_convert_data_types(df.copy(), workers=2)
+
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(expected["day_first"][24 * 12], pd.Timestamp("2020-01-13"))
+        self.assertEqual(str(expected["failures"].dtype), "datetime64[ns]")
+        self.assertEqual(str(expected["formats"].dtype), "datetime64[ns, UTC]")
+
+    def test_keeps_nulls_and_index(self):
+        df = pd.read_csv(io.StringIO(csv_string))
+        df.index = df.index + 10
+        df["Names"] = ["a", None, "b", "a", None, "b"]
+        columns = list(df.select_dtypes(include=["object"]).columns)
+
+        results = infer_columns_parallel(df, columns, workers=2, min_rows=0)
+        for col in columns:
+            expected = infer_column(df[col])
+            if expected is None:
+                self.assertNotIn(col, results)
+            else:
+                pd.testing.assert_series_equal(results[col], expected, check_names=False)
+
+
+class JobsTesting(TestCase):
+
+    def wait(self, job):
+        for _ in range(100):
+            if job.status in ("done", "failed"):
+                return job.to_dict()
+            time.sleep(0.01)
+        self.fail("job didn't finish")
+
+    def test_progress_and_result(self):
+        def count_columns(columns, progress):
+            progress.start("infer", total=len(columns))
+            for _ in columns:
+                progress.advance("infer")
+            progress.finish("infer")
+            return len(columns)
+
+        state = self.wait(jobs.submit(count_columns, ["a", "b"]))
+        self.assertEqual(state["status"], "done")
+        self.assertEqual(state["result"], 2)
+        self.assertEqual(state["stages"]["infer"], {"status": "done", "done": 2, "total": 2})
+        self.assertEqual(state["stages"]["read"]["status"], "pending")
+
+    def test_failure(self):
+        def fail(progress):
+            raise jobs.JobError("No Excel or CSV data")
+
+        job = jobs.submit(fail)
+        state = self.wait(job)
+        self.assertEqual(state["status"], "failed")
+        self.assertEqual(state["error"], "No Excel or CSV data")
+        self.assertIs(jobs.get_job(job.id), job)
+
+
+class DatetimeFormatsTesting(TestCase):
+
+    def test_shape_format(self):
+        self.assertEqual(shape_format("9/99/9999"), "%m/%d/%Y")
+        self.assertEqual(shape_format("9999-99-99T99:99:99Z"), "%Y-%m-%dT%H:%M:%S%z")
+        self.assertEqual(shape_format("99-Mar-99"), "%d-%b-%y")
+        self.assertEqual(shape_format("9999999999999"), "epoch:ms")
+        self.assertIsNone(shape_format("abc"))
+
+    def test_day_first_wins_when_it_parses_more(self):
+        column = pd.Series(["1/05/2020", "13/05/2020", "25/12/2020", None])
+        formats = infer_datetime_formats(column, percent_to_check=1)
+        self.assertEqual(formats, ("%d/%m/%Y",))
+        converted = convert_datetime(column, formats)
+        self.assertEqual(converted[0], pd.Timestamp("2020-05-01"))
+        self.assertTrue(pd.isna(converted[3]))
+
+    def test_several_formats_convert_to_utc(self):
+        column = pd.Series(
+            ["2020-01-05", " 1/06/2020", "2020-01-05T10:00:00Z", "2020-01-05 10:00:00+05:00", "x"]
+        )
+        formats = infer_datetime_formats(column, percent_to_check=1)
+        converted = convert_datetime(column, formats)
+        self.assertEqual(str(converted.dtype), "datetime64[ns, UTC]")
+        expected = pd.to_datetime(column[:4].str.strip(), format="mixed", utc=True)
+        pd.testing.assert_series_equal(converted[:4], expected, check_names=False)
+        self.assertTrue(pd.isna(converted[4]))
+
+    def test_sample_missing_formats_are_found(self):
+        # one value in a thousand of another layout still converts
+        column = pd.Series(["2020-01-05"] * 999 + ["Jan 6, 2020"])
+        result, converted = try_convert_to_datetime(column, errors_rate=0)
+        self.assertTrue(result)
+        self.assertEqual(converted.iloc[-1], pd.Timestamp("2020-01-06", tz="UTC"))
+
+    def test_single_format_keeps_naive_values(self):
+        column = pd.Series(["2021-01-05", "2021-02-05", None, "Not Available"])
+        result, converted = try_convert_to_datetime(column, errors_rate=0.5)
+        self.assertTrue(result)
+        self.assertEqual(str(converted.dtype), "datetime64[ns]")
+        self.assertEqual(converted[1], pd.Timestamp("2021-02-05"))
+
+    def test_sample_without_datetimes_does_not_reject(self):
+        column = pd.Series([f"2021-01-{day:02}" for day in range(1, 18)] + ["Not Available"] * 3)
+        # as if the sample held only 'Not Available'
+        with mock.patch(
+            f"{try_convert_to_datetime.__module__}.infer_datetime_formats", return_value=()
+        ):
+            result, converted = try_convert_to_datetime(column, errors_rate=0.2)
+        self.assertTrue(result)
+        self.assertEqual(int(converted.notna().sum()), 17)
+
+    def test_formats_of_a_column_do_not_leak_to_the_next(self):
+        iso = pd.Series(["2021-01-05"] * 1000)
+        self.assertEqual(infer_datetime_formats(iso), ("%Y-%m-%d",))
+        # ISO dates with a day-first date the sample likely misses
+        day_first = pd.Series(["2021-01-05"] * 999 + ["25/12/2021"])
+        result, converted = try_convert_to_datetime(day_first, errors_rate=0)
+        self.assertTrue(result)
+        self.assertEqual(converted.iloc[-1], pd.Timestamp("2021-12-25", tz="UTC"))
+
+        self.assertEqual(infer_datetime_formats(iso), ("%Y-%m-%d",))
+        month_first = pd.Series(["2021-01-05"] * 999 + ["01/02/2021"])
+        result, converted = try_convert_to_datetime(month_first, errors_rate=0)
+        self.assertEqual(converted.iloc[-1], pd.Timestamp("2021-01-02", tz="UTC"))
+
+    def test_epoch_out_of_range_is_nat(self):
+        column = pd.Series(["2021-01-05"] * 5 + ["1609459200"] * 3 + ["99999999999999999999"])
+        for engine in ("classifier", "cascade", "sample"):
+            df = infer_and_convert_data_types(pd.DataFrame({"a": column}), engine=engine)
+            self.assertEqual(str(df["a"].dtype), "datetime64[ns, UTC]", engine)
+            self.assertEqual(df["a"][5], pd.Timestamp("2021-01-01", tz="UTC"))
+            self.assertTrue(pd.isna(df["a"][8]))
+
+        numbers = pd.Series([1609459200, 1e20, -1e300, np.nan])
+        converted = convert_datetime(numbers, ["epoch:s"])
+        self.assertEqual(converted[0], pd.Timestamp("2021-01-01"))
+        self.assertEqual(int(converted.isna().sum()), 3)
+
+    def test_text_is_not_datetime(self):
+        column = pd.Series([f"abc {i}" for i in range(100)])
+        self.assertEqual(infer_datetime_formats(column), ())
+        self.assertEqual(try_convert_to_datetime(column, errors_rate=0.2), (False, None))
+
+    def test_times_and_month_years_are_datetime(self):
+        # first value: a timestamp, or the time of today values without a date get
+        columns = {
+            "time": (["01:30:00", "00:15:42", "23:59"], pd.Timedelta("1h30m")),
+            "clock": (["12:00 PM", "1:30 am", "11:15:30 PM"], pd.Timedelta("12h")),
+            "month": (["March 2020", "April 2021", "may 2019"], pd.Timestamp("2020-03-01")),
+            "mon": (["Mar 2020", "Apr 2021", "Sep 2019"], pd.Timestamp("2020-03-01")),
+            "now": (["2020-01-05", "today", "now"], pd.Timestamp("2020-01-05")),
+            "mixed": (["2020-01-05", "01:30", "2020-01-06"], pd.Timestamp("2020-01-05", tz="UTC")),
+        }
+        for engine in ("classifier", "cascade", "sample"):
+            for name, (values, first) in columns.items():
+                df = infer_and_convert_data_types(pd.DataFrame({name: values}), engine=engine)
+                self.assertTrue(pd.api.types.is_datetime64_any_dtype(df[name]), (engine, name))
+                self.assertEqual(int(df[name].isna().sum()), 0, (engine, name))
+                value = df[name][0]
+                if isinstance(first, pd.Timedelta):
+                    value = value - value.normalize()
+                self.assertEqual(value, first, (engine, name))
+
+        # durations of more than a day are not times, such a column stays timedelta
+        result, _ = try_convert_to_datetime(pd.Series(["01:30:00", "102:30:50", "02:00:00"]), 0.2)
+        self.assertFalse(result)
+
+    def test_mixed_parser_is_a_fallback(self):
+        column = pd.Series(["2021-01-05", "2021-02-05", "12:00 PM"])
+        formats = list(infer_datetime_formats(column, percent_to_check=1))
+        self.assertEqual(formats, ["%Y-%m-%d"])
+        converted = mixed_fallback(column, formats, convert_datetime(column, formats))
+        self.assertEqual(formats, ["%Y-%m-%d", MIXED_FORMAT])
+        self.assertEqual(str(converted.dtype), "datetime64[ns, UTC]")
+        self.assertEqual(converted[1], pd.Timestamp("2021-02-05", tz="UTC"))
+
+        # values no parser reads leave the formats as they are
+        text = pd.Series(["abc", "2021-01-05"])
+        formats = ["%Y-%m-%d"]
+        converted = mixed_fallback(text, formats, convert_datetime(text, formats))
+        self.assertEqual(formats, ["%Y-%m-%d"])
+        self.assertEqual(str(converted.dtype), "datetime64[ns]")
+
+
+class ComplexParserTesting(TestCase):
+
+    def test_same_as_parse_complex(self):
+        column = pd.Series(
+            ["1+2j", "2+3j", "3+2", "7j", "-7j", "8", " 1.5 +-2.5j"]
+            + ["1+2+3j", "1+2J", "", "abc", "1_0+j"]
+        )
+        expected = column.apply(parse_complex).astype("complex128")
+        pd.testing.assert_series_equal(parse_complex_column(column), expected)
+
+    def test_missing_values_fail(self):
+        column = pd.Series(["1+2j", np.nan])
+        self.assertRaises(TypeError, parse_complex_column, column)
+        self.assertEqual(try_convert_to_complex(column, errors_rate=1), (False, None))
+
+    def test_column_without_marks_is_rejected(self):
+        column = pd.Series(["1", "2", "abc"])
+        self.assertEqual(try_convert_to_complex(column, errors_rate=1), (False, None))
+
+
+class CompactDtypesTesting(TestCase):
+
+    def test_downcast_keeps_values(self):
+        cases = [
+            (pd.Series([1, 2, 300]), "int16"),
+            (pd.Series([1.0, np.nan, -5.0]), "Int8"),
+            (pd.Series([1.0, 2.0, 70000.0]), "int32"),
+            (pd.Series([0.5, 0.25, np.nan]), "float32"),
+            (pd.Series([0.1, 0.2]), "float64"),
+            (pd.Series(["a", None, "b"]), "string"),
+            (pd.Series(["a", 1]), "object"),
+        ]
+        for column, dtype in cases:
+            with self.subTest(dtype=dtype):
+                compact = compact_column(column)
+                self.assertEqual(str(compact.dtype), dtype)
+                self.assertEqual(
+                    compact.astype("object").where(compact.notna(), None).tolist(),
+                    column.astype("object").where(column.notna(), None).tolist(),
+                )
+
+    def test_memory_report(self):
+        df = infer_and_convert_data_types(
+            pd.read_csv("backend/apiapp/TestsData/sample_data.csv", dtype="object")
+        )
+        compact, memory = compact_dataframe(df)
+        self.assertEqual(memory["before"], df.memory_usage(deep=True).sum())
+        self.assertLess(memory["after"], memory["before"])
+        self.assertEqual(list(compact.columns), list(df.columns))
+
+
+class BenchmarkTesting(TestCase):
+
+    def test_datasets_are_reproducible(self):
+        df = benchmark.make_dataset(500, columns=9, seed=1)
+        self.assertTrue(df.equals(benchmark.make_dataset(500, columns=9, seed=1)))
+        self.assertEqual(len(df.columns), 9)
+        converted = infer_and_convert_data_types(df.copy())
+        types = {col.rsplit("_", 1)[0]: str(dt) for col, dt in converted.dtypes.items()}
+        self.assertEqual(types["numeric"], "float64")
+        self.assertEqual(types["dirty_numeric"], "float64")
+        self.assertTrue(types["mixed_datetime"].startswith("datetime64"))
+        self.assertEqual(types["timedelta"], "timedelta64[ns]")
+        self.assertEqual(types["complex"], "complex128")
+        self.assertEqual(types["low_cardinality"], "category")
+        self.assertEqual(types["text"], "object")
+
+    def test_results_and_regressions(self):
+        results = benchmark.run_benchmark(rows=[300], repeat=1)
+        stages = results["datasets"][0]["stages"]
+        for stage in benchmark.STAGES + ["infer:numeric", "infer:datetime"]:
+            self.assertIn(stage, stages)
+            self.assertGreaterEqual(stages[stage]["peak_bytes"], 0)
+        self.assertGreaterEqual(stages["infer"]["seconds"], stages["infer:datetime"]["seconds"])
+        self.assertIsNone(instrumentation.current())
+
+        slower = json.loads(json.dumps(results))
+        slower["datasets"][0]["stages"]["infer"]["seconds"] = 10 * max(
+            stages["infer"]["seconds"], benchmark.MIN_SLOWDOWN_SECONDS
+        )
+        regressions = benchmark.compare(slower, results)
+        self.assertEqual([r["stage"] for r in regressions], ["infer"])
+        self.assertEqual(benchmark.compare(results, results), [])
+
+        # datasets of another configuration are not compared
+        other = json.loads(json.dumps(slower))
+        other["parameters"]["engine"] = "cascade"
+        self.assertEqual(benchmark.compare(other, results), [])
+        other = json.loads(json.dumps(slower))
+        other["parameters"]["kinds"] = ["numeric"]
+        self.assertEqual(benchmark.compare(other, results), [])
+
+    def test_short_stages_are_not_regressions(self):
+        def results(seconds):
+            stages = {"read": {"seconds": seconds}}
+            return {
+                "parameters": {"kinds": ["numeric"], "engine": "classifier", "seed": 0},
+                "datasets": [{"rows": 10, "columns": 1, "stages": stages}],
+            }
+
+        # twice as slow, but by less than MIN_SLOWDOWN_SECONDS
+        self.assertEqual(benchmark.compare(results(0.04), results(0.02)), [])
+        self.assertEqual(len(benchmark.compare(results(0.2), results(0.1))), 1)
+
+    def test_median_of_runs_with_different_stages(self):
+        def stats(seconds):
+            return {"seconds": seconds, "cpu_seconds": seconds, "calls": 1}
+
+        runs = [
+            {"infer": stats(1.0), "infer:datetime": stats(0.5)},
+            {"infer": stats(3.0)},
+            {"infer": stats(2.0), "infer:datetime": stats(0.7)},
+        ]
+        stages = benchmark._median_stages(runs)
+        self.assertEqual(stages["infer"]["seconds"], 2.0)
+        self.assertEqual(stages["infer:datetime"]["seconds"], 0.5)
+        self.assertEqual(stages["infer:datetime"]["calls"], 1)
+
+
+class InstrumentationTesting(TestCase):
+
+    def test_stages(self):
+        trace = instrumentation.Trace("test")
+        with instrumentation.activate(trace):
+            with instrumentation.stage("infer"):
+                infer_and_convert_data_types(
+                    pd.DataFrame({"a": ["1", "2", "x"], "b": ["2020-01-01"] * 3}),
+                    [{"field": "a", "type": "number"}],
+                )
+                with instrumentation.stage("infer"):
+                    pass
+        # without an active trace stages are not recorded
+        with instrumentation.stage("read"):
+            pass
+
+        self.assertEqual(
+            list(trace.stages), ["infer", "convert:number", "infer:classify", "infer:datetime"]
+        )
+        self.assertEqual(trace.stages["infer"]["calls"], 1)
+        self.assertGreaterEqual(
+            trace.stages["infer"]["seconds"], trace.stages["infer:datetime"]["seconds"]
+        )
+
+        instrumentation.reset()
+        instrumentation.record(trace)
+        timing = instrumentation.server_timing(trace)
+        self.assertTrue(timing.startswith("total;dur="))
+        self.assertIn('infer.datetime;dur=', timing)
+        metrics = instrumentation.metrics()
+        self.assertEqual(metrics["endpoints"]["test"]["requests"], 1)
+        self.assertEqual(metrics["endpoints"]["test"]["stages"]["infer"]["calls"], 1)
+        self.assertEqual(len(metrics["recent"]), 1)
+        instrumentation.reset()
+
+
+class ExcelReaderTesting(TestCase):
+
+    def workbook(self):
+        import openpyxl
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Data"
+        sheet.append(["a", "a", None, 2020])
+        sheet.append([1, 2.5, datetime.datetime(2020, 1, 2, 3, 4), True])
+        sheet.append([None, None, None, None])
+        sheet.append([3, None, datetime.timedelta(days=1, hours=2), "x"])
+        sheet.append([None, None, None, None])
+        workbook.create_sheet("Other").append(["b"])
+        file_obj = io.BytesIO()
+        workbook.save(file_obj)
+        return file_obj, sniff_format(file_obj)
+
+    def test_list_sheets(self):
+        file_obj, file_format = self.workbook()
+        self.assertEqual(
+            excel_reader.list_sheets(file_obj, file_format),
+            [
+                {"name": "Data", "rows": 4, "columns": 4},
+                {"name": "Other", "rows": 0, "columns": 1},
+            ],
+        )
+
+    def test_read_sheet_chunks(self):
+        file_obj, file_format = self.workbook()
+        chunks = list(excel_reader.read_sheet_chunks(file_obj, file_format, "Data", chunksize=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        df = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(list(df.columns), ["a", "a.1", "Unnamed: 2", "2020"])
+        self.assertEqual(
+            df.iloc[:, 2].tolist(), ["2020-01-02 03:04:00", None, "1 days 02:00:00"]
+        )
+        self.assertEqual(df.iloc[0].tolist()[:2] + [df.iloc[0, 3]], ["1", "2.5", "True"])
+        self.assertEqual(list(excel_reader.read_sheet_chunks(file_obj, file_format, "Other")), [])
+
+    def test_infer_from_stored_chunks(self):
+        data = open("backend/apiapp/TestsData/sample_data.csv").read()
+        expected, _ = stream_infer_and_convert(io.StringIO(data), chunksize=2)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "raw.arrow")
+            with dfs.ChunkWriter(path, as_text=True) as writer:
+                for chunk in pd.read_csv(io.StringIO(data), dtype="object", chunksize=2):
+                    writer.write(chunk)
+            df, _ = infer_and_convert_chunks(
+                lambda usecols=None: dfs.read_batches(path, usecols)
+            )
+        self.assertEqual(df.dtypes.to_dict(), expected.dtypes.to_dict())
+
+
+class NDJSONTesting(TestCase):
+
+    def test_lines(self):
+        df = infer_and_convert_data_types(
+            pd.read_csv("backend/apiapp/TestsData/sample_data_test.csv", dtype="object")
+        )
+        chunks = list(ndjson.ndjson_lines({"total_rows": len(df)}, df, chunk_rows=4))
+        self.assertEqual(len(chunks), 1 + 3)
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(json.loads(lines[0]), {"total_rows": len(df)})
+        self.assertEqual(
+            [json.loads(line) for line in lines[1:]],
+            json.loads(df.to_json(orient="records", date_format="iso")),
+        )
+        self.assertEqual(list(ndjson.ndjson_lines({}, df.iloc[:0])), [b"{}\n"])
+        self.assertEqual(ndjson.dumps_line({"n": np.int64(1)}), b'{"n": 1}\n')
+
+
+class ColumnarTesting(TestCase):
+
+    def setUp(self):
+        self.df = infer_and_convert_data_types(
+            pd.read_csv("backend/apiapp/TestsData/sample_data_test.csv", dtype="object")
+        )
+
+    def test_arrow_stream(self):
+        import pyarrow as pa
+
+        chunks = list(columnar.arrow_stream({"total_rows": len(self.df)}, self.df, chunk_rows=4))
+        self.assertEqual(len(chunks), 3 + 1)
+        table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+        response = json.loads(table.schema.metadata[columnar.RESPONSE_KEY])
+        self.assertEqual(response, {"total_rows": 10})
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("CategoryData").type))
+        pd.testing.assert_frame_equal(dfs.table_to_dataframe(table), self.df)
+
+        empty = pa.ipc.open_stream(columnar.arrow_message({"error": "x"})).read_all()
+        self.assertEqual(empty.num_rows, 0)
+        self.assertEqual(json.loads(empty.schema.metadata[columnar.RESPONSE_KEY]), {"error": "x"})
+
+    def test_columnar_json(self):
+        response = json.loads(b"".join(columnar.columnar_json({"total_rows": 10}, self.df)))
+        self.assertEqual(response["total_rows"], 10)
+        columns = response["columns"]
+        self.assertEqual(list(columns), list(self.df.columns))
+        self.assertEqual(columns["IntData"]["type"], "int64")
+        self.assertEqual(columns["IntData"]["values"], self.df["IntData"].tolist())
+        category = columns["CategoryData"]
+        self.assertEqual(
+            [category["categories"][code] for code in category["codes"]],
+            self.df["CategoryData"].astype(str).tolist(),
+        )
+        dates = columns["DateTimeData"]
+        self.assertEqual(
+            pd.to_datetime(dates["values"], unit="us").tolist(), self.df["DateTimeData"].tolist()
+        )
+
+        complex_ = columnar.column_json(pd.Series([1 + 2j, np.nan]))
+        self.assertEqual(
+            json.loads(complex_), {"type": "complex", "real": [1.0, None], "imag": [2.0, None]}
+        )
+        empty = json.loads(b"".join(columnar.columnar_json({}, self.df.iloc[:, :0])))
+        self.assertEqual(empty, {"columns": {}})
+
+
+class DatasetQueryTesting(TestCase):
+
+    def setUp(self):
+        self.df = infer_and_convert_data_types(
+            pd.read_csv("backend/apiapp/TestsData/sample_data_test.csv", dtype="object")
+        )
+
+    def test_rows(self):
+        df = self.df
+        query = {
+            "columns": ["IntData", "CategoryData"],
+            "filters": [
+                {"field": "DateTimeData", "op": "range", "min": "2020-01-03"},
+                {"field": "NonStandardDate", "op": "range", "max": "2020-03-01"},
+                {"field": "CategoryData", "op": "contains", "value": "type a"},
+            ],
+            "sort": [{"field": "IntData", "desc": True}],
+        }
+        page, total = dataset_query.run_query(df, query, offset=1, limit=1)
+        expected = df[
+            (df["DateTimeData"] >= "2020-01-03") & (df["CategoryData"] == "Type A")
+        ].sort_values("IntData", ascending=False)[["IntData", "CategoryData"]]
+        self.assertEqual(total, len(expected))
+        pd.testing.assert_frame_equal(page, expected.iloc[1:2].reset_index(drop=True))
+
+        page, total = dataset_query.run_query(
+            df, {"filters": [{"field": "IntData", "op": "in", "values": [100, "400"]}]}
+        )
+        self.assertEqual(page["IntData"].tolist(), [100, 400])
+
+    def test_aggregates(self):
+        query = {
+            "group_by": ["CategoryData"],
+            "aggregates": [{"func": "count"}, {"field": "IntData", "func": "sum"}],
+            "sort": [{"field": "sum(IntData)"}],
+        }
+        page, total = dataset_query.run_query(self.df, query)
+        expected = self.df.groupby("CategoryData", observed=True)["IntData"].sum().sort_values()
+        self.assertEqual(total, 3)
+        self.assertEqual(page["CategoryData"].tolist(), expected.index.tolist())
+        self.assertEqual(page["sum(IntData)"].tolist(), expected.tolist())
+        self.assertEqual(page["count"].sum(), len(self.df))
+
+        page, total = dataset_query.run_query(
+            self.df, {"aggregates": [{"field": "FloatData", "func": "max"}]}
+        )
+        self.assertEqual(page.iloc[0, 0], self.df["FloatData"].max())
+
+    def test_errors(self):
+        for query in [
+            {"columns": ["Nope"]},
+            {"filters": [{"field": "TextData", "op": "range", "min": 1}]},
+            {"filters": [{"field": "IntData", "op": "range", "min": "x"}]},
+            {"filters": [{"field": "IntData", "op": "like"}]},
+            {"aggregates": [{"field": "IntData", "func": "mode"}]},
+            {"aggregates": [{"field": "CategoryData", "func": "sum"}]},
+            {"columns": ["IntData", "IntData"]},
+            {"group_by": ["CategoryData", "CategoryData"]},
+            {"sort": [{"field": "IntData"}, {"field": "IntData", "desc": True}]},
+        ]:
+            with self.subTest(query=query):
+                with self.assertRaises(dataset_query.QueryError):
+                    dataset_query.run_query(self.df, query)
+
+        # the count of groups would replace the group_by column
+        df = pd.DataFrame({"count": [1, 1, 2]})
+        with self.assertRaises(dataset_query.QueryError):
+            dataset_query.run_query(df, {"group_by": ["count"], "aggregates": [{"func": "count"}]})
+
+    def test_query_fields(self):
+        columns = list(self.df.columns)
+        query = {
+            "columns": ["CategoryData"],
+            "filters": [{"field": "IntData", "op": "range", "min": 0}],
+            "sort": [{"field": "FloatData"}],
+        }
+        fields = dataset_query.query_fields(query, columns)
+        self.assertEqual(fields, ["IntData", "FloatData", "CategoryData"])
+        page, _ = dataset_query.run_query(self.df[fields], query)
+        pd.testing.assert_frame_equal(page, dataset_query.run_query(self.df, query)[0])
+
+        query = {"group_by": ["CategoryData"], "aggregates": [{"func": "count"}]}
+        self.assertEqual(dataset_query.query_fields(query, columns), ["CategoryData"])
+        self.assertEqual(dataset_query.query_fields({}, columns), columns)
+
+
+class ColumnStoreTesting(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, chunks):
+        with column_store.StoreWriter(self.dir.name) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+        return writer.store
+
+    def test_chunks_of_different_dtypes(self):
+        chunks = [
+            pd.DataFrame(
+                {
+                    "n": [1, 2],
+                    "d": pd.Series([pd.NaT, pd.NaT], dtype="datetime64[ns]"),
+                    "t": pd.to_datetime(["2020-01-01T10:00+01:00"] * 2),
+                    "s": [None, None],
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "n": [2.5, np.nan],
+                    "d": pd.to_datetime(["2020-01-01T10:00+02:00", None]),
+                    "t": pd.to_datetime(["2020-06-01T10:00+02:00"] * 2),
+                    "s": ["x", None],
+                }
+            ),
+        ]
+        df = self.write(chunks).read()
+
+        self.assertEqual(df["n"].tolist()[:3], [1.0, 2.0, 2.5])
+        # a chunk without datetimes takes the time zone of the others
+        self.assertEqual(df["d"].iloc[2].utcoffset(), pd.Timedelta(hours=2))
+        self.assertTrue(df["d"].iloc[[0, 1, 3]].isna().all())
+        # different time zones are combined in UTC
+        self.assertEqual(str(df["t"].dtype), "datetime64[ns, UTC]")
+        self.assertEqual(df["t"].iloc[2], pd.Timestamp("2020-06-01 08:00", tz="UTC"))
+        self.assertEqual(df["s"].iloc[2], "x")
+
+    def test_stream_matches_chunked_conversion(self):
+        data = open("backend/apiapp/TestsData/sample_data_test.csv", "rb").read()
+        read_chunks = lambda usecols=None: pd.read_csv(
+            io.BytesIO(data), dtype="object", chunksize=3, usecols=usecols
+        )
+        expected, schema = infer_and_convert_chunks(read_chunks)
+        with column_store.StoreWriter(self.dir.name) as writer:
+            written = infer_and_write_chunks(read_chunks, writer.write)
+        store = writer.store
+
+        self.assertEqual(written, schema)
+        self.assertEqual(store.columns, list(expected.columns))
+        self.assertEqual(len(store), len(expected))
+        page = store.read(["FloatData", "CategoryData"], 4, 7)
+        self.assertEqual(list(page.index), [4, 5, 6])
+        for col in ["FloatData", "CategoryData", "IntData", "DateTimeData"]:
+            self.assertEqual(store.column(col).dtype, expected[col].dtype, col)
+            self.assertTrue(store.column(col).equals(expected[col]), col)
+        for col in page.columns:
+            self.assertTrue(page[col].equals(expected[col].iloc[4:7]), col)
+
+    def test_complex_column(self):
+        import pyarrow as pa
+
+        chunks = [
+            pd.DataFrame({"c": [1 + 2j, 3j], "n": [1, 2]}),
+            pd.DataFrame({"c": [np.nan, 2 - 1j], "n": [3, 4]}),
+        ]
+        store = self.write(chunks)
+        expected = pd.concat(chunks, ignore_index=True)
+
+        pd.testing.assert_frame_equal(store.read(), expected)
+        pd.testing.assert_frame_equal(store.read(["c"], 1, 3), expected[["c"]].iloc[1:3])
+        rows = column_store.StoreRows(store, start=1)
+        pd.testing.assert_frame_equal(pd.concat(rows.frames(chunk_rows=2)), expected.iloc[1:])
+        tables = list(rows.tables(chunk_rows=2))
+        self.assertEqual(len(tables), 2)
+        pd.testing.assert_frame_equal(
+            dfs.table_to_dataframe(pa.concat_tables(tables)),
+            expected.iloc[1:].reset_index(drop=True),
+        )
+        self.assertTrue(rows.column("c").equals(expected["c"].iloc[1:]))
+
+        # complex columns only, e.g. a column converted by apply-conversion
+        updated = store.write_columns(pd.DataFrame({"c": expected["c"] * 2}))
+        self.assertTrue(updated.column("c").equals(expected["c"] * 2))
+        table = updated.table(["c", "n"], 0, 1)
+        self.assertEqual(dfs.table_to_dataframe(table).iloc[0].tolist(), [2 + 4j, 1])
+
+    def test_write_columns_keeps_snapshot(self):
+        store = self.write([pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})])
+        store.read(["a"])
+        updated = store.write_columns(pd.DataFrame({"a": ["1", "2", "3"], "c": [0.5] * 3}))
+
+        self.assertEqual(updated.columns, ["a", "b", "c"])
+        self.assertEqual(updated.column("a").tolist(), ["1", "2", "3"])
+        self.assertEqual(column_store.ColumnStore(self.dir.name).column("c").tolist(), [0.5] * 3)
+        # the previous snapshot still reads its columns
+        self.assertEqual(store.column("a").tolist(), [1, 2, 3])
+        self.assertEqual(store.columns, ["a", "b"])
+
+
+class BlockConversionTesting(TestCase):
+
+    def test_early_abort(self):
+        size = 40 * MIN_BLOCK_ROWS
+        # distinct values, so blocks are converted as they are
+        column = pd.Series(
+            [f"{i}.5" for i in range(size // 2)] + [f"x{i}" for i in range(size // 2)]
+        )
+        blocks = []
+
+        def convert(block):
+            blocks.append(len(block))
+            return pd.to_numeric(block, errors="coerce")
+
+        self.assertIsNone(convert_in_blocks(column, convert, 0.2))
+        # failures exceed 20% of the column within the first blocks of text
+        self.assertLess(sum(blocks), size * 0.75)
+
+        blocks.clear()
+        converted = convert_in_blocks(column, convert, 0.5)
+        self.assertEqual(sum(blocks), size)
+        pd.testing.assert_series_equal(converted, pd.to_numeric(column, errors="coerce"))
+
+    def test_same_as_whole_column(self):
+        size = 3 * MIN_BLOCK_ROWS
+        numbers = pd.Series([str(i) for i in range(size)], dtype="object")
+        numbers.iloc[-10:] = "n/a"
+        _, converted = try_convert_to_numeric(numbers, 0.2)
+        pd.testing.assert_series_equal(converted, pd.to_numeric(numbers, errors="coerce"))
+
+        # naive blocks and a block of values with offsets are combined in UTC
+        dates = pd.Series(["2020-01-02 10:00:00"] * size, dtype="object")
+        dates.iloc[-5:] = "2020-01-02T10:00:00+02:00"
+        result, converted = try_convert_to_datetime(dates, 0.2)
+        self.assertTrue(result)
+        self.assertEqual(str(converted.dtype), "datetime64[ns, UTC]")
+        self.assertEqual(converted.iloc[0], pd.Timestamp("2020-01-02 10:00:00", tz="UTC"))
+        self.assertEqual(converted.iloc[-1], pd.Timestamp("2020-01-02 08:00:00", tz="UTC"))
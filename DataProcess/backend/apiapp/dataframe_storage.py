@@ -0,0 +1,188 @@
+"""
+Binary columnar storage of DataFrames in Arrow IPC (Feather v2) files.
+
+Files are written uncompressed so they can be memory-mapped and read without copying
+Arrow buffers. Pandas dtypes round-trip exactly through Arrow schema metadata,
+complex columns which Arrow doesn't support are stored as {real, imag} structs.
+"""
+
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+# field metadata marking a struct column as complex numbers
+COMPLEX_KEY = b"dataprocess:complex"
+# schema metadata with the original column order
+COLUMNS_KEY = b"dataprocess:columns"
+
+
+def dataframe_to_table(df, preserve_index=None):
+    """
+    Converts DataFrame to Arrow Table.
+
+    Object columns Arrow can't convert (values of mixed Python types) are stored as text.
+
+    Args:
+        df (pd.DataFrame): DataFrame to convert.
+        preserve_index (bool, optional): see pyarrow.Table.from_pandas.
+
+    Returns:
+        pa.Table: table with pandas metadata to restore dtypes.
+    """
+    columns = [str(col) for col in df.columns]
+    complex_cols = {col: df[col] for col, dt in df.dtypes.items() if dt.kind == "c"}
+    mixed_cols = [
+        col
+        for col, dt in df.dtypes.items()
+        if dt == "object"
+        and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed")
+    ]
+    if complex_cols or mixed_cols:
+        df = df.drop(columns=list(complex_cols))
+        for col in mixed_cols:
+            df[col] = df[col].map(str, na_action="ignore")
+
+    table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    arrays, fields = list(table.columns), list(table.schema)
+
+    for col, values in complex_cols.items():
+        struct = pa.StructArray.from_arrays(
+            [pa.array(values.to_numpy().real), pa.array(values.to_numpy().imag)],
+            names=["real", "imag"],
+        )
+        arrays.append(struct)
+        fields.append(pa.field(str(col), struct.type, metadata={COMPLEX_KEY: b"1"}))
+
+    metadata = {**(table.schema.metadata or {}), COLUMNS_KEY: json.dumps(columns)}
+    # from the arrays: the pandas table has no rows when all columns are complex
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+
+def table_to_dataframe(table, columns=None):
+    """
+    Converts Arrow Table written by dataframe_to_table back to DataFrame with original dtypes.
+
+    Args:
+        table (pa.Table): table to convert.
+        columns (list, optional): column order of the result, the original order if omitted.
+    """
+    complex_cols = {}
+    for field in table.schema:
+        if field.metadata and field.metadata.get(COMPLEX_KEY):
+            struct = table.column(field.name).combine_chunks()
+            real = struct.field("real").to_numpy(zero_copy_only=False)
+            imag = struct.field("imag").to_numpy(zero_copy_only=False)
+            complex_cols[field.name] = real + 1j * imag
+    table = table.drop_columns(list(complex_cols))
+
+    df = table.to_pandas(split_blocks=True)
+    for col, values in complex_cols.items():
+        df[col] = pd.Series(values, index=df.index)
+
+    # complex columns were appended at the end of the table
+    if columns is None and table.schema.metadata and COLUMNS_KEY in table.schema.metadata:
+        columns = json.loads(table.schema.metadata[COLUMNS_KEY])
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
+
+
+def write_dataframe(df, path):
+    """Writes DataFrame to Arrow IPC file at path."""
+    table = dataframe_to_table(df)
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_dataframe(path, columns=None, memory_map=True):
+    """
+    Reads DataFrame from Arrow IPC file.
+
+    Args:
+        path (str): file path.
+        columns (list, optional): read only these columns.
+        memory_map (bool): memory-map the file, Arrow buffers are not copied.
+
+    Returns:
+        pd.DataFrame: DataFrame with the dtypes it was written with.
+    """
+    # the file is not closed explicitly: zero-copy buffers of the result keep the mapping alive
+    source = pa.memory_map(str(path)) if memory_map else pa.OSFile(str(path))
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table_to_dataframe(table, columns)
+
+
+def read_batches(path, columns=None):
+    """
+    Reads Arrow IPC file record batch by record batch, e.g. chunks written by ChunkWriter.
+
+    Args:
+        path (str): file path, memory-mapped.
+        columns (list, optional): read only these columns.
+
+    Returns:
+        Iterator[pd.DataFrame]: one DataFrame per record batch.
+    """
+    reader = pa.ipc.open_file(pa.memory_map(str(path)))
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        yield table_to_dataframe(pa.Table.from_batches([batch]), columns)
+
+
+def text_schema(columns):
+    """Arrow schema of raw text columns, e.g. chunks read with dtype='object'."""
+    return pa.schema([(str(col), pa.string()) for col in columns])
+
+
+class ChunkWriter:
+    """
+    Writes DataFrame chunks one by one into Arrow IPC file, as record batches.
+    All chunks must have the same columns, the schema is taken from the first one.
+    Raw text chunks (read with dtype='object') should be written with as_text=True:
+    a column with nulls only in the first chunk has no type yet.
+
+    Usage:
+        with ChunkWriter(path) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, path, as_text=False):
+        self.path = str(path)
+        self.as_text = as_text
+        self.schema = None
+        self._sink = None
+        self._writer = None
+
+    def write(self, chunk):
+        if self.as_text:
+            table = pa.Table.from_pandas(
+                chunk, schema=text_schema(chunk.columns), preserve_index=False
+            )
+        else:
+            table = dataframe_to_table(chunk, preserve_index=False)
+        if self._writer is None:
+            self.schema = table.schema
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        else:
+            table = table.cast(self.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,274 @@
+"""
+Vectorized queries over a converted dataset: projection, typed filters, sort, group-by
+aggregates and paging.
+
+A query is a JSON object, every key is optional:
+    {
+        "columns": [field, ...],
+        "filters": [
+            {"field": f, "op": "range", "min": v, "max": v},  bounds inclusive, either optional
+            {"field": f, "op": "in", "values": [v, ...]},
+            {"field": f, "op": "contains", "value": text, "case": false},
+        ],
+        "sort": [{"field": f, "desc": false}, ...],
+        "group_by": [field, ...],
+        "aggregates": [{"field": f, "func": "sum"}, {"func": "count"}, ...],
+    }
+
+Filter values are parsed by the dtype of the column: range bounds of datetime columns are
+timestamps (in the time zone of the column when they have none), of timedelta columns
+durations, of other columns numbers. Filters are boolean masks over whole columns, "contains"
+of a category column tests each category once.
+
+Row queries sort only the row positions left by the filters, by the sort columns alone,
+and take the columns of the requested page only. With group_by or aggregates the result
+is a row per group: group_by columns, then a '<func>(<field>)' column per aggregate
+('count' for the row count), sort then refers to these columns.
+"""
+
+import numpy as np
+import pandas as pd
+
+FILTER_OPS = ["range", "in", "contains"]
+AGGREGATES = ["count", "sum", "mean", "median", "min", "max", "std", "nunique"]
+
+
+class QueryError(ValueError):
+    """Invalid query of a dataset."""
+
+
+def _fields(df, fields, what):
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise QueryError(f"{what} must be a list of column names")
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown:
+        raise QueryError(f"Unknown columns in {what}: {unknown}")
+    repeated = [field for field in dict.fromkeys(fields) if fields.count(field) > 1]
+    if repeated:
+        raise QueryError(f"Repeated columns in {what}: {repeated}")
+    return fields
+
+
+def _bound(column, value):
+    """Filter value parsed by the dtype of column."""
+    dtype = column.dtype
+    try:
+        if dtype.kind == "M":
+            value = pd.Timestamp(value)
+            tz = getattr(dtype, "tz", None)
+            if tz is not None and value.tz is None:
+                return value.tz_localize(tz)
+            if tz is None and value.tz is not None:
+                return value.tz_convert(None)
+            return value
+        if dtype.kind == "m":
+            return pd.Timedelta(value)
+        if dtype.kind in "iuf":
+            return float(value)
+    except (TypeError, ValueError) as e:
+        raise QueryError(f"Invalid value {value!r} of column {column.name}: {e}")
+    return value
+
+
+def _mask(result):
+    """Boolean numpy mask of a comparison result, missing values don't match."""
+    if isinstance(result, pd.Series):
+        result = result.array
+    if isinstance(result, pd.api.extensions.ExtensionArray):
+        return result.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(result, dtype=bool)
+
+
+def _contains(column, value, case):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # test each category once, rows take the result of their category
+        categories = pd.Series(column.cat.categories).astype(str)
+        matches = _mask(categories.str.contains(value, case=case, regex=False))
+        codes = column.cat.codes.to_numpy()
+        return np.append(matches, False)[codes]
+    text = column.astype("string")
+    return _mask(text.str.contains(value, case=case, regex=False))
+
+
+def filter_mask(df, spec):
+    """
+    Boolean mask of rows of df matching a filter.
+
+    Args:
+        df (pd.DataFrame): converted frame.
+        spec (dict): filter of the query, see the module description.
+
+    Returns:
+        np.ndarray: bool per row.
+
+    Raises:
+        QueryError: invalid filter.
+    """
+    if not isinstance(spec, dict):
+        raise QueryError("filter must be an object")
+    field, op = spec.get("field"), spec.get("op")
+    if not isinstance(field, str):
+        raise QueryError("filter must name its column in field")
+    _fields(df, [field], "filters")
+    column = df[field]
+
+    if op == "range":
+        dtype = column.dtype
+        if dtype.kind not in "iufMm" or isinstance(dtype, pd.CategoricalDtype):
+            raise QueryError(f"range filter of non numeric column {field}")
+        mask = np.ones(len(column), dtype=bool)
+        if spec.get("min") is not None:
+            mask &= _mask(column >= _bound(column, spec["min"]))
+        if spec.get("max") is not None:
+            mask &= _mask(column <= _bound(column, spec["max"]))
+        if spec.get("min") is None and spec.get("max") is None:
+            mask &= _mask(column.notna())
+        return mask
+    if op == "in":
+        values = spec.get("values")
+        if not isinstance(values, list):
+            raise QueryError("in filter needs a list of values")
+        return _mask(column.isin([_bound(column, value) for value in values]))
+    if op == "contains":
+        value = spec.get("value")
+        if not isinstance(value, str):
+            raise QueryError("contains filter needs a text value")
+        return _contains(column, value, bool(spec.get("case", False)))
+    raise QueryError(f"Unknown filter op {op!r}, expected one of {FILTER_OPS}")
+
+
+def _sort_keys(df, sort):
+    if not isinstance(sort, list) or not all(isinstance(key, dict) for key in sort):
+        raise QueryError("sort must be a list of {field, desc} objects")
+    fields = _fields(df, [key.get("field") for key in sort], "sort")
+    return fields, [not key.get("desc", False) for key in sort]
+
+
+def sort_order(keys, fields, ascending):
+    """Positions of rows of the keys frame in sort order, stable, missing values last."""
+    try:
+        ordered = keys.reset_index(drop=True).sort_values(
+            fields, ascending=ascending, kind="stable", na_position="last"
+        )
+    except TypeError as e:
+        raise QueryError(f"Can't sort by {fields}: {e}")
+    return ordered.index.to_numpy()
+
+
+def aggregate(df, group_by, aggregates):
+    """
+    Row per group of df (a single row without group_by) with the aggregates.
+
+    Returns:
+        pd.DataFrame: group_by columns and a column per aggregate.
+    """
+    if not isinstance(aggregates, list) or not all(isinstance(agg, dict) for agg in aggregates):
+        raise QueryError("aggregates must be a list of {field, func} objects")
+    named = {}
+    for agg in aggregates:
+        func, field = agg.get("func"), agg.get("field")
+        if func not in AGGREGATES:
+            raise QueryError(f"Unknown aggregate {func!r}, expected one of {AGGREGATES}")
+        if field is None and func == "count":
+            named["count"] = None
+            continue
+        _fields(df, [field], "aggregates")
+        named[f"{func}({field})"] = (field, func)
+    clashing = [name for name in named if name in group_by]
+    if clashing:
+        raise QueryError(f"Aggregates {clashing} clash with group_by columns")
+
+    try:
+        if not group_by:
+            return pd.DataFrame(
+                {
+                    name: [len(df) if agg is None else df[agg[0]].agg(agg[1])]
+                    for name, agg in named.items()
+                }
+            )
+        grouped = df.groupby(group_by, observed=True, dropna=False, sort=True)
+        result = grouped.size().rename("count").to_frame()
+        fields = {name: agg for name, agg in named.items() if agg is not None}
+        if fields:
+            result = result.join(grouped.agg(**fields))
+    except (TypeError, ValueError) as e:
+        raise QueryError(f"Can't aggregate: {e}")
+    return result[list(named)].reset_index()
+
+
+def query_fields(query, columns):
+    """
+    Columns of a dataset a query refers to, in dataset order: a dataset read column by
+    column (see column_store) reads only these. Invalid parts are left to run_query.
+
+    Args:
+        query (dict): see the module description.
+        columns (list): columns of the dataset.
+    """
+    if not isinstance(query, dict):
+        return list(columns)
+    group_by = query.get("group_by") or []
+    aggregates = query.get("aggregates") or []
+    fields = list(group_by) if isinstance(group_by, list) else []
+    if isinstance(aggregates, list):
+        fields += [agg.get("field") for agg in aggregates if isinstance(agg, dict)]
+    projection = query.get("columns") or columns
+    if not (group_by or aggregates) and isinstance(projection, list):
+        fields += projection
+    for key in ["filters", "sort"]:
+        specs = query.get(key)
+        if isinstance(specs, list):
+            fields += [spec.get("field") for spec in specs if isinstance(spec, dict)]
+    fields = {field for field in fields if isinstance(field, str)}
+    return [col for col in columns if col in fields]
+
+
+def run_query(df, query, offset=0, limit=None):
+    """
+    Runs a query over a converted frame.
+
+    Args:
+        df (pd.DataFrame): converted frame of a dataset.
+        query (dict): see the module description.
+        offset (int): first row of the page of results.
+        limit (int, optional): rows of the page, all rows if omitted.
+
+    Returns:
+        tuple: (page of results (pd.DataFrame), number of rows of all results).
+
+    Raises:
+        QueryError: invalid query.
+    """
+    if not isinstance(query, dict):
+        raise QueryError("query must be an object")
+    filters = query.get("filters") or []
+    if not isinstance(filters, list):
+        raise QueryError("filters must be a list")
+    columns = _fields(df, query.get("columns") or list(df.columns), "columns")
+    group_by = _fields(df, query.get("group_by") or [], "group_by")
+    aggregates = query.get("aggregates") or []
+    end = None if limit is None else offset + limit
+
+    mask = None
+    for spec in filters:
+        matches = filter_mask(df, spec)
+        mask = matches if mask is None else mask & matches
+    positions = np.arange(len(df)) if mask is None else np.flatnonzero(mask)
+
+    if group_by or aggregates:
+        if not aggregates:
+            aggregates = [{"func": "count"}]
+        # copy only the columns aggregates need
+        used = group_by + [agg.get("field") for agg in aggregates if isinstance(agg, dict)]
+        used = [field for field in used if isinstance(field, str) and field in df.columns]
+        used = list(dict.fromkeys(used))
+        result = aggregate(df[used].iloc[positions], group_by, aggregates)
+        if query.get("sort"):
+            fields, ascending = _sort_keys(result, query["sort"])
+            result = result.iloc[sort_order(result[fields], fields, ascending)]
+        return result.iloc[offset:end].reset_index(drop=True), len(result)
+
+    if query.get("sort"):
+        fields, ascending = _sort_keys(df, query["sort"])
+        positions = positions[sort_order(df[fields].iloc[positions], fields, ascending)]
+    return df[columns].iloc[positions[offset:end]].reset_index(drop=True), len(positions)
@@ -0,0 +1,220 @@
+"""
+Store of uploaded datasets keyed by dataset id.
+
+Persisted DataFrameModel records are the source of truth, recently used frames are kept
+in a bounded in-process LRU cache in front of them. Cache entries are evicted when their
+total size exceeds max_bytes and expire ttl seconds after the last use.
+
+Converted frames are cached separately, together with column types explicitly set so far
+and column profiles, so a conversion request reconverts and profiles only the columns
+whose type changed. Converted frames of out-of-core datasets stay in their on-disk column
+store (see column_store), the cache keeps the store and reads take the rows they need.
+
+Conversion results are also cached by content: upload bytes hash, column definitions and
+inference engine. A repeated upload of the same file reuses them without parsing.
+"""
+
+import json
+
+from django.conf import settings
+
+from . import column_profile as cp
+from . import column_store
+from . import instrumentation
+from .lru_cache import LRUCache, column_size
+from .models import DataFrameModel
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 60 * 60
+
+
+_cache = None
+_converted_cache = None
+_result_cache = None
+
+
+class ConvertedDataset:
+    """
+    Converted frame of a dataset, in memory or in a column store of an out-of-core dataset.
+
+    Attributes:
+        df (pd.DataFrame): converted frame, all columns, None when it's in store.
+        store (column_store.ColumnStore): converted frame of an out-of-core dataset.
+        types (dict): field -> type of columns converted explicitly by column definitions.
+        profiles (dict): field -> column profile, computed on first use.
+        memory (dict): {'before': bytes, 'after': bytes} of the frame converted to compact
+            dtypes, None when dtypes were not compacted.
+        column_sizes (dict): field -> memory used by the column, computed on first use.
+    """
+
+    def __init__(
+        self, df, types=None, profiles=None, memory=None, store=None, column_sizes=None
+    ):
+        self.df = df
+        self.store = store
+        self.types = dict(types or {})
+        self.profiles = dict(profiles or {})
+        self.memory = memory
+        self.column_sizes = dict(column_sizes or {})
+
+    @property
+    def columns(self):
+        return list(self.df.columns) if self.store is None else self.store.columns
+
+    @property
+    def rows(self):
+        return len(self.df) if self.store is None else len(self.store)
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the frame, see column_size. Sizes of columns are kept, a frame with
+        replaced columns measures only these. Pages of a mapped store belong to the OS
+        page cache.
+        """
+        if self.store is not None:
+            return 0
+        for col in self.df.columns:
+            if col not in self.column_sizes:
+                self.column_sizes[col] = column_size(self.df[col])
+        columns = sum(self.column_sizes[col] for col in self.df.columns)
+        return columns + int(self.df.index.memory_usage(deep=True))
+
+    def unchanged_sizes(self, fields):
+        """Known column sizes except those of fields, for the frame with them replaced."""
+        return {col: size for col, size in self.column_sizes.items() if col not in fields}
+
+    def frame(self, columns=None, start=0, stop=None):
+        """Rows start:stop of columns (all by default), only these are read from store."""
+        if self.store is not None:
+            return self.store.read(columns, start, stop)
+        df = self.df if columns is None else self.df[columns]
+        return df if start == 0 and stop is None else df.iloc[start:stop]
+
+    def rows_of(self, columns=None, start=0, stop=None):
+        """
+        Rows start:stop of columns for streamed responses: the frame in memory, or
+        column_store.StoreRows which reads the store a chunk at a time.
+        """
+        if self.store is not None:
+            return column_store.StoreRows(self.store, columns, start, stop)
+        return self.frame(columns, start, stop)
+
+    def column(self, col):
+        return self.df[col] if self.store is None else self.store.column(col)
+
+    @property
+    def col_def(self):
+        """Column definitions of the explicitly converted columns."""
+        return [{"field": field, "type": type} for field, type in self.types.items()]
+
+    def changed(self, col_def):
+        """Column definitions whose type differs from the type the column has now."""
+        return [d for d in col_def if self.types.get(d["field"]) != d["type"]]
+
+    def profile(self, columns=None):
+        """
+        Profiles of the frame columns (all by default), each column is profiled once.
+        Columns in store are read one at a time.
+        """
+        columns = self.columns if columns is None else columns
+        with instrumentation.stage("serialize:profile"):
+            for col in columns:
+                if col not in self.profiles:
+                    self.profiles[col] = cp.profile_column(self.column(col))
+        return {col: self.profiles[col] for col in columns}
+
+
+def get_cache():
+    """Process wide cache of raw upload frames, configured by DATASET_CACHE_* settings."""
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            max_bytes=getattr(settings, "DATASET_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+            ttl=getattr(settings, "DATASET_CACHE_TTL", DEFAULT_TTL),
+        )
+    return _cache
+
+
+def get_converted_cache():
+    """Process wide cache of ConvertedDataset, configured by DATASET_CACHE_* settings."""
+    global _converted_cache
+    if _converted_cache is None:
+        _converted_cache = LRUCache(
+            max_bytes=getattr(settings, "DATASET_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+            ttl=getattr(settings, "DATASET_CACHE_TTL", DEFAULT_TTL),
+            sizeof=lambda converted: converted.nbytes,
+        )
+    return _converted_cache
+
+
+def put_dataset(dataset_id, df):
+    """Caches raw frame of a just persisted dataset."""
+    get_cache().put(str(dataset_id), df)
+
+
+def get_dataset(dataset_id):
+    """
+    Returns raw frame of a dataset, from cache or persisted DataFrameModel.
+
+    The returned frame is a shallow copy: conversions replace its columns without
+    touching the cached one.
+
+    Raises:
+        DataFrameModel.DoesNotExist: no dataset with the id.
+    """
+    df = get_cache().get(str(dataset_id))
+    if df is None:
+        df = DataFrameModel.objects.get(dataset_id=dataset_id).to_dataframe()
+        put_dataset(dataset_id, df)
+    return df.copy(deep=False)
+
+
+def put_converted(
+    dataset_id, df, col_def=[], profiles=None, memory=None, store=None, column_sizes=None
+):
+    """
+    Caches converted frame of a dataset and column definitions it was converted with.
+    profiles: already known profiles of unchanged columns.
+    memory: memory report of compact dtypes, see ConvertedDataset.
+    store: column store of an out-of-core dataset, df is None then.
+    column_sizes: already known memory sizes of unchanged columns.
+    Returns ConvertedDataset.
+    """
+    types = {d["field"]: d["type"] for d in col_def}
+    converted = ConvertedDataset(df, types, profiles, memory, store, column_sizes)
+    get_converted_cache().put(str(dataset_id), converted)
+    return converted
+
+
+def get_converted(dataset_id):
+    """Returns cached ConvertedDataset or None. Its frame must not be modified in place."""
+    return get_converted_cache().get(str(dataset_id))
+
+
+def get_result_cache():
+    """Process wide cache of ConvertedDataset by result_key, configured by RESULT_CACHE_* settings."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = LRUCache(
+            max_bytes=getattr(settings, "RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+            ttl=getattr(settings, "RESULT_CACHE_TTL", DEFAULT_TTL),
+            sizeof=lambda converted: converted.nbytes,
+        )
+    return _result_cache
+
+
+def result_key(content_hash, col_def=[], engine=""):
+    """Key of a conversion result of upload content with column definitions and engine."""
+    types = {d["field"]: d["type"] for d in col_def}
+    return f"{content_hash}:{engine}:{json.dumps(sorted(types.items()))}"
+
+
+def put_result(key, converted):
+    """Caches ConvertedDataset by result_key, its frame is shared and must not be modified."""
+    get_result_cache().put(key, converted)
+
+
+def get_result(key):
+    """Returns cached ConvertedDataset of result_key or None."""
+    return get_result_cache().get(key)
@@ -0,0 +1,341 @@
+"""
+Datetime format detection from the layout of values, conversion with explicit formats.
+
+Digits of a value are masked to get its shape ('1/01/2020' -> '9/99/9999'), once per
+distinct value of a bounded sample. Every distinct shape is matched once against one compiled
+pattern of all known formats: ISO variants with time and time zone, numeric dates with
+/ - . separators, month names, 12 hour clock and epoch seconds, ms, us and ns.
+Day-first and month-first formats share shapes, the one which parses more values wins.
+
+Formats of the shapes of a sample are memoized by its distinct shapes in order of
+frequency (the column signature), so recurring exports skip the lookup. Day-first twins
+are chosen on the values of every sample, and the sample is seeded: the formats of a
+column never depend on the columns seen before, in this process or another one.
+Conversion uses explicit formats: the most frequent one for the whole column, the next
+ones only for the values it failed. Values no format reads ('01:30:00', '12:00 PM', 'today')
+fall back to the mixed format parser, see mixed_fallback.
+"""
+
+import re
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .lru_cache import LRUCache
+from .misc import get_sample
+
+# number of column signatures with memoized formats
+FORMAT_CACHE_SIZE = 4096
+# values of a sample formats are detected on
+DETECT_SAMPLE_SIZE = 1000
+# seed of the sample, the same column always gets the same formats
+DETECT_SAMPLE_SEED = 0
+
+# pseudo format of values converted one by one by the mixed format parser, in UTC
+MIXED_FORMAT = "mixed"
+# failed values the mixed parser is tried on first, when it reads none of them it's not used
+MIXED_SAMPLE_SIZE = 100
+# pseudo formats of epoch numbers, converted with to_datetime unit
+EPOCH_UNITS = {"epoch:s": "s", "epoch:ms": "ms", "epoch:us": "us", "epoch:ns": "ns"}
+# epoch numbers of each unit within the datetime64[ns] range
+_EPOCH_LIMITS = {
+    unit: pd.Timestamp.max.value / ns
+    for unit, ns in {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}.items()
+}
+
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_FULL_MONTHS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
+# regex of directives in a masked value
+_DIRECTIVES = {
+    "%Y": "9999",
+    "%y": "99",
+    "%m": "9?9",
+    "%d": "9?9",
+    "%H": "9?9",
+    "%I": "9?9",
+    "%M": "99",
+    "%S": "99",
+    "%f": "9{1,9}",
+    "%z": "(?:Z|[+-]99:?99)",
+    "%b": f"(?i:{'|'.join(_MONTHS)})",
+    "%B": f"(?i:{'|'.join(_FULL_MONTHS)})",
+    "%p": "(?i:am|pm)",
+}
+
+_NUMERIC_DATES = [
+    "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d",
+    "%m/%d/%Y", "%m-%d-%Y", "%m.%d.%Y",
+    "%m/%d/%y", "%m-%d-%y", "%m.%d.%y",
+]
+_NAMED_DATES = [
+    "%d-%b-%y", "%d-%b-%Y", "%d %b %Y", "%d %B %Y", "%d-%B-%Y",
+    "%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y", "%Y-%b-%d",
+]
+_MONTH_YEARS = ["%B %Y", "%b %Y"]
+_TIMES = [" %H:%M", " %H:%M:%S", " %H:%M:%S.%f"]
+_CLOCK_TIMES = [" %I:%M %p", " %I:%M:%S %p"]
+
+
+def _known_formats():
+    """Formats in order of preference: month-first before its day-first twin."""
+    formats = []
+    for date in _NUMERIC_DATES + _NAMED_DATES:
+        iso = date == "%Y-%m-%d"
+        formats.append(date)
+        for time in _TIMES + (["T" + t[1:] for t in _TIMES] if iso else []):
+            formats += [date + time, date + time + "%z"]
+        formats += [date + time for time in _CLOCK_TIMES]
+    formats += _MONTH_YEARS
+    formats.append("%Y%m%d")
+    return formats
+
+
+def _day_first(format):
+    """Day-first twin of a numeric month-first format, None for others."""
+    if "%m" not in format or "%d" not in format or "%b" in format or format == "%Y%m%d":
+        return None
+    if format.startswith(("%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d")):
+        return None
+    return format.replace("%m", "%_").replace("%d", "%m").replace("%_", "%d")
+
+
+def _shape_regex(format):
+    parts = re.split(r"(%[a-zA-Z])", format)
+    return "".join(_DIRECTIVES.get(part, re.escape(part)) for part in parts)
+
+
+FORMATS = _known_formats()
+TWINS = {format: _day_first(format) for format in FORMATS if _day_first(format)}
+
+_EPOCH_SHAPES = [
+    ("epoch:s", r"9{10}(?:\.9+)?"),
+    ("epoch:ms", r"9{13}"),
+    ("epoch:us", r"9{16}"),
+    ("epoch:ns", r"9{19}"),
+]
+_SHAPE_FORMATS = [(f, _shape_regex(f)) for f in FORMATS] + _EPOCH_SHAPES
+_SHAPE_PATTERN = re.compile(
+    "|".join(f"(?P<f{i}>{regex})" for i, (_, regex) in enumerate(_SHAPE_FORMATS))
+)
+
+_format_cache = LRUCache(max_bytes=FORMAT_CACHE_SIZE, ttl=float("inf"), sizeof=lambda _: 1)
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def shape_format(shape):
+    """Format of a masked value ('9/99/9999' -> '%m/%d/%Y') or None."""
+    match = _SHAPE_PATTERN.fullmatch(shape)
+    return _SHAPE_FORMATS[int(match.lastgroup[1:])][0] if match else None
+
+
+def _has_text(column):
+    """True when the str accessor applies: object column with strings or nothing at all."""
+    return column.dtype == "object" and pd.api.types.infer_dtype(column, skipna=True) in (
+        "string", "empty", "mixed", "mixed-integer"
+    )
+
+
+def _text(column):
+    """Strings without surrounding spaces, other values as they are."""
+    if not _has_text(column):
+        return column
+    stripped = column.str.strip()
+    return stripped.where(stripped.notna(), column)
+
+
+def _shapes(text):
+    """Masked values, NaN for missing and non-string values. Distinct values are masked once."""
+    if not _has_text(text):
+        return pd.Series(np.nan, index=text.index, dtype="object")
+    codes, uniques = pd.factorize(text)
+    masked = pd.Series(uniques, dtype="object").str.replace(r"\d", "9", regex=True)
+    return pd.Series(np.append(masked.to_numpy(), np.nan)[codes], index=text.index)
+
+
+def _convert_epoch(values, unit, utc=False):
+    """
+    Converts epoch numbers of unit, failures are NaT. Numbers out of the datetime64[ns]
+    range are NaT too, to_datetime would overflow on them.
+    """
+    numbers = pd.to_numeric(values, errors="coerce")
+    with np.errstate(invalid="ignore"):
+        in_range = (np.abs(numbers.to_numpy(dtype="float64")) < _EPOCH_LIMITS[unit])
+    converted = pd.to_datetime(numbers[in_range], unit=unit, errors="coerce", utc=utc)
+    if in_range.all():
+        return converted
+    result = pd.Series(pd.NaT, index=values.index, dtype=converted.dtype, name=values.name)
+    result[in_range] = converted.to_numpy()
+    return result
+
+
+def _convert_format(values, format, utc=False):
+    """Converts values with one explicit format (or epoch unit), failures are NaT."""
+    if format in EPOCH_UNITS:
+        return _convert_epoch(values, EPOCH_UNITS[format], utc)
+    if format == MIXED_FORMAT:
+        return _convert_mixed(values)
+    if not utc:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", FutureWarning)
+                converted = pd.to_datetime(values, format=format, errors="coerce")
+            # values with different time zone offsets can't share a dtype without utc
+            if converted.dtype != "object":
+                return converted
+        except (ValueError, TypeError):
+            pass
+    return pd.to_datetime(values, format=format, errors="coerce", utc=True)
+
+
+def _convert_mixed(values):
+    """
+    Converts values one by one with the mixed format parser, in UTC: time zones of values
+    may differ. Failures are NaT.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            return pd.to_datetime(values, format=MIXED_FORMAT, errors="coerce", utc=True)
+    except (ValueError, TypeError, OverflowError):
+        return pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+
+
+def _resolve_twins(text, shapes, formats):
+    """Swaps month-first formats for their day-first twins where the twin parses more values."""
+    resolved = []
+    for format in formats:
+        twin = TWINS.get(format)
+        if twin:
+            values = text[(shapes.map(shape_format, na_action="ignore") == format).to_numpy()]
+            month_first = _convert_format(values, format).notna().sum()
+            day_first = _convert_format(values, twin).notna().sum()
+            format = twin if day_first > month_first else format
+        resolved.append(format)
+    return resolved
+
+
+def _layout_formats(layouts):
+    """Formats of distinct shapes in the order of layouts, each format once."""
+    formats = []
+    for shape in layouts:
+        format = shape_format(shape)
+        if format and format not in formats:
+            formats.append(format)
+    return formats
+
+
+def _formats_of(text, shapes):
+    """Formats of the distinct shapes of text, the most frequent first."""
+    return _resolve_twins(text, shapes, _layout_formats(shapes.value_counts().index))
+
+
+def infer_datetime_formats(column, percent_to_check=0.1):
+    """
+    Detects datetime formats of a column on a reproducible sample of its values.
+
+    Args:
+        column (pd.Series): object column.
+        percent_to_check (float): proportion of values to sample, at most
+            DETECT_SAMPLE_SIZE of them are looked at.
+
+    Returns:
+        tuple: explicit formats (strptime formats or 'epoch:<unit>'), most frequent first,
+            empty when no value looks like a datetime.
+    """
+    sample = get_sample(column, percent_to_check, random_state=DETECT_SAMPLE_SEED)
+    text = _text(sample.iloc[:DETECT_SAMPLE_SIZE])
+    shapes = _shapes(text)
+    # formats of the layouts depend on the layouts only, day-first is decided by the values
+    layouts = tuple(shapes.value_counts().index)
+    formats = _format_cache.get(layouts)
+    if formats is None:
+        formats = tuple(_layout_formats(layouts))
+        _format_cache.put(layouts, formats)
+    return tuple(_resolve_twins(text, shapes, formats))
+
+
+def column_formats(column):
+    """Formats of all distinct shapes of a column, a full pass."""
+    text = _text(column)
+    return _formats_of(text, _shapes(text))
+
+
+def to_utc(converted):
+    """Datetime column in UTC, naive values are taken as UTC."""
+    values = converted.array
+    values = values.tz_localize("UTC") if values.tz is None else values.tz_convert("UTC")
+    return pd.Series(values, index=converted.index, name=converted.name)
+
+
+def _convert(values, formats):
+    """The most frequent format first, values it fails are converted with the next one."""
+    converted = _convert_format(values, formats[0])
+    for format in formats[1:]:
+        failed = (converted.isna() & values.notna()).to_numpy()
+        if not failed.any():
+            break
+        retried = _convert_format(values[failed], format, utc=True)
+        if retried.notna().any():
+            # naive values are taken as UTC
+            converted = to_utc(converted)
+            converted[failed] = retried
+    return converted
+
+
+def convert_datetime(column, formats):
+    """
+    Converts a column with explicit formats.
+
+    One format converts the whole column (a fixed time zone offset or naive result).
+    Formats are tried in order on the values the previous ones failed, when values of
+    several formats are present the result is in UTC like the one of a mixed format parser.
+    Values of no format become NaT.
+    """
+    converted = _convert(column, formats)
+
+    # explicit formats don't skip surrounding spaces, only failed values are stripped
+    failed = (converted.isna() & column.notna()).to_numpy()
+    if failed.any() and _has_text(column[failed]):
+        stripped = _text(column[failed])
+        if not stripped.equals(column[failed]):
+            retried = _convert(stripped, formats)
+            if retried.dtype == converted.dtype:
+                converted[failed] = retried
+            else:
+                text = column.copy()
+                text[failed] = stripped
+                converted = _convert(text, formats)
+    return converted
+
+
+def mixed_fallback(column, formats, converted=None):
+    """
+    Falls back to the mixed format parser for values the explicit formats failed: times
+    without a date (a time of today), 12 hour times, 'today' and 'now'. When it reads any
+    of them MIXED_FORMAT is appended to formats, and the column is converted again.
+    The parser is slow and text columns fail every format: it's not used when it reads none
+    of the first MIXED_SAMPLE_SIZE failed values.
+
+    Args:
+        column (pd.Series): column of values.
+        formats (list): explicit formats the column was converted with, updated in place.
+        converted (pd.Series): column converted with formats, None when there were none.
+
+    Returns:
+        pd.Series: converted column, with the values the mixed parser read.
+    """
+    if converted is None:
+        converted = pd.Series(pd.NaT, index=column.index, dtype="datetime64[ns]")
+    failed = (converted.isna() & column.notna()).to_numpy()
+    if MIXED_FORMAT in formats or not failed.any():
+        return converted
+    if _convert_mixed(column[failed].iloc[:MIXED_SAMPLE_SIZE]).isna().all():
+        return converted
+    formats.append(MIXED_FORMAT)
+    return convert_datetime(column, formats)
@@ -0,0 +1,70 @@
+"""
+Conversion of distinct values: text columns are factorized once, a converter parses each
+distinct value once and the results are mapped back to rows through the codes.
+
+Exports repeat a small set of strings (dates, status codes, 'Not Available') in many rows,
+parsing is per value and much slower than factorizing, so the conversion takes the time
+of the distinct values only. Columns of many distinct values (above DISTINCT_RATIO_MAX of
+rows) or of other values than strings are converted as they are: numbers, booleans and
+strings don't factorize by their text, 1 == 1.0 == True.
+
+The result is the same as converting the column itself: converters of this app convert
+values independently of other rows, the dtype follows from the set of values, which is
+the same, and missing values (code -1) are missing in the result.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+# columns with distinct values up to this share of rows are converted by distinct values
+DISTINCT_RATIO_MAX = 0.5
+# shorter columns are converted as they are
+MIN_ROWS = 1000
+
+
+def factorize_text(column, ratio_max=DISTINCT_RATIO_MAX):
+    """
+    Codes and distinct values of a text column worth converting by distinct values.
+
+    Returns:
+        tuple (np.ndarray, np.ndarray) or None: codes (-1 for missing values) and distinct
+            values, None for short columns, other values than strings or more distinct
+            values than ratio_max of rows.
+    """
+    if len(column) < MIN_ROWS or pd.api.types.infer_dtype(column, skipna=True) != "string":
+        return None
+    codes, uniques = pd.factorize(column)
+    if len(uniques) > len(column) * ratio_max:
+        return None
+    return codes, uniques
+
+
+def convert_factorized(column, factorized, convert):
+    """Converts distinct values of factorize_text once and maps them back to rows of column."""
+    codes, uniques = factorized
+    converted = convert(pd.Series(uniques, dtype="object"))
+    # code -1 of missing values takes the missing value of the converted dtype
+    array = converted.to_numpy() if isinstance(converted.dtype, np.dtype) else converted.array
+    values = take(array, codes, allow_fill=True)
+    return pd.Series(values, index=column.index, name=column.name)
+
+
+def convert_distinct(column, convert, ratio_max=DISTINCT_RATIO_MAX):
+    """
+    Converts distinct values of a text column once and maps them back to rows, other
+    columns (see factorize_text) are converted as they are.
+
+    Args:
+        column (pd.Series): column to convert.
+        convert (callable): convert(values) -> converted Series of the same length and index,
+            values are a Series of object dtype.
+        ratio_max (float): converts the column itself above this share of distinct values.
+
+    Returns:
+        pd.Series: converted column with the index and name of column.
+    """
+    factorized = factorize_text(column, ratio_max)
+    if factorized is None:
+        return convert(column)
+    return convert_factorized(column, factorized, convert)
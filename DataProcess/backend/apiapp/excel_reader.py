@@ -0,0 +1,164 @@
+"""
+Streaming Excel ingestion: sheets are listed from workbook metadata and read row by row.
+
+xlsx workbooks are opened by openpyxl in read-only mode, cells are parsed lazily as rows
+are iterated and never kept as the object model of the whole workbook. Sheet dimensions
+come from the <dimension> record of each sheet, no cell is parsed to list sheets.
+
+Rows of a sheet are cut into chunks of text values, as the CSV reader reads them with
+dtype='object' (first row is the header), so sheets go through the same chunked inference
+as large CSV files. Legacy xls has no streaming reader, its sheet is read whole by pandas.
+"""
+
+import datetime
+
+import openpyxl
+import pandas as pd
+
+from .chunked_inference import DEFAULT_CHUNK_ROWS
+
+
+def cell_text(value):
+    """
+    Text of an Excel cell value as it would be written to CSV, None for an empty cell.
+    Dates and times are ISO text, durations the text pandas parses.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(pd.Timedelta(value))
+    if isinstance(value, float) and pd.isna(value):
+        return None
+    return str(value)
+
+
+def header_names(values):
+    """
+    Column names of a header row the way pandas names them: 'Unnamed: <i>' for empty
+    cells and '.<n>' suffixes for duplicates.
+    """
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = cell_text(value)
+        if name is None or name == "":
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _open_workbook(file_obj):
+    file_obj.seek(0)
+    # data_only: cached values of formulas instead of formula text
+    return openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+
+
+def list_sheets(file_obj, file_format):
+    """
+    Lists sheets of a workbook with their dimensions, cells are not parsed.
+
+    Args:
+        file_obj: seekable binary file object.
+        file_format (file_format.FileFormat): sniffed Excel format.
+
+    Returns:
+        list: [{'name': str, 'rows': int or None, 'columns': int or None}] in workbook order,
+            rows without the header, None when the sheet doesn't record its dimensions.
+    """
+    if file_format.engine != "openpyxl":
+        file_obj.seek(0)
+        with pd.ExcelFile(file_obj, engine=file_format.engine) as workbook:
+            return [
+                {"name": name, "rows": None, "columns": None}
+                for name in workbook.sheet_names
+            ]
+
+    workbook = _open_workbook(file_obj)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            rows, columns = sheet.max_row, sheet.max_column
+            sheets.append(
+                {
+                    "name": sheet.title,
+                    "rows": max(rows - 1, 0) if rows is not None else None,
+                    "columns": columns,
+                }
+            )
+        return sheets
+    finally:
+        workbook.close()
+
+
+def _chunks(rows, header, chunksize):
+    """Cuts rows of cell values into text DataFrame chunks, trailing empty rows are dropped."""
+    width = len(header)
+    chunk = []
+    empty = 0
+    for row in rows:
+        values = [cell_text(value) for value in row[:width]]
+        if all(value is None for value in values):
+            # empty rows count only when data follows them
+            empty += 1
+            continue
+        for _ in range(empty):
+            chunk.append([None] * width)
+        empty = 0
+        chunk.append(values + [None] * (width - len(values)))
+        if len(chunk) >= chunksize:
+            yield pd.DataFrame(chunk[:chunksize], columns=header, dtype="object")
+            chunk = chunk[chunksize:]
+    if chunk:
+        yield pd.DataFrame(chunk, columns=header, dtype="object")
+
+
+def read_sheet_chunks(file_obj, file_format, sheet=None, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Reads a sheet row by row in chunks of text values.
+
+    Args:
+        file_obj: seekable binary file object.
+        file_format (file_format.FileFormat): sniffed Excel format.
+        sheet (str, optional): sheet name, the first sheet if omitted.
+        chunksize (int): number of rows per chunk.
+
+    Returns:
+        Iterator[pd.DataFrame]: chunks with all columns of object dtype, nothing for a sheet
+            without a header row.
+
+    Raises:
+        KeyError: no sheet of the name.
+    """
+    if file_format.engine != "openpyxl":
+        file_obj.seek(0)
+        df = pd.read_excel(
+            file_obj,
+            sheet_name=sheet or 0,
+            engine=file_format.engine,
+            header=None,
+            dtype="object",
+        )
+        rows = df.itertuples(index=False, name=None)
+        header = next(rows, None)
+        if header is not None:
+            yield from _chunks(rows, header_names(header), chunksize)
+        return
+
+    workbook = _open_workbook(file_obj)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is not None:
+            yield from _chunks(rows, header_names(header), chunksize)
+    finally:
+        workbook.close()
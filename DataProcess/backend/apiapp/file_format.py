@@ -0,0 +1,199 @@
+"""
+Upload format detection from the first bytes of the file.
+
+Binary formats are recognized by magic numbers (xlsx and zip, legacy xls, Parquet, gzip),
+text by its byte order mark, encoding and delimiter of the first lines. Only the head of
+the file is read, the rest is read once by the reader the format is dispatched to.
+"""
+
+import codecs
+import csv
+import hashlib
+import zipfile
+import zlib
+
+import pandas as pd
+
+# bytes read to detect the format and sniff text
+HEAD_SIZE = 64 * 1024
+# block size of content hashing
+HASH_BLOCK_SIZE = 1024 * 1024
+
+ZIP_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # OLE2 compound document
+PARQUET_MAGIC = b"PAR1"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# candidate delimiters in order of preference
+DELIMITERS = [",", "\t", ";", "|"]
+# tried in order when the text has no byte order mark
+ENCODINGS = ["utf-8", "cp1252", "latin-1"]
+
+
+class FileFormat:
+    """
+    Detected upload format and parameters of its reader.
+
+    Attributes:
+        kind (str): 'csv', 'excel' or 'parquet'.
+        compression (str): None, 'gzip' or 'zip' for compressed CSV.
+        sep (str): CSV delimiter.
+        encoding (str): CSV text encoding.
+        engine (str): Excel reader engine, 'openpyxl' or 'xlrd'.
+    """
+
+    def __init__(self, kind, compression=None, sep=",", encoding="utf-8", engine=None):
+        self.kind = kind
+        self.compression = compression
+        self.sep = sep
+        self.encoding = encoding
+        self.engine = engine
+
+    @property
+    def label(self):
+        """Format name for messages."""
+        return {"csv": "CSV", "excel": "Excel", "parquet": "Parquet"}[self.kind]
+
+    def csv_options(self):
+        """pd.read_csv keyword arguments of a CSV format."""
+        return {"sep": self.sep, "encoding": self.encoding, "compression": self.compression}
+
+    def __repr__(self):
+        return f"FileFormat({self.__dict__})"
+
+
+def sniff_encoding(head):
+    """
+    Detects text encoding of the head bytes.
+
+    Raises:
+        ValueError: NULL bytes without a UTF-16 byte order mark, the data is not text.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if b"\x00" in head:
+        raise ValueError("Unsupported binary file format")
+
+    for encoding in ENCODINGS:
+        try:
+            # incremental decoder accepts a multibyte character cut at the end of head
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def sniff_delimiter(text):
+    """
+    Picks the delimiter splitting every line of the text sample into the same number
+    of fields, the most fields wins. Comma when no delimiter does.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        lines = lines[:-1]  # last line may be cut by the head size
+    if not lines:
+        return ","
+
+    best, best_fields = ",", 1
+    for delimiter in DELIMITERS:
+        counts = {len(row) for row in csv.reader(lines, delimiter=delimiter)}
+        if len(counts) == 1:
+            fields = counts.pop()
+            if fields > best_fields:
+                best, best_fields = delimiter, fields
+    return best
+
+
+def _sniff_text(head, compression=None):
+    encoding = sniff_encoding(head)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(head)
+    return FileFormat("csv", compression, sep=sniff_delimiter(text), encoding=encoding)
+
+
+def _zip_format(file_obj):
+    """xlsx is a zip of XML parts, any other zip is read as a zipped CSV."""
+    # the central directory is read from the end of the file, members are not decompressed
+    with zipfile.ZipFile(file_obj) as archive:
+        names = archive.namelist()
+        if "[Content_Types].xml" in names and any(n.startswith("xl/") for n in names):
+            return FileFormat("excel", engine="openpyxl")
+        if len(names) != 1:
+            raise ValueError("Zip archive must contain one CSV file")
+        with archive.open(names[0]) as member:
+            head = member.read(HEAD_SIZE)
+    return _sniff_text(head, compression="zip")
+
+
+def sniff_format(file_obj):
+    """
+    Detects format of an upload from its first bytes.
+
+    Args:
+        file_obj: seekable binary file object, left at position 0.
+
+    Returns:
+        FileFormat: format with reader parameters.
+
+    Raises:
+        ValueError: not a supported format.
+    """
+    file_obj.seek(0)
+    try:
+        head = file_obj.read(HEAD_SIZE)
+
+        if head.startswith(ZIP_MAGIC):
+            return _zip_format(file_obj)
+        if head.startswith(XLS_MAGIC):
+            return FileFormat("excel", engine="xlrd")
+        if head.startswith(PARQUET_MAGIC):
+            return FileFormat("parquet")
+        if head.startswith(GZIP_MAGIC):
+            # decompress only the head, a truncated stream is fine for decompressobj
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            return _sniff_text(decompressor.decompress(head, HEAD_SIZE), "gzip")
+        return _sniff_text(head)
+    finally:
+        file_obj.seek(0)
+
+
+def binary_file(file_obj):
+    """
+    The binary file of an upload for pandas readers. Django uploads proxy their file,
+    pandas takes an in-memory upload (no mode) for a text handle and ignores the encoding
+    and compression of CSV options.
+    """
+    return getattr(file_obj, "file", file_obj)
+
+
+def read_upload(file_obj, file_format):
+    """
+    Reads the whole upload with the reader of its format.
+
+    Returns:
+        pd.DataFrame: data as the reader parsed it, types are inferred later.
+    """
+    file_obj = binary_file(file_obj)
+    file_obj.seek(0)
+    if file_format.kind == "excel":
+        return pd.read_excel(file_obj, engine=file_format.engine)
+    if file_format.kind == "parquet":
+        return pd.read_parquet(file_obj)
+    return pd.read_csv(file_obj, **file_format.csv_options())
+
+
+def content_hash(file_obj):
+    """SHA-256 hex digest of the upload bytes, read block by block. Leaves file_obj at 0."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for block in iter(lambda: file_obj.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def sheet_hash(content_hash, sheet):
+    """Content hash of one sheet of a workbook upload: SHA-256 of upload hash and sheet name."""
+    return hashlib.sha256(f"{content_hash}:{sheet}".encode()).hexdigest()
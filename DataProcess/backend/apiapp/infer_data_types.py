@@ -2,14 +2,58 @@
 
 import pandas as pd
 import numpy as np
+from statistics import NormalDist
 
 from .misc import *
+from .cardinality import distinct_within
+from .distinct_conversion import convert_distinct, convert_factorized, factorize_text
+from .instrumentation import stage
+from .type_classifier import classify_column
+from .complex_parser import (
+    complex_text,
+    has_complex_marks,
+    parse_complex_column,
+    parse_complex_text,
+)
+from .datetime_formats import (
+    column_formats,
+    convert_datetime,
+    infer_datetime_formats,
+    mixed_fallback,
+    to_utc,
+)
 
 # import gc
 # import memory_profiler
 
-
-def infer_and_convert_data_types(df, column_def=[]):
+# Acceptable error rate for conversions, unless explicit.
+ERRORS_RATE = 0.2
+# category stands out with 50% of uniqness
+CATEGORY_UNIQUE_PERCENT_MAX = 50
+# distinct values of longer columns are estimated (see cardinality), counted exactly only
+# near the threshold
+CATEGORY_SKETCH_MIN_ROWS = 50_000
+
+# 'sample' engine: candidates are checked on a bounded reproducible sample first
+SAMPLE_SIZE = 1000
+SAMPLE_SEED = 0
+SAMPLE_CONFIDENCE = 0.95
+
+# converters of text go through a column in about this many blocks and give up as soon as
+# failures exceed the errors rate of the whole column, columns up to MIN_BLOCK_ROWS are
+# one block
+CONVERSION_BLOCKS = 32
+MIN_BLOCK_ROWS = 4096
+
+
+def infer_and_convert_data_types(
+    df,
+    column_def=[],
+    engine="classifier",
+    confidence=SAMPLE_CONFIDENCE,
+    workers=1,
+    on_column=None,
+):
     """
     Infers column types and performs conversions, allowing for explicit type definitions.
 
@@ -17,62 +61,255 @@ def infer_and_convert_data_types(df, column_def=[]):
         df (pd.DataFrame): DataFrame to process.
         column_def (Optional[List[Dict]]): List of dictionaries defining explicit column types.
             Example: [{'field': 'Score', 'type': 'numeric'}, ...]
+        engine (str): 'classifier' classifies column values once and tries only conversions
+            which can succeed, 'cascade' tries every conversion in order. Results are the same.
+            'sample' rejects conversions on a sample of SAMPLE_SIZE values first, only the
+            chosen one is applied to the whole column.
+        confidence (float): 'sample' engine rejects a conversion when it's this confident
+            the column errors rate would be exceeded.
+        workers (int): number of worker processes inferring columns in parallel, 1 - serial.
+        on_column (callable, optional): called with the name of every inferred column,
+            e.g. to report progress.
 
     Returns:
         pd.DataFrame: DataFrame with inferred and converted data types.
     """
 
-    errors_rate = 0.2  # Acceptable error rate for conversions, unless explicit.
+    errors_rate = ERRORS_RATE  # Acceptable error rate for conversions, unless explicit.
 
     if column_def:
         # Apply explicit type conversions first, - will be converted no matter what , even with 100% error rate
         for col_def in column_def:
             field = col_def["field"]
             type = col_def["type"]
-            if type == "string":
-                df[field] = df[field].astype("object")
-            if type == "number":
-                _,df[field] = try_convert_to_numeric(df[field], errors_rate=1)
-            if type == "complex":
-                #_,df[field] = try_convert_to_complex(df[field], errors_rate=1)
-                df[field] =  pd.to_numeric(df[field], errors='coerce').astype('complex128')
-            if type == "date":
-                _,df[field] = try_convert_to_datetime(df[field], errors_rate=1)
-            if type == "duration":
-                _,df[field] = try_convert_to_timedelta(df[field], errors_rate=1)
-            if type == "category":
-                _,df[field] = try_convert_to_category(df[field], unique_percent_max=100)
+            with stage(f"convert:{type}"):
+                if type == "string":
+                    df[field] = df[field].astype("object")
+                if type == "number":
+                    _,df[field] = try_convert_to_numeric(df[field], errors_rate=1)
+                if type == "complex":
+                    #_,df[field] = try_convert_to_complex(df[field], errors_rate=1)
+                    df[field] =  pd.to_numeric(df[field], errors='coerce').astype('complex128')
+                if type == "date":
+                    _,df[field] = try_convert_to_datetime(df[field], errors_rate=1)
+                if type == "duration":
+                    _,df[field] = try_convert_to_timedelta(df[field], errors_rate=1)
+                if type == "category":
+                    _,df[field] = try_convert_to_category(df[field], unique_percent_max=100)
 
     # Infer and convert only object type columns. But check if they are not in explicitly defined list
-    for col in df.select_dtypes(include=["object"]).columns:
-        # Process only columns not explicitly defined in column_def
-        if not any(d['field'] == col for d in column_def):
-            for conversion_func in [
-                try_convert_to_numeric,
-                try_convert_to_complex,
-                try_convert_to_datetime,
-                try_convert_to_timedelta,
-            ]:
-                result, data = conversion_func(df[col], errors_rate)
-                if result:
-                    df[col] = data
-                    break
-
-            # If no other conversion succeeded, try converting to category
-            else:    
-                # category stands out with 50% of uniqness
-                result, data = try_convert_to_category(
-                    df[col], unique_percent_max=50
-                )  # 50% or less of unique -> treshold to categorize
-                if result:
-                    df[col] = data
+    columns = [
+        col
+        for col in df.select_dtypes(include=["object"]).columns
+        if not any(d['field'] == col for d in column_def)
+    ]
+
+    if workers > 1:
+        # columns are inferred in worker processes, results are the same as serial
+        from .parallel_inference import infer_columns_parallel
+
+        for col, data in infer_columns_parallel(
+            df, columns, workers, engine, confidence, errors_rate, on_column=on_column
+        ).items():
+            df[col] = data
+        return df
+
+    for col in columns:
+        data = infer_column(df[col], engine, confidence, errors_rate)
+        if data is not None:
+            df[col] = data
+        if on_column:
+            on_column(col)
 
     return df
 
 
+def infer_column(column, engine="classifier", confidence=SAMPLE_CONFIDENCE, errors_rate=ERRORS_RATE):
+    """
+    Infers type of one object column and converts it.
+
+    Args:
+        column (pd.Series): column of object dtype.
+        engine, confidence: see infer_and_convert_data_types.
+        errors_rate (float): acceptable proportion of failed conversions.
+
+    Returns:
+        pd.Series or None: converted column, None when the column stays as it is.
+    """
+    # histogram of value classes rules out conversions which surely exceed errors rate
+    with stage("infer:classify"):
+        histogram = classify_column(column) if engine == "classifier" else None
+        sample = (
+            get_sample(column, 0, SAMPLE_SIZE, random_state=SAMPLE_SEED)
+            if engine == "sample"
+            else None
+        )
+
+    for type_name, conversion_func in [
+        ("numeric", try_convert_to_numeric),
+        ("complex", try_convert_to_complex),
+        ("datetime", try_convert_to_datetime),
+        ("timedelta", try_convert_to_timedelta),
+    ]:
+        if histogram is not None and not histogram.could_convert(
+            type_name, errors_rate
+        ):
+            continue
+        if sample is not None and not could_convert_sample(
+            type_name, sample, len(column), errors_rate, confidence
+        ):
+            continue
+        # full conversion still checks the errors rate, if exceeded the next type is tried
+        with stage(f"infer:{type_name}"):
+            result, data = conversion_func(column, errors_rate)
+        if result:
+            return data
+
+    # If no other conversion succeeded, try converting to category
+    # category stands out with 50% of uniqness, histogram already counted unique values
+    if histogram is not None and histogram.percent_unique > CATEGORY_UNIQUE_PERCENT_MAX:
+        return None
+    # the exact count of the histogram decided, the column is not counted again
+    unique_percent_max = 100 if histogram is not None else CATEGORY_UNIQUE_PERCENT_MAX
+    with stage("infer:category"):
+        result, data = try_convert_to_category(
+            column, unique_percent_max=unique_percent_max
+        )  # 50% or less of unique -> treshold to categorize
+    return data if result else None
+
+
+def could_convert_sample(type_name, sample, column_size, errors_rate, confidence):
+    """
+    Decides on a sample if a conversion can stay within errors rate on the whole column.
+
+    Args:
+        type_name (str): 'numeric', 'complex', 'datetime' or 'timedelta'.
+        sample (pd.Series): sample of the column.
+        column_size (int): size of the whole column.
+        errors_rate (float): The maximum acceptable proportion of errors (NaN values) after conversion.
+        confidence (float): confidence level (0 to 1) of rejection.
+
+    Returns:
+        bool: False if the lower confidence bound of the errors rate exceeds errors_rate.
+    """
+    size = len(sample)
+    if not size:
+        return True
+    failures = count_sample_failures(type_name, sample)
+
+    # the sample is the whole column, nothing to estimate
+    if size >= column_size:
+        return failures / size <= errors_rate
+
+    # one-sided Wilson score lower bound of the failure proportion
+    z = NormalDist().inv_cdf(confidence)
+    p = failures / size
+    centre = p + z * z / (2 * size)
+    margin = z * np.sqrt(p * (1 - p) / size + z * z / (4 * size * size))
+    lower_bound = (centre - margin) / (1 + z * z / size)
+
+    return lower_bound <= errors_rate
+
+
+def count_sample_failures(type_name, sample):
+    """
+    Counts values of the sample the conversion turns into NaN (missing values included).
+    Datetime is checked with the formats detected on all shapes of the sample.
+    """
+    try:
+        if type_name == "numeric":
+            converted = pd.to_numeric(sample, errors="coerce")
+        elif type_name == "complex":
+            converted = parse_complex_column(sample)
+        elif type_name == "datetime":
+            formats = column_formats(sample)
+            converted = mixed_fallback(
+                sample, formats, convert_datetime(sample, formats) if formats else None
+            )
+        else:
+            converted = pd.to_timedelta(sample, errors="coerce")
+    except (ValueError, TypeError):
+        return len(sample)
+    return int(converted.isna().sum())
+
+
+def convert_in_blocks(column, convert, errors_rate, combine=pd.concat):
+    """
+    Converts a column block by block, counting failures (missing values of converted blocks)
+    as it goes, converted blocks are combined at the end, nothing is converted twice.
+    Blocks of few distinct strings are converted by distinct values (see convert_distinct),
+    after a block of many distinct values the next blocks aren't factorized.
+
+    Args:
+        column (pd.Series): column to convert.
+        convert (callable): convert(block) -> converted block, failures are NaN/NaT.
+        errors_rate (float): The maximum acceptable proportion of errors (NaN values) after conversion.
+        combine (callable): combine(list of converted blocks) -> converted column.
+
+    Returns:
+        pd.Series or None: converted column, None as soon as failures exceed errors_rate of
+            the whole column (the rest of the column is not converted) or for an empty column.
+    """
+    size = len(column)
+    if not size:
+        return None
+    block_rows = max(size // CONVERSION_BLOCKS, MIN_BLOCK_ROWS)
+    blocks = []
+    failures = 0
+    by_distinct = True
+    for start in range(0, size, block_rows):
+        block = column.iloc[start : start + block_rows]
+        factorized = factorize_text(block) if by_distinct else None
+        by_distinct = factorized is not None
+        converted = (
+            convert(block) if factorized is None else convert_factorized(block, factorized, convert)
+        )
+        failures += int(converted.isna().sum())
+        if failures / size > errors_rate:
+            return None
+        blocks.append(converted)
+    return blocks[0] if len(blocks) == 1 else combine(blocks)
+
+
+def _combine_datetimes(blocks):
+    """Blocks of different formats differ in time zone, then all are in UTC, naive as UTC."""
+    if len({block.dtype for block in blocks}) > 1:
+        blocks = [to_utc(block) for block in blocks]
+    return pd.concat(blocks)
+
+
+def _convert_datetime_block(block, formats):
+    """
+    Converts a block with formats, layouts of its failed values the formats miss are added
+    to formats when they convert more values, so the next blocks start with them. Values
+    no format reads are left to the mixed format parser, see mixed_fallback.
+    """
+    converted = (
+        convert_datetime(block, formats)
+        if formats
+        else pd.Series(pd.NaT, index=block.index, dtype="datetime64[ns]")
+    )
+
+    # the sample missed layouts of the column, formats of the values which failed
+    failed = converted.isna() & block.notna()
+    if failed.any():
+        more_formats = [f for f in column_formats(block[failed]) if f not in formats]
+        if more_formats:
+            retried = convert_datetime(block, formats + more_formats)
+            if retried.isna().sum() < converted.isna().sum():
+                converted = retried
+                formats.extend(more_formats)
+    return mixed_fallback(block, formats, converted)
+
+
 def try_convert_to_datetime(column, errors_rate):
     """
-    Attempts to convert a pandas Series to datetime format, handling mixed formats and potential errors.
+    Attempts to convert a pandas Series to datetime with explicit formats detected from
+    the layout of values (see datetime_formats), several formats are converted per value.
+    Text is converted in blocks, see convert_in_blocks.
+    Values of one format keep their time zone: naive datetime64[ns] or a fixed offset,
+    values of several formats or offsets are converted to UTC (naive ones taken as UTC).
+    Values no format reads fall back to the mixed format parser, which gives UTC too.
 
     Args:
         column (pd.Series): The pandas Series containing data to be converted.
@@ -88,43 +325,27 @@ def try_convert_to_datetime(column, errors_rate):
 
     df_size = len(column)  # Store DataFrame size for later calculations
 
-    # Check for unique or mixed format in a sample of data for efficiency
-    format = infer_datetime_format(column, percent_to_check=0.1)
-
-    # Prioritize using inferred format for performance
-    if format and format != "mixed":
-        try:
-            converted_column = pd.to_datetime(column, errors="coerce", format=format)
-            # Check against error rate and return converted column if acceptable
-            if converted_column.isna().sum() / df_size <= errors_rate:
-                return True, converted_column
-        except (ValueError, TypeError) as e:
-            pass
-
-    #check for potential Unix Epoch format         
-    if  has_any_unix_timestamp(column, percent_to_check=0.1):        
-        try:
-            converted_column = pd.to_datetime(
-                column, errors="coerce", unit='s'
-            )
-            if converted_column.isna().sum() / df_size <= errors_rate:
-                return True, converted_column
-
-        except (ValueError, TypeError) as e:
-            pass
-
-
-    # Fallback for mixed formats, unknown formats, or previous conversion failure
-    # Note: parsing datetimes with mixed time zones will raise an error unless utc=True
-    try:
-        converted_column = pd.to_datetime(
-            column, errors="coerce", format="mixed", utc=True
-        )
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return True, column
+    # numbers are Unix Epoch seconds
+    if pd.api.types.is_numeric_dtype(column):
+        converted_column = convert_datetime(column, ["epoch:s"])
         if converted_column.isna().sum() / df_size <= errors_rate:
             return True, converted_column
-
-    except (ValueError, TypeError) as e:
-        pass
+        return False, None
+
+    # formats of a sample, memoized for columns of the same layouts. The blocks add the
+    # formats the sample missed to a copy, the memoized ones are shared with other columns.
+    # A sample without datetimes doesn't reject the column, the blocks count its failures
+    formats = list(infer_datetime_formats(column, percent_to_check=0.1))
+    converted_column = convert_in_blocks(
+        column,
+        lambda block: _convert_datetime_block(block, formats),
+        errors_rate,
+        combine=_combine_datetimes,
+    )
+    if converted_column is not None:
+        return True, converted_column
 
     # Conversion failed
     return False, None
@@ -132,9 +353,10 @@ def try_convert_to_datetime(column, errors_rate):
 
 def try_convert_to_timedelta(column, errors_rate):
     try:
-        converted_column = pd.to_timedelta(column, errors="coerce")
-
-        if converted_column.isna().sum() / len(column) <= errors_rate:
+        converted_column = convert_in_blocks(
+            column, lambda block: pd.to_timedelta(block, errors="coerce"), errors_rate
+        )
+        if converted_column is not None:
             return True, converted_column
     except (ValueError, TypeError) as e:
         pass
@@ -143,8 +365,10 @@ def try_convert_to_timedelta(column, errors_rate):
 
 def try_convert_to_numeric(column, errors_rate):
     try:
-        converted_column = pd.to_numeric(column, errors="coerce")
-        if converted_column.isna().sum() / len(column) <= errors_rate:
+        converted_column = convert_in_blocks(
+            column, lambda block: pd.to_numeric(block, errors="coerce"), errors_rate
+        )
+        if converted_column is not None:
             return True, converted_column
     except ValueError:
         pass
@@ -154,19 +378,33 @@ def try_convert_to_numeric(column, errors_rate):
 def try_convert_to_category(column, unique_percent_max):
     """
     converts to categorical if percentage of unique entries is less or equal to given unique_percent param
+    distinct values of columns of CATEGORY_SKETCH_MIN_ROWS or more are estimated block by block
+    and stop being counted once the estimate is clearly above or below the threshold
     """
     try:
         # Conversion based on statistic about unique data
         # Percentage of unique values (n/a values are not included), meaning the lower the better
         # If unique close or 100% - there is no reason to categorize
-
-        total_entries = len(column.dropna())
-        percent_unique = (column.dropna().nunique() / total_entries) * 100
+        if unique_percent_max < 100:
+            values = column.dropna()
+            total_entries = len(values)
+            if not total_entries:
+                return False, None
+
+            within = None
+            if total_entries >= CATEGORY_SKETCH_MIN_ROWS:
+                block_rows = max(total_entries // CONVERSION_BLOCKS, MIN_BLOCK_ROWS)
+                within = distinct_within(values, unique_percent_max, block_rows)
+            if within is None:
+                # near the threshold (or a short column) distinct values are counted exactly
+                percent_unique = (values.nunique() / total_entries) * 100
+                within = percent_unique <= unique_percent_max
+            if not within:
+                return False, None
 
         # Check if the column should be categorical
-        if percent_unique <= unique_percent_max:
-            converted_column = column.astype("category")
-            return True, converted_column
+        converted_column = column.astype("category")
+        return True, converted_column
     except ValueError:
         pass
     return False, None
@@ -174,17 +412,29 @@ def try_convert_to_category(column, unique_percent_max):
 
 def try_convert_to_complex(column, errors_rate):
     try:
-        converted_column = column.apply(parse_complex)
-        if converted_column.isna().sum() / len(column) <= errors_rate:
-            return True, converted_column
-    except (ValueError, TypeError):
-        pass
+        # parse_complex fails on missing and other non-string values
+        text = complex_text(column)
+    except TypeError:
+        return False, None
+    # without 'j' or '+' values are plain numbers, numeric conversion had its chance
+    if not has_complex_marks(text):
+        return False, None
+
+    converted_column = convert_distinct(
+        column,
+        lambda values: pd.Series(
+            parse_complex_text(complex_text(values)), index=values.index, name=values.name
+        ),
+    )
+    if converted_column.isna().sum() / len(column) <= errors_rate:
+        return True, converted_column
     return False, None
 
 
 def parse_complex(s):
     """
-    function to convert string to complex number
+    function to convert string to complex number,
+    complex_parser.parse_complex_column parses whole columns with the same rules
     """
     try:
         if "+" in s:
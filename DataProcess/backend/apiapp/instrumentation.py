@@ -0,0 +1,237 @@
+"""
+Per-request stage instrumentation: wall time, CPU time and memory of stages.
+
+A Trace is activated for the work of a request (or a background job), code marks its stages
+with stage(name), which is a no-op when no trace is active. Stages nest and stages with
+the same name add up, e.g. 'infer:<converter>' stages of all columns of a frame, a stage
+nested in a stage of the same name is not counted twice.
+
+Memory of a stage is the growth of peak resident memory of the process during the stage
+(getrusage, no cost), it's not zero only when the stage needed more memory than the process
+ever did before. When tracemalloc is tracing (the benchmark does it) the exact peak of memory
+allocated during the stage is recorded as well, tracing is too slow to leave on.
+
+Finished traces are summed up per endpoint for the metrics endpoint, kept in a short history
+and logged as JSON lines by the 'apiapp.instrumentation' logger.
+"""
+
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# finished traces kept for the metrics endpoint
+RECENT_TRACES = 50
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("trace", default=None)
+_metrics = {}
+_recent = collections.deque(maxlen=RECENT_TRACES)
+_lock = threading.Lock()
+
+# ru_maxrss is in kilobytes on Linux, bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss():
+    """Peak resident memory of the process in bytes, 0 where it's unknown."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+class Trace:
+    """
+    Stages of one request.
+
+    Attributes:
+        name (str): endpoint or job name.
+        stages (dict): {stage: {'seconds', 'cpu_seconds', 'calls', 'peak_rss_growth_bytes'
+            [, 'peak_bytes' when tracemalloc traces]}} in order of first start.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.stages = {}
+        self._stack = []
+        self._start = time.perf_counter(), time.process_time()
+        self.seconds = self.cpu_seconds = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if any(frame["name"] == name for frame in self._stack):
+            # a stage nested in itself is already measured
+            yield
+            return
+        stats = self.stages.setdefault(
+            name,
+            {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0, "peak_rss_growth_bytes": 0},
+        )
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        frame = {
+            "name": name,
+            "start": current if tracing else 0,
+            "peak": current if tracing else 0,
+        }
+        self._stack.append(frame)
+        rss = peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            stats["seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            stats["calls"] += 1
+            stats["peak_rss_growth_bytes"] += peak_rss() - rss
+            if tracing:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak - frame["start"])
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+                tracemalloc.reset_peak()
+
+    def finish(self):
+        """Stops the total time of the trace."""
+        wall, cpu = self._start
+        self.seconds = time.perf_counter() - wall
+        self.cpu_seconds = time.process_time() - cpu
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_bytes": peak_rss(),
+            "stages": self.stages,
+        }
+
+
+@contextlib.contextmanager
+def activate(trace):
+    """Makes trace the one stage() records to in the current thread (context)."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """Active trace or None."""
+    return _current.get()
+
+
+def stage(name):
+    """Context manager recording a stage of the active trace, does nothing without one."""
+    trace = _current.get()
+    return trace.stage(name) if trace is not None else contextlib.nullcontext()
+
+
+def server_timing(trace):
+    """
+    Server-Timing header value of a finished trace: 'total' and every stage in
+    milliseconds with CPU time in the description, ':' of stage names is '.'.
+    """
+    metrics = [
+        f"total;dur={trace.seconds * 1000:.1f};"
+        f'desc="cpu {trace.cpu_seconds * 1000:.1f}ms"'
+    ]
+    for name, stats in trace.stages.items():
+        metrics.append(
+            f"{name.replace(':', '.')};dur={stats['seconds'] * 1000:.1f};"
+            f'desc="cpu {stats["cpu_seconds"] * 1000:.1f}ms"'
+        )
+    return ", ".join(metrics)
+
+
+def record(trace):
+    """Finishes trace, adds it to the metrics and logs it as one JSON line."""
+    trace.finish()
+    state = trace.to_dict()
+    with _lock:
+        totals = _metrics.setdefault(
+            trace.name, {"requests": 0, "seconds": 0.0, "cpu_seconds": 0.0, "stages": {}}
+        )
+        totals["requests"] += 1
+        totals["seconds"] += trace.seconds
+        totals["cpu_seconds"] += trace.cpu_seconds
+        for name, stats in trace.stages.items():
+            stage_totals = totals["stages"].setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "max_peak_rss_growth_bytes": 0,
+                },
+            )
+            stage_totals["calls"] += stats["calls"]
+            stage_totals["seconds"] += stats["seconds"]
+            stage_totals["cpu_seconds"] += stats["cpu_seconds"]
+            stage_totals["max_seconds"] = max(stage_totals["max_seconds"], stats["seconds"])
+            stage_totals["max_peak_rss_growth_bytes"] = max(
+                stage_totals["max_peak_rss_growth_bytes"], stats["peak_rss_growth_bytes"]
+            )
+        _recent.append(state)
+    logger.info(json.dumps({"event": "stages", **state}))
+
+
+def metrics():
+    """Totals of recorded traces per name and the most recent traces."""
+    with _lock:
+        return {
+            "peak_rss_bytes": peak_rss(),
+            "endpoints": json.loads(json.dumps(_metrics)),
+            "recent": list(_recent),
+        }
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _recent.clear()
+
+
+def instrumented(name):
+    """
+    View decorator: the view runs with an active trace of name, rendering of the response
+    is its 'render' stage. The trace is recorded and sent in the Server-Timing header.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            trace = Trace(name)
+            with activate(trace):
+                response = view(request, *args, **kwargs)
+                render = getattr(response, "render", None)
+                if render is not None:
+                    with trace.stage("render"):
+                        render()
+            record(trace)
+            response["Server-Timing"] = server_timing(trace)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,147 @@
+"""
+Background jobs for long uploads, run in an in-process thread pool (no external broker).
+
+A job gets an id right away, the work runs in the pool and reports progress of its
+stages: read, infer (per column) and serialize. Jobs are kept in memory of the server
+process, finished ones for ttl seconds, so status has to be polled from the same process.
+"""
+
+import copy
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+STAGES = ["read", "infer", "serialize"]
+
+DEFAULT_WORKERS = 2
+DEFAULT_TTL = 60 * 60
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+
+
+class JobError(Exception):
+    """Expected failure of a job, message is shown to the user."""
+
+
+class JobProgress:
+    """
+    Thread-safe progress of job stages.
+    Every stage is {'status': 'pending' | 'running' | 'done', 'done': int, 'total': int or None},
+    done and total count stage units: rows read, columns inferred.
+    """
+
+    def __init__(self, stages=STAGES):
+        self._lock = threading.Lock()
+        self.stages = {
+            name: {"status": "pending", "done": 0, "total": None} for name in stages
+        }
+
+    def start(self, stage, total=None):
+        with self._lock:
+            self.stages[stage].update(status="running", total=total)
+
+    def advance(self, stage, count=1):
+        with self._lock:
+            self.stages[stage]["done"] += count
+
+    def finish(self, stage):
+        with self._lock:
+            state = self.stages[stage]
+            state["status"] = "done"
+            if state["total"] is not None:
+                state["done"] = state["total"]
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self.stages)
+
+
+class Job:
+    """
+    Attributes:
+        id (str): job id.
+        status (str): 'queued', 'running', 'done' or 'failed'.
+        progress (JobProgress): stages progress.
+        result: return value of the job function when done.
+        error (str): message when failed.
+    """
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = "queued"
+        self.progress = JobProgress()
+        self.result = None
+        self.error = None
+        self.finished = None
+
+    def to_dict(self):
+        state = {"job_id": self.id, "status": self.status, "stages": self.progress.snapshot()}
+        if self.status == "done":
+            state["result"] = self.result
+        if self.status == "failed":
+            state["error"] = self.error
+        return state
+
+    def run(self, func, args):
+        self.status = "running"
+        try:
+            self.result = func(*args, progress=self.progress)
+            self.status = "done"
+        except JobError as e:
+            self.error = str(e)
+            self.status = "failed"
+        except Exception as e:
+            self.error = f"Job failed: {str(e)}"
+            self.status = "failed"
+        finally:
+            self.finished = time.monotonic()
+
+
+def get_executor(workers=DEFAULT_WORKERS):
+    """Process wide pool of job threads, created on first use."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        return _executor
+
+
+def prune(ttl=DEFAULT_TTL):
+    """Forgets jobs finished more than ttl seconds ago."""
+    now = time.monotonic()
+    with _lock:
+        for job_id in [
+            job_id
+            for job_id, job in _jobs.items()
+            if job.finished is not None and now - job.finished > ttl
+        ]:
+            del _jobs[job_id]
+
+
+def submit(func, *args, workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL):
+    """
+    Runs func(*args, progress=JobProgress) in the background.
+
+    Args:
+        func (callable): job function, raises JobError on expected failures.
+        workers (int): size of the pool, used when the pool is created.
+        ttl (int): seconds finished jobs are kept.
+
+    Returns:
+        Job: queued job.
+    """
+    prune(ttl)
+    job = Job()
+    with _lock:
+        _jobs[job.id] = job
+    get_executor(workers).submit(job.run, func, args)
+    return job
+
+
+def get_job(job_id):
+    """Returns Job or None when unknown or already forgotten."""
+    with _lock:
+        return _jobs.get(str(job_id))
@@ -0,0 +1,105 @@
+"""
+Size-bounded in-process cache of DataFrames and other values.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# values of an object column measured to estimate its size
+SIZE_SAMPLE = 1000
+
+
+def frame_size(df):
+    """Memory used by DataFrame in bytes, object values included."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def column_size(column):
+    """
+    Memory used by a column in bytes without its index. Object values of long columns are
+    estimated from an evenly spaced sample: measuring every string of a text column takes
+    longer than converting it.
+    """
+    if column.dtype != "object" or len(column) <= SIZE_SAMPLE:
+        return int(column.memory_usage(deep=True, index=False))
+    sample = column.iloc[np.linspace(0, len(column) - 1, SIZE_SAMPLE).astype(int)]
+    values = sample.memory_usage(deep=True, index=False) - sample.memory_usage(index=False)
+    return int(column.memory_usage(index=False) + values / SIZE_SAMPLE * len(column))
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with size-based eviction and TTL expiry.
+
+    Args:
+        max_bytes (int): total size of values kept, the least recently used are evicted first.
+        ttl (float): seconds since the last use after which an entry expires.
+        sizeof (callable): size of a value in bytes.
+    """
+
+    def __init__(self, max_bytes, ttl, sizeof=frame_size):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, size, last used)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns cached value or None, marks it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, used = entry
+            now = time.monotonic()
+            if now - used > self.ttl:
+                self._remove(key)
+                return None
+            self._entries[key] = (value, size, now)
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Adds value, values larger than max_bytes are not cached."""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self.size += size
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [k for k, (_, _, used) in self._entries.items() if now - used > self.ttl]
+        for key in expired:
+            self._remove(key)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
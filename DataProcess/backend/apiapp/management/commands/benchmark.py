@@ -0,0 +1,74 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apiapp import benchmark
+from apiapp.views import format_response
+
+
+def _serialize(df):
+    """Response of the process-file view."""
+    return json.dumps(format_response(df))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks read, inference (per converter), serialization and persistence of "
+        "synthetic datasets and writes results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[10_000, 100_000],
+            help="row counts of the datasets",
+        )
+        parser.add_argument("--columns", type=int, default=len(benchmark.KINDS))
+        parser.add_argument(
+            "--kinds", nargs="+", default=benchmark.KINDS, choices=benchmark.KINDS,
+            help="column kinds, repeated in order up to --columns",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="timing runs per dataset")
+        parser.add_argument("--engine", default="classifier", choices=["classifier", "cascade", "sample"])
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--no-memory", action="store_true", help="skip the traced memory run")
+        parser.add_argument("--output", help="results file, standard output if omitted")
+        parser.add_argument("--baseline", help="results file of an earlier run to compare with")
+        parser.add_argument(
+            "--tolerance", type=float, default=benchmark.DEFAULT_TOLERANCE,
+            help="stages slower than tolerance * baseline (and by more than 50 ms) fail the run",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        results = benchmark.run_benchmark(
+            rows=options["rows"],
+            columns=options["columns"],
+            kinds=options["kinds"],
+            repeat=options["repeat"],
+            memory=not options["no_memory"],
+            engine=options["engine"],
+            seed=options["seed"],
+            serialize=_serialize,
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            self.stdout.write("")
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options["tolerance"])
+            for r in regressions:
+                self.stderr.write(
+                    f"{r['rows']}x{r['columns']} {r['stage']}: {r['seconds']:.3f}s, "
+                    f"baseline {r['baseline']:.3f}s ({r['ratio']}x)"
+                )
+            if regressions:
+                raise CommandError(f"{len(regressions)} stage(s) regressed")
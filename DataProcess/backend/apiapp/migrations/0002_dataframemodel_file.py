@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='file',
+            field=models.FileField(blank=True, null=True, upload_to='dataframes/'),
+        ),
+        migrations.AlterField(
+            model_name='dataframemodel',
+            name='data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.10 on 2026-10-17 11:40
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+def gen_dataset_ids(apps, schema_editor):
+    DataFrameModel = apps.get_model("apiapp", "DataFrameModel")
+    for row in DataFrameModel.objects.all():
+        row.dataset_id = uuid.uuid4()
+        row.save(update_fields=["dataset_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0002_dataframemodel_file'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='dataframemodel',
+            options={'ordering': ['-created']},
+        ),
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='dataset_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(gen_dataset_ids, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dataframemodel',
+            name='dataset_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0003_dataframemodel_dataset_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='col_def',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
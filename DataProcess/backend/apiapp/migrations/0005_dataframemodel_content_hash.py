@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0004_dataframemodel_col_def'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
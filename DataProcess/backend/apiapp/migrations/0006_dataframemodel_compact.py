@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0005_dataframemodel_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='compact',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apiapp', '0006_dataframemodel_compact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataframemodel',
+            name='out_of_core',
+            field=models.BooleanField(default=False),
+        ),
+    ]
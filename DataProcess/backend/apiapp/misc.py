@@ -1,22 +1,8 @@
 import pandas as pd
-from datetime import datetime
 import re
 
 
-def is_binary(file):
-    """
-    Check if a file is binary by reading the first few bytes and checking for NULL bytes.
-    """
-    CHUNK_SIZE = 1024
-    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
-        if b"\x00" in chunk:  # Check for NULL bytes
-            file.seek(0)
-            return True
-    file.seek(0)
-    return False
-
-
-def get_sample(column, percent_to_check=0.1, min_samples=3):
+def get_sample(column, percent_to_check=0.1, min_samples=3, random_state=None):
     
     """
     Extracts a representative sample from a specified column of a DataFrame.
@@ -27,6 +13,7 @@ def get_sample(column, percent_to_check=0.1, min_samples=3):
             when determining the sample size. Defaults to 0.1 (10%).
         min_samples (int, optional): The minimum number of samples to include in the sample,
             even if it exceeds the calculated percentage. Defaults to 3.
+        random_state (int, optional): seed for a reproducible sample. Defaults to None.
 
     Returns:
         pandas.Series: A sample of the specified column.
@@ -41,7 +28,7 @@ def get_sample(column, percent_to_check=0.1, min_samples=3):
     if df_size < min_samples_required:
         min_samples_required = df_size
     
-    sample = column.sample(n=min_samples_required)
+    sample = column.sample(n=min_samples_required, random_state=random_state)
     return sample
 
 
@@ -111,54 +98,3 @@ def has_any_unix_timestamp(column, percent_to_check=0.1):
     
 
     return False  # No valid integer conversions found
-
-
-def infer_datetime_format(column, percent_to_check = 0.1):
-    """
-    Attempts to infer the datetime format of a column in a DataFrame.
-
-    This function checks a sample of the data (default 10%) to determine if all values can be converted
-    to datetime objects using a consistent format.
-
-    Args:
-        column (pandas dataframe): The column containing data to be checked.
-        percent_to_check (float, optional): The proportion of the data to sample (0 to 1). Defaults to 0.1.
-
-    Returns:
-        str or None: The discovered format string if all data is consistent,
-                       'mixed' if different formats are found,
-                       None if no format is discovered (likely non-datetime data).
-    """
-
-    common_format = None
-
-    # Iterate over the random values specified by rec_num of the column
-    for value in get_sample(column, percent_to_check=percent_to_check):
-        try:
-            # Try to parse the value as a datetime object with various formats
-            parsed_value = None
-
-            # add more formats
-            for format_str in ["%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%d %H:%M:%S%z", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%Y/%d/%m"]:
-                try:
-                    parsed_value = datetime.strptime(value, format_str)
-                    break  # Exit loop if successfully parsed with a format
-                except ValueError:
-                    pass  # Continue to next format if parsing fails
-
-            # If parsing fails for all formats, skip this value
-            if parsed_value is None:
-                continue
-
-            # If this is the first parsed value, set the common format
-            if common_format is None:
-                common_format = format_str
-            # If the format of this value is different from common_format, return 'mixed'
-            elif common_format != format_str:
-                return "mixed"
-        except TypeError:
-            # Skip if value is NaN
-            continue
-
-    # returns format if values have the same format and format will be None if no value were converted or format found
-    return common_format
@@ -1,15 +1,79 @@
+from django.core.files.storage import default_storage
 from django.db import models
+import io
+import os
+import shutil
+import uuid
 import pandas as pd
 
+from . import dataframe_storage as dfs
+
 
 class DataFrameModel(models.Model):
-    data = models.JSONField()
+    # key of the dataset returned to the client
+    dataset_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    # legacy JSON of DataFrames persisted before binary storage: 'split' orient of
+    # streamed uploads, the default 'columns' orient of the others
+    data = models.JSONField(null=True, blank=True)
+    # Arrow IPC file of the DataFrame, keeps dtypes and is memory-mapped on load
+    file = models.FileField(upload_to="dataframes/", null=True, blank=True)
+    # explicit column types applied so far, the converted dataset is reproduced with them
+    col_def = models.JSONField(default=list, blank=True)
+    # SHA-256 of the uploaded file, the same upload reuses the stored file and results
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # converted frames of the dataset use memory-compact dtypes
+    compact = models.BooleanField(default=False)
+    # converted columns are kept on disk in a column store next to the file, see column_store
+    out_of_core = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-created"]
 
     @classmethod
-    def load_dataframe(cls):
-        """Converts model jsonField to the DataFrame and returns it."""
-        obj = cls.objects.first()
+    def load_dataframe(cls, dataset_id=None):
+        """Reads the persisted DataFrame of the dataset (the latest one if not given) and returns it."""
+        if dataset_id:
+            obj = cls.objects.filter(dataset_id=dataset_id).first()
+        else:
+            obj = cls.objects.first()
         if obj:
-            return pd.read_json(obj.data)
+            return obj.to_dataframe()
         else:
             return None  # Handle the case where there's no data stored
+
+    @classmethod
+    def prune(cls, keep):
+        """Deletes all but the latest keep datasets together with their files."""
+        for obj in cls.objects.all()[keep:]:
+            if obj.out_of_core:
+                shutil.rmtree(cls.store_path(obj.file.name), ignore_errors=True)
+            if obj.file:
+                obj.file.delete(save=False)
+            obj.delete()
+
+    @staticmethod
+    def new_file_name():
+        """Returns storage name for a new DataFrame file."""
+        return f"dataframes/{uuid.uuid4().hex}.arrow"
+
+    @staticmethod
+    def file_path(name):
+        """Returns file system path of a storage name, to write DataFrame file to."""
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    @staticmethod
+    def store_path(name):
+        """Returns file system path of the column store directory of a DataFrame file name."""
+        return default_storage.path(os.path.splitext(name)[0] + ".columns")
+
+    def to_dataframe(self, columns=None):
+        """Converts stored file (or legacy JSON) to the DataFrame."""
+        if self.file:
+            return dfs.read_dataframe(self.file.path, columns=columns)
+        # column values of the 'columns' orient are objects, never a list
+        orient = "split" if self.data.startswith('{"columns":[') else "columns"
+        df = pd.read_json(io.StringIO(self.data), orient=orient)
+        return df if columns is None else df[columns]
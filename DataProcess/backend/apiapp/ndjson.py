@@ -0,0 +1,51 @@
+"""
+Newline-delimited JSON (NDJSON) streaming of converted frames.
+
+The first line is the response header (column definitions, total rows and the rest of
+the JSON response without "data"), every next line is one row as a JSON record. Rows are
+serialized by pandas in chunks, so only one chunk of text is in memory at a time and the
+client gets the header and first rows before the last ones are serialized. Rows of a column
+store are read chunk by chunk too.
+"""
+
+import json
+
+from .column_store import StoreRows
+
+MEDIA_TYPE = "application/x-ndjson"
+# rows serialized at once
+DEFAULT_CHUNK_ROWS = 10_000
+
+
+def json_default(value):
+    """numpy scalars and arrays in the header."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps_line(data):
+    """One NDJSON line of a JSON-serializable value."""
+    return json.dumps(data, default=json_default).encode() + b"\n"
+
+
+def ndjson_lines(header, df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Generates NDJSON of a frame: the header line, then rows in chunks.
+
+    Args:
+        header (dict): first line.
+        df (pd.DataFrame or column_store.StoreRows): rows, serialized like the "data" of
+            JSON responses.
+        chunk_rows (int): rows serialized (and read from store) at once.
+
+    Returns:
+        Iterator[bytes]: header line, then one block of lines per chunk of rows.
+    """
+    yield dumps_line(header)
+    if isinstance(df, StoreRows):
+        chunks = df.frames(chunk_rows)
+    else:
+        chunks = (df.iloc[start : start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    for chunk in chunks:
+        yield chunk.to_json(orient="records", lines=True, date_format="iso").encode()
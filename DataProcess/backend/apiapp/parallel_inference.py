@@ -0,0 +1,166 @@
+"""
+Parallel column inference in a pool of worker processes.
+
+Columns are not pickled to workers. Text columns to infer are written once into an Arrow
+IPC file in a temporary directory (in shared memory /dev/shm where available), every
+worker memory-maps it and reads only its column. A converted column comes back the same
+way, through its own Arrow file, so only file paths travel between processes.
+
+Each column is inferred with infer_data_types.infer_column, the result is identical to
+the serial path. Columns Arrow can't carry exactly (values other than strings, None mixed
+with NaN) are inferred in the calling process.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import dataframe_storage as dfs
+from . import infer_data_types as idt
+
+# smaller frames are inferred serially, starting workers costs more than it saves
+MIN_PARALLEL_ROWS = 10_000
+
+_pool = None
+_pool_workers = 0
+
+
+def get_pool(workers):
+    """Process wide worker pool, recreated when the number of workers changes."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def _temp_dir():
+    shm = "/dev/shm"
+    return tempfile.mkdtemp(prefix="inference-", dir=shm if os.path.isdir(shm) else None)
+
+
+def is_transferable(column):
+    """
+    True when the column round-trips through an Arrow string column unchanged:
+    a string name, string values and missing values all NaN or all None.
+    """
+    if not isinstance(column.name, str):
+        return False
+    if pd.api.types.infer_dtype(column, skipna=True) != "string":
+        return False
+    nulls = column[column.isna()]
+    return all(v is None for v in nulls) or all(isinstance(v, float) for v in nulls)
+
+
+def _nulls_are_none(column):
+    """Missing values of a transferable column are None, Arrow nulls are read back as None."""
+    nulls = column[column.isna()]
+    return bool(len(nulls)) and nulls.iloc[0] is None
+
+
+def _infer_column_file(path, col, null_none, result_path, engine, confidence, errors_rate):
+    """
+    Worker task: infers column col of the memory-mapped Arrow file at path.
+
+    Returns:
+        None when the column stays text, result_path when the converted column was written
+        there, or the converted column itself when Arrow can't carry its dtype (object).
+    """
+    column = dfs.read_dataframe(path, columns=[col])[col]
+    if not null_none:
+        column = column.where(column.notna(), np.nan)
+
+    data = idt.infer_column(column, engine, confidence, errors_rate)
+    if data is None:
+        return None
+    if data.dtype == "object":
+        return data
+    dfs.write_dataframe(data.to_frame(col), result_path)
+    return result_path
+
+
+def _submit(df, columns, workers, temp_dir, engine, confidence, errors_rate):
+    """Writes columns to an Arrow file in temp_dir, returns {column: future of its worker task}."""
+    if not columns:
+        return {}
+    path = os.path.join(temp_dir, "columns.arrow")
+    with dfs.ChunkWriter(path, as_text=True) as writer:
+        writer.write(df[columns].reset_index(drop=True))
+
+    pool = get_pool(workers)
+    return {
+        col: pool.submit(
+            _infer_column_file,
+            path,
+            col,
+            _nulls_are_none(df[col]),
+            os.path.join(temp_dir, f"{i}.arrow"),
+            engine,
+            confidence,
+            errors_rate,
+        )
+        for i, col in enumerate(columns)
+    }
+
+
+def infer_columns_parallel(
+    df,
+    columns,
+    workers,
+    engine="classifier",
+    confidence=idt.SAMPLE_CONFIDENCE,
+    errors_rate=idt.ERRORS_RATE,
+    min_rows=MIN_PARALLEL_ROWS,
+    on_column=None,
+):
+    """
+    Infers and converts columns of df in worker processes.
+
+    Args:
+        df (pd.DataFrame): frame, not modified.
+        columns (list): object columns to infer.
+        workers (int): number of worker processes.
+        engine, confidence, errors_rate: see infer_and_convert_data_types.
+        min_rows (int): frames with fewer rows are inferred serially.
+        on_column (callable, optional): called with the name of every inferred column.
+
+    Returns:
+        dict: column -> converted pd.Series with the index of df, for converted columns only.
+    """
+    parallel = [col for col in columns if is_transferable(df[col])]
+    if len(df) < min_rows or len(parallel) < 2:
+        parallel = []
+
+    temp_dir = _temp_dir() if parallel else None
+    try:
+        futures = _submit(df, parallel, workers, temp_dir, engine, confidence, errors_rate)
+
+        # the rest is inferred here while workers run
+        results = {}
+        for col in columns:
+            if col not in futures:
+                data = idt.infer_column(df[col], engine, confidence, errors_rate)
+                if data is not None:
+                    results[col] = data
+                if on_column:
+                    on_column(col)
+
+        for col, future in futures.items():
+            result = future.result()
+            if isinstance(result, str):
+                result = dfs.read_dataframe(result, memory_map=False)[col]
+            if result is not None:
+                results[col] = result.set_axis(df.index)
+            if on_column:
+                on_column(col)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
@@ -0,0 +1,55 @@
+"""
+Renderers of the converted data formats clients pick with the Accept header (or ?format=).
+Views stream rows of converted data in these formats themselves (see views.rows_response),
+renderers render other responses, e.g. errors, in the accepted format.
+"""
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from . import columnar
+from . import ndjson
+
+
+class NDJSONRenderer(BaseRenderer):
+    """'Accept: application/x-ndjson' or ?format=ndjson, a response is one line."""
+
+    media_type = ndjson.MEDIA_TYPE
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ndjson.dumps_line(data)
+
+
+class ArrowRenderer(BaseRenderer):
+    """
+    'Accept: application/vnd.apache.arrow.stream' or ?format=arrow, a response is
+    an Arrow IPC stream without rows with the response in its schema metadata.
+    """
+
+    media_type = columnar.ARROW_MEDIA_TYPE
+    format = "arrow"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return columnar.arrow_message(data)
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    """'Accept: application/vnd.dataprocess.columnar+json' or ?format=columnar."""
+
+    media_type = columnar.COLUMNAR_MEDIA_TYPE
+    format = "columnar"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ndjson.dumps_line(data)[:-1]
+
+
+# renderers of views with row data
+DATA_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [
+    NDJSONRenderer,
+    ArrowRenderer,
+    ColumnarJSONRenderer,
+]
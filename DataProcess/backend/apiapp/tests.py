@@ -0,0 +1,817 @@
+"""
+API tests of the views, run with Django's test runner (python manage.py test apiapp).
+Conversion logic without Django is tested in data_test.py.
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.test import override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from . import column_store
+from . import columnar
+from . import dataframe_storage as dfs
+from . import dataset_store as dss
+from . import jobs
+from . import views
+from .models import DataFrameModel
+
+# the sample CSV of data_test.py
+csv_string = """
+Time,Name,Birthdate,Score,Grade,Sum
+  01:30:00,Alice,1/01/1990,1709991489000,A,1+2j
+  00:15:42,Bob,2023-09-15 12:30:45-05:00,75,B,2+3j
+  02:00:00,Charlie,3/03/1992,85,A,3+2
+  102:30:50,David,4/04/1993,70,B,7j
+  01:30:00,P0DT1H30M,Not Available,Not Available,A,8
+  nan,2+3j,2023-09-15 12:30:45+00:00,1500,B,abc
+"""
+
+
+class APITestingMixin:
+    """Datasets of a test are stored in a temporary MEDIA_ROOT, caches start empty."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        dss._cache = dss._converted_cache = dss._result_cache = None
+        # stage timings of every request are not logged
+        logger = logging.getLogger("apiapp.instrumentation")
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.WARNING)
+
+    def upload(self, data=csv_string, name="data.csv", query="", **headers):
+        file = io.BytesIO(data.encode() if isinstance(data, str) else data)
+        file.name = name
+        return self.client.post(
+            f"/api/process-file/{query}", {"file": file}, format="multipart", **headers
+        )
+
+
+class APITesting(APITestingMixin, APITestCase):
+    pass
+
+
+class UploadFormatsTesting(APITesting):
+    """Small uploads are in-memory files, their reader must still get bytes."""
+
+    def uploads(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as file:
+            file.writestr("data.csv", csv_string)
+        latin = csv_string + "  01:00:00,Zoë,1/01/2000,90,A,1\n"
+        return {
+            "gzip": ("data.csv.gz", gzip.compress(csv_string.encode()), 6),
+            "zip": ("data.zip", archive.getvalue(), 6),
+            "utf-16": ("data.csv", csv_string.encode("utf-16"), 6),
+            "latin-1": ("data.csv", latin.encode("latin-1"), 7),
+        }
+
+    def test_compressed_and_encoded_csv(self):
+        expected = self.upload().json()["columns_def"]
+        for label, (name, data, rows) in self.uploads().items():
+            for query in ("", "?stream=1", "?out_of_core=1"):
+                with self.subTest(upload=label, query=query):
+                    response = self.upload(data, name, query)
+
+                    self.assertEqual(response.status_code, 200)
+                    body = response.json()
+                    self.assertEqual(body["total_rows"], rows)
+                    self.assertEqual(
+                        [(d["field"], d["df_type"]) for d in body["columns_def"]],
+                        [(d["field"], d["df_type"]) for d in expected],
+                    )
+                    if label == "latin-1":
+                        self.assertEqual(json.loads(body["data"])[-1]["Name"], "Zoë")
+
+
+class LegacyDatasetTesting(APITesting):
+
+    def test_legacy_json_orients(self):
+        df = pd.read_csv(io.StringIO(csv_string))
+        for data in (df.to_json(), df.to_json(orient="split")):
+            model = DataFrameModel.objects.create(data=data)
+            self.assertTrue(model.to_dataframe().equals(df))
+            self.assertTrue(model.to_dataframe(columns=["Score"]).equals(df[["Score"]]))
+
+    def test_apply_conversion_to_legacy_dataset(self):
+        df = pd.read_csv(io.StringIO(csv_string))
+        DataFrameModel.objects.create(data=df.to_json())
+
+        response = self.client.post(
+            "/api/apply-conversion/", [{"field": "Score", "type": "number"}], format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        types = {d["field"]: d["df_type"] for d in response.json()["columns_def"]}
+        self.assertEqual(types["Score"], "float64")
+
+
+class ApplyConversionTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+
+    def apply(self, payload):
+        return self.client.post("/api/apply-conversion/", payload, format="json")
+
+    def test_dataset_payload(self):
+        response = self.apply(
+            {"dataset_id": self.dataset_id, "col_def": [{"field": "Grade", "type": "string"}]}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["dataset_id"], self.dataset_id)
+        self.assertTrue(body["partial"])
+        self.assertEqual(
+            [(d["field"], d["df_type"]) for d in body["columns_def"]], [("Grade", "object")]
+        )
+        self.assertEqual(json.loads(body["data"])[0], {"Grade": "A"})
+
+    def test_unchanged_columns_are_not_returned(self):
+        col_def = [{"field": "Grade", "type": "string"}]
+        self.apply({"dataset_id": self.dataset_id, "col_def": col_def})
+        response = self.apply({"dataset_id": self.dataset_id, "col_def": col_def})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["columns_def"], [])
+
+    def test_legacy_list_payload_converts_latest_dataset(self):
+        response = self.apply([{"field": "Score", "type": "number"}])
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body["partial"])
+        types = {d["field"]: d["df_type"] for d in body["columns_def"]}
+        self.assertEqual(len(types), 6)
+        self.assertEqual(types["Score"], "float64")
+        self.assertEqual(types["Grade"], "category")
+
+    def test_legacy_list_payload_without_datasets(self):
+        DataFrameModel.objects.all().delete()
+        response = self.apply([{"field": "Score", "type": "number"}])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "No dataset uploaded"})
+
+    def test_unknown_dataset(self):
+        for dataset_id in ("00000000-0000-0000-0000-000000000000", "not-a-uuid"):
+            response = self.apply({"dataset_id": dataset_id, "col_def": []})
+            self.assertEqual(response.status_code, 404)
+            self.assertIn(dataset_id, response.json()["error"])
+
+
+class ChangedColumnsTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+
+    def apply(self, col_def):
+        with mock.patch.object(views, "convert_data", wraps=views.convert_data) as convert:
+            response = self.client.post(
+                "/api/apply-conversion/",
+                {"dataset_id": self.dataset_id, "col_def": col_def},
+                format="json",
+            )
+        # columns of the frames converted by the request
+        converted = [list(call.args[0].columns) for call in convert.call_args_list]
+        return response, converted
+
+    def test_changed(self):
+        converted = dss.ConvertedDataset(None, {"Score": "number"})
+        col_def = [{"field": "Score", "type": "number"}, {"field": "Grade", "type": "string"}]
+
+        self.assertEqual(converted.changed(col_def), col_def[1:])
+        self.assertEqual(converted.changed([]), [])
+
+    def test_only_changed_columns_are_converted(self):
+        score = [{"field": "Score", "type": "number"}]
+        response, converted = self.apply(score)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(converted, [["Score"]])
+
+        time = dss.get_converted(self.dataset_id).df["Time"]
+        grade = [{"field": "Grade", "type": "string"}]
+        response, converted = self.apply(score + grade)
+
+        self.assertEqual(converted, [["Grade"]])
+        self.assertEqual([d["field"] for d in response.json()["columns_def"]], ["Grade"])
+        dataset = dss.get_converted(self.dataset_id)
+        self.assertTrue(np.shares_memory(dataset.df["Time"].to_numpy(), time.to_numpy()))
+        self.assertEqual(dataset.df["Score"].dtype, "float64")
+        model = DataFrameModel.objects.get(dataset_id=self.dataset_id)
+        self.assertEqual(model.col_def, score + grade)
+
+    def test_only_changed_columns_are_measured(self):
+        with mock.patch.object(dss, "column_size", wraps=dss.column_size) as column_size:
+            response, _ = self.apply([{"field": "Grade", "type": "string"}])
+
+        self.assertEqual(response.status_code, 200)
+        # once for both caches
+        self.assertEqual([call.args[0].name for call in column_size.call_args_list], ["Grade"])
+        dataset = dss.get_converted(self.dataset_id)
+        self.assertEqual(
+            dataset.nbytes, int(dataset.df.memory_usage(deep=True, index=True).sum())
+        )
+
+    def test_full_conversion_without_cached_frame(self):
+        score = [{"field": "Score", "type": "number"}]
+        self.apply(score)
+        dss._converted_cache = None
+        dss._result_cache = None
+
+        grade = [{"field": "Grade", "type": "string"}]
+        response, converted = self.apply(score + grade)
+
+        # the dataset is converted again with its persisted col_def, then the change
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(converted), 2)
+        self.assertEqual(len(converted[0]), 6)
+        self.assertEqual(converted[1], ["Grade"])
+        dataset = dss.get_converted(self.dataset_id)
+        self.assertEqual(dataset.df["Score"].dtype, "float64")
+        self.assertEqual(dataset.df["Grade"].dtype, "object")
+
+    def test_pruned_dataset(self):
+        DataFrameModel.objects.filter(dataset_id=self.dataset_id).delete()
+        response, _ = self.apply([{"field": "Grade", "type": "string"}])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(self.dataset_id, response.json()["error"])
+
+
+class DatasetRowsTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+
+    def rows(self, query="", dataset_id=None):
+        return self.client.get(f"/api/datasets/{dataset_id or self.dataset_id}/rows/{query}")
+
+    def test_paging(self):
+        response = self.rows("?offset=2&limit=3")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            {key: body[key] for key in ("dataset_id", "total_rows", "offset", "limit")},
+            {"dataset_id": self.dataset_id, "total_rows": 6, "offset": 2, "limit": 3},
+        )
+        self.assertEqual(
+            [row["Name"] for row in json.loads(body["data"])], ["Charlie", "David", "P0DT1H30M"]
+        )
+
+    def test_selected_columns(self):
+        body = self.rows("?limit=2&columns=Grade,Score").json()
+        self.assertEqual(
+            json.loads(body["data"]),
+            [{"Grade": "A", "Score": 1709991489000.0}, {"Grade": "B", "Score": 75.0}],
+        )
+
+    def test_offset_out_of_range(self):
+        for query in ("?offset=100", "?offset=6&limit=5"):
+            body = self.rows(query).json()
+            self.assertEqual(body["total_rows"], 6)
+            self.assertEqual(json.loads(body["data"]), [])
+
+    def test_negative_values_are_clipped(self):
+        body = self.rows("?offset=-5&limit=-1").json()
+        self.assertEqual((body["offset"], body["limit"]), (0, 0))
+        self.assertEqual(json.loads(body["data"]), [])
+
+    def test_invalid_params(self):
+        for query in ("?offset=x", "?limit=1.5", "?columns=Grade,Nope"):
+            response = self.rows(query)
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("error", response.json())
+
+    def test_unknown_dataset(self):
+        response = self.rows(dataset_id="00000000-0000-0000-0000-000000000000")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("not found", response.json()["error"])
+
+
+class JobsTesting(APITestingMixin, APITransactionTestCase):
+    """Jobs run in other threads, their database writes are committed."""
+
+    def wait(self, job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self.client.get(f"/api/jobs/{job_id}/")
+            if response.json()["status"] in ("done", "failed") or time.monotonic() > deadline:
+                return response
+            time.sleep(0.05)
+
+    def test_job_result_and_progress(self):
+        response = self.upload(query="?async=1")
+
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertIn(job["status"], ("queued", "running"))
+        self.assertEqual(list(job["stages"]), jobs.STAGES)
+
+        response = self.wait(job["job_id"])
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual({stage["status"] for stage in job["stages"].values()}, {"done"})
+        self.assertEqual(job["stages"]["read"]["done"], 6)
+        infer = job["stages"]["infer"]
+        self.assertEqual(infer["done"], infer["total"])
+        self.assertEqual(job["result"]["total_rows"], 6)
+
+        dataset_id = job["result"]["dataset_id"]
+        response = self.client.get(f"/api/datasets/{dataset_id}/rows/?limit=1")
+        self.assertEqual(response.status_code, 200)
+
+    def test_streamed_job(self):
+        job = self.upload(query="?async=1&stream=1").json()
+        job = self.wait(job["job_id"]).json()
+
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["stages"]["read"]["done"], 6)
+        self.assertEqual(len(job["result"]["columns_def"]), 6)
+
+    def test_failed_job(self):
+        job = self.upload(b"\x00\x01\x02\xff" * 64, "data.bin", "?async=1").json()
+        job = self.wait(job["job_id"]).json()
+
+        self.assertEqual(job["status"], "failed")
+        self.assertNotIn("result", job)
+        self.assertTrue(job["error"].startswith("Unknown file format"))
+
+    def test_unknown_job(self):
+        response = self.client.get("/api/jobs/00000000-0000-0000-0000-000000000000/")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("not found", response.json()["error"])
+
+
+class ResultReuseTesting(APITesting):
+
+    def upload_counting(self, query=""):
+        """Uploads csv_string, returns the response and the number of conversions it ran."""
+        with mock.patch.object(views, "convert_data", wraps=views.convert_data) as convert:
+            response = self.upload(query=query)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), convert.call_count
+
+    def test_same_upload_reuses_result(self):
+        first, conversions = self.upload_counting()
+        self.assertEqual(conversions, 1)
+        second, conversions = self.upload_counting()
+
+        self.assertEqual(conversions, 0)
+        self.assertNotEqual(second["dataset_id"], first["dataset_id"])
+        for key in ("columns_def", "data", "total_rows"):
+            self.assertEqual(second[key], first[key])
+        # the new dataset links the stored file of the first one
+        models = [
+            DataFrameModel.objects.get(dataset_id=body["dataset_id"]) for body in (first, second)
+        ]
+        self.assertEqual(models[0].content_hash, models[1].content_hash)
+        self.assertTrue(os.path.samefile(models[0].file.path, models[1].file.path))
+        response = self.client.post(
+            "/api/apply-conversion/",
+            {"dataset_id": second["dataset_id"], "col_def": [{"field": "Grade", "type": "string"}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_compact_results_are_cached_apart(self):
+        self.upload_counting()
+        compact, conversions = self.upload_counting("?compact=1")
+
+        self.assertEqual(conversions, 1)
+        self.assertIn("memory", compact)
+        _, conversions = self.upload_counting("?compact=1")
+        self.assertEqual(conversions, 0)
+
+    def test_missing_source_file_is_converted_again(self):
+        first, _ = self.upload_counting()
+        os.remove(DataFrameModel.objects.get(dataset_id=first["dataset_id"]).file.path)
+        second, conversions = self.upload_counting()
+
+        self.assertEqual(conversions, 1)
+        self.assertEqual(second["columns_def"], first["columns_def"])
+
+    def test_out_of_core_upload_is_not_reused(self):
+        self.upload_counting()
+        response = self.upload(query="?out_of_core=1")
+
+        self.assertEqual(response.status_code, 200)
+        model = DataFrameModel.objects.get(dataset_id=response.json()["dataset_id"])
+        self.assertTrue(model.out_of_core)
+
+
+def streamed(response):
+    """Body of a streamed response."""
+    return b"".join(response.streaming_content)
+
+
+class NDJSONTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertTrue(response.streaming)
+        body = streamed(response)
+        self.assertTrue(body.endswith(b"\n"))
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_process_file(self):
+        accept = {"HTTP_ACCEPT": "application/x-ndjson"}
+        for query, headers in (("", accept), ("?format=ndjson", {})):
+            header, *rows = self.lines(self.upload(query=query, **headers))
+
+            self.assertNotIn("data", header)
+            self.assertEqual((header["total_rows"], header["limit"]), (6, 6))
+            self.assertEqual(len(header["columns_def"]), 6)
+            self.assertEqual(len(rows), 6)
+            self.assertEqual(rows[0]["Name"], "Alice")
+            self.assertEqual((rows[3]["Name"], rows[3]["Grade"]), ("David", "B"))
+
+    def test_rows_are_streamed_in_chunks(self):
+        with self.settings(NDJSON_CHUNK_ROWS=4):
+            response = self.client.get(f"/api/datasets/{self.dataset_id}/rows/?format=ndjson")
+            chunks = list(response.streaming_content)
+
+        # header line, then chunks of 4 and 2 rows
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [1, 4, 2])
+
+    def test_dataset_rows_window(self):
+        header, *rows = self.lines(
+            self.client.get(
+                f"/api/datasets/{self.dataset_id}/rows/?offset=1&limit=2&columns=Name,Grade",
+                HTTP_ACCEPT="application/x-ndjson",
+            )
+        )
+
+        self.assertEqual(
+            header,
+            {"dataset_id": self.dataset_id, "total_rows": 6, "offset": 1, "limit": 2},
+        )
+        self.assertEqual(rows, [{"Name": "Bob", "Grade": "B"}, {"Name": "Charlie", "Grade": "A"}])
+
+    def test_apply_conversion(self):
+        response = self.client.post(
+            "/api/apply-conversion/?format=ndjson",
+            {"dataset_id": self.dataset_id, "col_def": [{"field": "Grade", "type": "string"}]},
+            format="json",
+        )
+        header, *rows = self.lines(response)
+
+        self.assertTrue(header["partial"])
+        self.assertEqual([d["field"] for d in header["columns_def"]], ["Grade"])
+        self.assertEqual(rows, [{"Grade": grade} for grade in "ABABAB"])
+
+    def test_errors_are_one_line(self):
+        unknown = "00000000-0000-0000-0000-000000000000"
+        requests = [
+            (self.client.get, f"/api/datasets/{unknown}/rows/?format=ndjson", 404),
+            (self.client.get, f"/api/datasets/{self.dataset_id}/rows/?offset=x&format=ndjson", 400),
+            (self.client.post, "/api/process-file/?format=ndjson", 404),
+        ]
+        for method, url, status in requests:
+            response = method(url)
+            self.assertEqual(response.status_code, status, url)
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+            self.assertFalse(response.streaming)
+            self.assertEqual(response.content.count(b"\n"), 1)
+            self.assertIn("error", json.loads(response.content))
+
+        response = self.client.post(
+            "/api/apply-conversion/",
+            {"dataset_id": unknown, "col_def": []},
+            format="json",
+            HTTP_ACCEPT="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(unknown, json.loads(response.content)["error"])
+
+
+class ColumnarTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+        self.df = dss.get_converted(self.dataset_id).df
+
+    def arrow_table(self, response, status=200):
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response["Content-Type"], columnar.ARROW_MEDIA_TYPE)
+        body = streamed(response) if response.streaming else response.content
+        return pa.ipc.open_stream(body).read_all()
+
+    def columnar_json(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], columnar.COLUMNAR_MEDIA_TYPE)
+        return json.loads(streamed(response))
+
+    def test_arrow_process_file(self):
+        for query, headers in (
+            ("", {"HTTP_ACCEPT": columnar.ARROW_MEDIA_TYPE}),
+            ("?format=arrow", {}),
+        ):
+            table = self.arrow_table(self.upload(query=query, **headers))
+
+            header = json.loads(table.schema.metadata[columnar.RESPONSE_KEY])
+            self.assertNotIn("data", header)
+            self.assertEqual((header["total_rows"], header["limit"]), (6, 6))
+            self.assertEqual(table.num_rows, 6)
+            self.assertTrue(pa.types.is_dictionary(table.schema.field("Grade").type))
+            self.assertTrue(pa.types.is_timestamp(table.schema.field("Birthdate").type))
+            self.assertTrue(pa.types.is_duration(table.schema.field("Time").type))
+            pd.testing.assert_frame_equal(dfs.table_to_dataframe(table), self.df)
+
+    def test_arrow_dataset_rows(self):
+        url = f"/api/datasets/{self.dataset_id}/rows/?offset=2&limit=3&format=arrow"
+        table = self.arrow_table(self.client.get(url))
+
+        header = json.loads(table.schema.metadata[columnar.RESPONSE_KEY])
+        self.assertEqual((header["total_rows"], header["offset"], header["limit"]), (6, 2, 3))
+        pd.testing.assert_frame_equal(
+            dfs.table_to_dataframe(table), self.df.iloc[2:5].reset_index(drop=True)
+        )
+
+    def test_arrow_apply_conversion(self):
+        response = self.client.post(
+            "/api/apply-conversion/",
+            {"dataset_id": self.dataset_id, "col_def": [{"field": "Grade", "type": "string"}]},
+            format="json",
+            HTTP_ACCEPT=columnar.ARROW_MEDIA_TYPE,
+        )
+        table = self.arrow_table(response)
+
+        self.assertEqual(table.column_names, ["Grade"])
+        self.assertEqual(table.column("Grade").to_pylist(), list("ABABAB"))
+        self.assertTrue(json.loads(table.schema.metadata[columnar.RESPONSE_KEY])["partial"])
+
+    def test_columnar_json_process_file(self):
+        for query, headers in (
+            ("", {"HTTP_ACCEPT": columnar.COLUMNAR_MEDIA_TYPE}),
+            ("?format=columnar", {}),
+        ):
+            body = self.columnar_json(self.upload(query=query, **headers))
+
+            self.assertNotIn("data", body)
+            self.assertEqual(body["total_rows"], 6)
+            columns = body["columns"]
+            self.assertEqual(list(columns), list(self.df.columns))
+            self.assertEqual(
+                columns["Grade"],
+                {"type": "category", "categories": ["A", "B"], "codes": [0, 1] * 3},
+            )
+            self.assertEqual(columns["Birthdate"]["tz"], "UTC")
+            self.assertEqual(columns["Birthdate"]["values"][0], 631152000000000)
+            self.assertIsNone(columns["Birthdate"]["values"][4])
+            self.assertEqual(columns["Time"]["values"][1], 942000000)
+            self.assertEqual(columns["Sum"]["real"][:2], [1.0, 2.0])
+            self.assertEqual(columns["Sum"]["imag"][:2], [2.0, 3.0])
+
+    def test_columnar_json_dataset_rows(self):
+        body = self.columnar_json(
+            self.client.get(
+                f"/api/datasets/{self.dataset_id}/rows/?limit=2&columns=Name,Score",
+                HTTP_ACCEPT=columnar.COLUMNAR_MEDIA_TYPE,
+            )
+        )
+
+        self.assertEqual(
+            body["columns"],
+            {
+                "Name": {"type": "string", "values": ["Alice", "Bob"]},
+                "Score": {"type": "float64", "values": [1709991489000.0, 75.0]},
+            },
+        )
+
+    def test_errors(self):
+        unknown = "/api/datasets/00000000-0000-0000-0000-000000000000/rows/"
+
+        table = self.arrow_table(self.client.get(unknown + "?format=arrow"), status=404)
+        self.assertEqual(table.num_rows, 0)
+        error = json.loads(table.schema.metadata[columnar.RESPONSE_KEY])["error"]
+        self.assertIn("not found", error)
+
+        response = self.client.get(unknown, HTTP_ACCEPT=columnar.COLUMNAR_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], columnar.COLUMNAR_MEDIA_TYPE)
+        self.assertIn("not found", json.loads(response.content)["error"])
+
+        response = self.client.post("/api/process-file/?format=arrow", {}, format="multipart")
+        self.assertEqual(response.status_code, 404)
+        error = self.arrow_table(response, status=404).schema.metadata[columnar.RESPONSE_KEY]
+        self.assertEqual(json.loads(error), {"error": "No file uploaded"})
+
+
+class DatasetQueryTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        self.dataset_id = self.upload().json()["dataset_id"]
+
+    def query(self, query, dataset_id=None, **headers):
+        url = f"/api/datasets/{dataset_id or self.dataset_id}/query/"
+        return self.client.post(url, query, format="json", **headers)
+
+    def test_rows(self):
+        response = self.query(
+            {
+                "columns": ["Name", "Score"],
+                "filters": [{"field": "Score", "op": "range", "min": 75}],
+                "sort": [{"field": "Score", "desc": True}],
+                "offset": 1,
+                "limit": 2,
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["total_rows"], body["offset"], body["limit"]), (4, 1, 2))
+        self.assertEqual(
+            body["columns_def"],
+            [{"field": "Name", "df_type": "object"}, {"field": "Score", "df_type": "float64"}],
+        )
+        self.assertEqual(
+            json.loads(body["data"]),
+            [{"Name": "2+3j", "Score": 1500.0}, {"Name": "Charlie", "Score": 85.0}],
+        )
+
+    def test_aggregates(self):
+        response = self.query(
+            {
+                "group_by": ["Grade"],
+                "aggregates": [{"func": "count"}, {"field": "Score", "func": "max"}],
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["total_rows"], 2)
+        self.assertEqual(
+            [d["field"] for d in body["columns_def"]], ["Grade", "count", "max(Score)"]
+        )
+        self.assertEqual(
+            json.loads(body["data"]),
+            [
+                {"Grade": "A", "count": 3, "max(Score)": 1709991489000.0},
+                {"Grade": "B", "count": 3, "max(Score)": 1500.0},
+            ],
+        )
+
+    def test_streamed_page(self):
+        response = self.query({"columns": ["Name"], "limit": 2}, HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 200)
+        header, *rows = [json.loads(line) for line in streamed(response).splitlines()]
+        self.assertEqual(header["total_rows"], 6)
+        self.assertEqual(rows, [{"Name": "Alice"}, {"Name": "Bob"}])
+
+    def test_out_of_core_dataset(self):
+        dataset_id = self.upload(query="?out_of_core=1").json()["dataset_id"]
+        query = {
+            "group_by": ["Grade"],
+            "aggregates": [{"field": "Score", "func": "sum"}],
+            "sort": [{"field": "sum(Score)", "desc": True}],
+        }
+
+        response = self.query(query, dataset_id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], self.query(query).json()["data"])
+
+    def test_invalid_queries(self):
+        for query in [
+            [{"field": "Grade"}],
+            {"group_by": ["Grade", "Grade"]},
+            {"group_by": "Grade"},
+            {"columns": ["Nope"]},
+            {"filters": [{"field": "Score", "op": "like"}]},
+            {"offset": "x"},
+            {"limit": [1]},
+        ]:
+            with self.subTest(query=query):
+                response = self.query(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_unknown_dataset(self):
+        response = self.query({}, "00000000-0000-0000-0000-000000000000")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("not found", response.json()["error"])
+
+
+class OutOfCoreTesting(APITesting):
+
+    def setUp(self):
+        super().setUp()
+        response = self.upload(query="?out_of_core=1")
+        self.assertEqual(response.status_code, 200)
+        self.body = response.json()
+        self.dataset_id = self.body["dataset_id"]
+        # the same upload converted in memory
+        self.in_memory = self.upload().json()["dataset_id"]
+
+    def reads(self, request):
+        """Response of request(), its body and (columns, start, stop) of the reads of the store."""
+        reads = []
+        read = column_store.ColumnStore.read
+
+        def recording_read(store, columns=None, start=0, stop=None):
+            reads.append((columns, start, stop))
+            return read(store, columns, start, stop)
+
+        with mock.patch.object(column_store.ColumnStore, "read", recording_read):
+            response = request()
+            body = streamed(response) if response.streaming else response.content
+        return response, body, reads
+
+    def assertNoFrameReads(self, reads):
+        """Reads of more than one column take a page of rows at most, not the whole store."""
+        for columns, start, stop in reads:
+            if columns is None or len(columns) > 1:
+                self.assertIsNotNone(stop)
+                self.assertLessEqual(stop - start, views.page_size())
+
+    def test_ingest(self):
+        model = DataFrameModel.objects.get(dataset_id=self.dataset_id)
+        self.assertTrue(model.out_of_core)
+        converted = dss.get_converted(self.dataset_id)
+        self.assertIsNone(converted.df)
+        self.assertEqual(
+            converted.store.columns, ["Time", "Name", "Birthdate", "Score", "Grade", "Sum"]
+        )
+
+        expected = self.upload().json()
+        self.assertEqual(self.body["columns_def"], expected["columns_def"])
+        self.assertEqual(self.body["data"], expected["data"])
+        self.assertEqual(self.body["total_rows"], 6)
+        self.assertEqual(converted.column("Sum").dtype, "complex128")
+        self.assertEqual(converted.column("Sum").iloc[0], 1 + 2j)
+
+    def test_ndjson_rows_are_read_in_chunks(self):
+        with self.settings(NDJSON_CHUNK_ROWS=4):
+            url = "/api/datasets/{}/rows/?limit=6&format=ndjson"
+            _, body, reads = self.reads(lambda: self.client.get(url.format(self.dataset_id)))
+            expected = streamed(self.client.get(url.format(self.in_memory)))
+
+        self.assertEqual([(start, stop) for _, start, stop in reads], [(0, 4), (4, 6)])
+        self.assertEqual(body.splitlines()[1:], expected.splitlines()[1:])
+
+    def test_streamed_process_file(self):
+        response, body, reads = self.reads(
+            lambda: self.upload(query="?out_of_core=1&format=columnar")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFrameReads(reads)
+        columns = json.loads(body)["columns"]
+        self.assertEqual(columns["Sum"]["real"], [1.0, 2.0, 3.0, 0.0, 8.0, None])
+        self.assertEqual(columns["Sum"]["imag"], [2.0, 3.0, 2.0, 7.0, 0.0, None])
+
+        response, body, reads = self.reads(lambda: self.upload(query="?out_of_core=1&format=arrow"))
+        self.assertEqual(response.status_code, 200)
+        table = pa.ipc.open_stream(body).read_all()
+        pd.testing.assert_frame_equal(
+            dfs.table_to_dataframe(table), views.get_converted_dataset(self.in_memory).df
+        )
+        self.assertEqual(json.loads(table.schema.metadata[columnar.RESPONSE_KEY])["limit"], 6)
+        # record batches come from the mapped column files
+        self.assertNoFrameReads(reads)
+
+    def test_streamed_apply_conversion(self):
+        col_def = [{"field": "Sum", "type": "string"}, {"field": "Score", "type": "complex"}]
+        response = self.client.post(
+            "/api/apply-conversion/?format=ndjson",
+            {"dataset_id": self.dataset_id, "col_def": col_def},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        header, *rows = [json.loads(line) for line in streamed(response).splitlines()]
+        types = {d["field"]: d["df_type"] for d in header["columns_def"]}
+        self.assertEqual(types, {"Sum": "object", "Score": "complex128"})
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["Sum"], "1+2j")
+        self.assertEqual(rows[1]["Score"], {"real": 75.0, "imag": 0.0})
@@ -0,0 +1,185 @@
+"""
+Vectorized value classifier for type inference.
+
+Distinct values of a column are classified (number, complex, date, clock time, duration,
+plain word ...) by Arrow regex kernels: the pattern of each class is matched against the
+values no earlier class matched, over the whole array at once. Class counts of the column
+make a type histogram which tells, without converting anything, which of the candidate
+conversions can possibly stay within the errors rate.
+
+The histogram only prunes candidates: a class tells which conversions may accept its values,
+not that they will ('other' values may be accepted by any of them). The candidates it
+doesn't rule out are converted for real, in the README order, so the result is the same as
+trying them all. A column of one kind of values usually goes through one conversion,
+a column of mixed or unmatched values may go through several.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# conversion candidates in inference order
+CANDIDATES = ["numeric", "complex", "datetime", "timedelta"]
+
+_NUMBER = r"(?:\d+\.?\d*|\.\d+)(?:[eE]-?\d+)?"
+_MONTHS = (
+    r"(?i:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+)
+_TIME = r"\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?"
+_TZ = r"(?:Z|[+-]\d{2}:?\d{2})"
+
+# value classes, matched in this order, a value is of the first class whose pattern matches
+# it whole. Patterns are in RE2 syntax of Arrow kernels: \d and \s are ASCII, letters
+# are Unicode \pL.
+VALUE_CLASSES = {
+    # to_numeric, float() and 'unit' based conversions accept it
+    "number": rf"\s*-?(?:{_NUMBER}|(?i:inf|infinity))\s*",
+    # number with a '+', parse_complex splits it on '+' and fails
+    "signed_number": rf"\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*|\s*\+(?i:inf|infinity)\s*",
+    # strings every converter turns into NaN or NaT
+    "missing": r"\s*(?i:nan|nat|none|null)\s*",
+    # '1+2j', '3+2', '7j' as parsed by parse_complex
+    "complex": rf"\s*-?{_NUMBER}\+-?{_NUMBER}j?|\s*-?{_NUMBER}j",
+    "date": (
+        rf"\s*\d{{4}}-\d{{1,2}}-\d{{1,2}}(?:[ T]{_TIME})?\s*{_TZ}?\s*"
+        rf"|\s*\d{{1,2}}/\d{{1,2}}/\d{{2,4}}(?: {_TIME})?\s*"
+        rf"|\s*\d{{4}}[/.]\d{{1,2}}[/.]\d{{1,2}}(?: {_TIME})?\s*"
+        rf"|\s*\d{{1,2}}[- ]{_MONTHS}[- ,]+\d{{2,4}}\s*"
+        rf"|\s*{_MONTHS} \d{{1,2}},? \d{{4}}\s*"
+        r"|\s*(?i:now|today)\s*"
+    ),
+    # '01:30:00' is a time of today for to_datetime and a duration for to_timedelta
+    "clock": r"\s*-?\d+:\d{2}(?::\d{2}(?:\.\d+)?)?\s*",
+    "duration": (
+        r"\s*-?(?:\d+(?:\.\d+)?\s*(?i:days?|d|hours?|hrs?|h|minutes?|mins?|m|seconds?"
+        r"|secs?|s|ms|us|ns)\s*)+(?:[ +]?\d{1,2}:\d{2}:\d{2}(?:\.\d+)?)?\s*"
+        r"|\s*-?P(?:\d+D)?(?:T(?:\d+H)?(?:\d+M)?(?:\d+(?:\.\d+)?S)?)?\s*"
+    ),
+    # letters only text, like names or 'Not Available', no converter accepts it
+    "word": r"\s*\pL[\pL\pM_]*(?:[ '&./-]+[\pL\pM]*)*\s*",
+}
+
+# candidates which may accept a value of the class. Values of other classes
+# surely fail the conversion. Anything unmatched ('other') or not a string may be accepted.
+MAY_CONVERT = {
+    "number": {"numeric", "complex", "datetime", "timedelta"},
+    "signed_number": {"numeric", "datetime", "timedelta"},
+    "missing": set(),
+    "complex": {"complex", "datetime", "timedelta"},
+    "date": {"datetime"},
+    "clock": {"datetime", "timedelta"},
+    "duration": {"timedelta"},
+    "word": set(),
+    "other": set(CANDIDATES),
+    "object": set(CANDIDATES),
+}
+
+CLASSES = list(MAY_CONVERT)
+
+_FULL_PATTERNS = {name: f"^(?:{pattern})$" for name, pattern in VALUE_CLASSES.items()}
+
+
+def classify_values(values):
+    """
+    Classifies an array of values with Arrow regex kernels.
+
+    Args:
+        values (np.ndarray): values of object dtype, e.g. distinct values of a column.
+
+    Returns:
+        np.ndarray: index of the class of every value in CLASSES, 'object' for values
+            which are not strings, 'other' for strings of no class.
+    """
+    class_ids = np.full(len(values), CLASSES.index("object"), dtype=np.intp)
+    if pd.api.types.infer_dtype(values, skipna=False) == "string":
+        positions = np.arange(len(values))
+    else:
+        positions = np.flatnonzero([isinstance(value, str) for value in values])
+    text = pa.array(values[positions], type=pa.string())
+
+    for name, pattern in _FULL_PATTERNS.items():
+        if not len(text):
+            break
+        matched = pc.match_substring_regex(text, pattern).to_numpy(zero_copy_only=False)
+        class_ids[positions[matched]] = CLASSES.index(name)
+        positions, text = positions[~matched], text.filter(pa.array(~matched))
+    class_ids[positions] = CLASSES.index("other")
+    return class_ids
+
+
+def classify_value(value):
+    """Returns class name of a single value, 'object' for values which are not strings."""
+    return CLASSES[classify_values(np.array([value], dtype="object"))[0]]
+
+
+class TypeHistogram:
+    """
+    Counts of value classes of a column.
+
+    Attributes:
+        rows (int): column length.
+        nulls (int): missing entries.
+        distinct (int): distinct non-null values.
+        counts (dict): class name -> number of entries.
+    """
+
+    def __init__(self, rows, nulls, distinct, counts):
+        self.rows = rows
+        self.nulls = nulls
+        self.distinct = distinct
+        self.counts = counts
+
+    def may_convert_count(self, candidate):
+        """Max number of entries the candidate conversion may convert."""
+        return sum(
+            count
+            for name, count in self.counts.items()
+            if candidate in MAY_CONVERT[name]
+        )
+
+    def could_convert(self, candidate, errors_rate):
+        """
+        False when the candidate conversion surely exceeds errors_rate.
+        The same comparison as try_convert_* functions do on the converted column.
+        """
+        if not self.rows:
+            return True
+        # parse_complex raises on missing values, try_convert_to_complex fails
+        if candidate == "complex" and self.nulls:
+            return False
+        min_errors = self.rows - self.may_convert_count(candidate)
+        return min_errors / self.rows <= errors_rate
+
+    @property
+    def percent_unique(self):
+        """Percentage of distinct values among non-null entries, the same as try_convert_to_category."""
+        non_null = self.rows - self.nulls
+        return self.distinct / non_null * 100 if non_null else float("inf")
+
+
+def classify_column(column):
+    """
+    Builds TypeHistogram of a column.
+
+    The column is factorized, so only distinct values are classified (see classify_values)
+    and class counts are gathered through the codes.
+
+    Args:
+        column (pd.Series): column of object dtype.
+
+    Returns:
+        TypeHistogram: class counts of the column.
+    """
+    codes, uniques = pd.factorize(column)
+
+    class_ids = classify_values(np.asarray(uniques, dtype="object"))
+    present = codes[codes >= 0]
+    bins = np.bincount(class_ids[present], minlength=len(CLASSES))
+
+    return TypeHistogram(
+        rows=len(column),
+        nulls=len(codes) - len(present),
+        distinct=len(uniques),
+        counts={name: int(count) for name, count in zip(CLASSES, bins) if count},
+    )
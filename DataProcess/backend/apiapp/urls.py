@@ -3,5 +3,10 @@ from . import views
 
 urlpatterns = [
     path("process-file/", views.process_file, name="process_file"),
+    path("excel-sheets/", views.excel_sheets, name="excel_sheets"),
     path("apply-conversion/", views.apply_conversion, name="apply_conversion"),
+    path("datasets/<uuid:dataset_id>/rows/", views.dataset_rows, name="dataset_rows"),
+    path("datasets/<uuid:dataset_id>/query/", views.dataset_query, name="dataset_query"),
+    path("jobs/<uuid:job_id>/", views.job_status, name="job_status"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
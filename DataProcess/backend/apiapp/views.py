@@ -1,20 +1,53 @@
-from rest_framework.decorators import api_view
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
 
-import json
-import pandas as pd
+from . import chunked_inference as ci
+from . import column_profile as cp
+from . import column_store as cs
+from . import compact_dtypes as cd
+from . import columnar
+from . import dataframe_storage as dfs
+from . import dataset_query as dq
+from . import dataset_store as dss
+from . import excel_reader as excel
+from . import file_format as ff
 from . import infer_data_types as idt
-from . import misc as msc
+from . import instrumentation
+from . import jobs
+from . import ndjson
 from .models import DataFrameModel
+from .renderers import DATA_RENDERERS
 
 
+@instrumentation.instrumented("process_file")
 @api_view(["POST"])
+@renderer_classes(DATA_RENDERERS)
 def process_file(request):
     """
     Process the uploaded file into a Pandas DataFrame
     Tries to infer columns type and convert data
     Persists DataFrame into DataFrameModel
     Returns a well-formatted response object containing the processed data and column definitions.
+    With ?async=1 the file is processed in background, the response is {"job_id": ...}
+    right away and the result is polled with job_status.
+    With ?compact=1 (or COMPACT_DTYPES setting) converted columns get memory-compact dtypes
+    and the response reports "memory" of the frame before and after.
+    With ?sheet=<name> (repeated for more sheets) the named sheets of an Excel workbook are
+    ingested in streaming mode, see ingest_excel and excel_sheets.
+    With ?out_of_core=1 (or uploads over OUT_OF_CORE_THRESHOLD) CSV and Excel uploads are
+    converted chunk by chunk into an on-disk column store, see use_out_of_core.
+    With 'Accept: application/x-ndjson', 'application/vnd.apache.arrow.stream' or
+    'application/vnd.dataprocess.columnar+json' (or ?format=ndjson|arrow|columnar)
+    all rows are streamed in that format, see rows_response.
+    Time of the stages is sent in the Server-Timing header, see metrics.
     """
     if request.method == "POST":
         file_obj = request.FILES.get("file")
@@ -26,79 +59,944 @@ def process_file(request):
         # use to simulate longer processing
         # time.sleep(2)
 
-        # assuming if file is binary it's Excel and read it first, if not read CSV
-        if msc.is_binary(file_obj):
-            try:
-                df = pd.read_excel(file_obj)
-            except Exception as e:
-                return Response(
-                    {"error": f"Failed to read Excel format: {str(e)}"}, status=422
-                )
-        else:
-            try:
-                df = pd.read_csv(file_obj)
-            except Exception as e:
-                return Response(
-                    {"error": f"Failed to read CSV format: {str(e)}"}, status=422
+        stream = use_streaming(request, file_obj)
+        compact = use_compact(request)
+        out_of_core = use_out_of_core(request, file_obj)
+        sheets = request.query_params.getlist("sheet")
+
+        if request.query_params.get("async") in ("1", "true"):
+            # the upload is closed with the request, the job reads its copy
+            upload_path = save_upload(file_obj)
+            job = jobs.submit(
+                ingest_saved_upload,
+                upload_path,
+                stream,
+                compact,
+                sheets,
+                out_of_core,
+                workers=getattr(settings, "JOB_WORKERS", jobs.DEFAULT_WORKERS),
+                ttl=getattr(settings, "JOB_TTL", jobs.DEFAULT_TTL),
+            )
+            return Response(job.to_dict(), status=202)
+
+        try:
+            response = ingest_upload(
+                file_obj, stream, compact, sheets=sheets, out_of_core=out_of_core
+            )
+        except jobs.JobError as e:
+            return Response({"error": str(e)}, status=422)
+
+        if streams_rows(request):
+            rows = get_converted_dataset(response["dataset_id"]).rows_of()
+            return rows_response(request, {**response, "limit": len(rows)}, rows)
+        return Response(response)
+
+
+@api_view(["POST"])
+def excel_sheets(request):
+    """
+    Lists sheets of an uploaded Excel workbook with their dimensions: {"sheets": [{"name",
+    "rows", "columns"}]}, rows without the header. Cells are not parsed.
+    Sheets are then ingested with process_file?sheet=<name>.
+    """
+    file_obj = request.FILES.get("file")
+    if not file_obj:
+        return Response({"error": "No file uploaded"}, status=404)
+
+    try:
+        file_format = ff.sniff_format(file_obj)
+    except Exception as e:
+        return Response({"error": f"Unknown file format: {str(e)}"}, status=422)
+    if file_format.kind != "excel":
+        return Response({"error": f"{file_format.label} file has no sheets"}, status=422)
+
+    try:
+        return Response({"sheets": excel.list_sheets(file_obj, file_format)})
+    except Exception as e:
+        return Response({"error": f"Failed to read Excel format: {str(e)}"}, status=422)
+
+
+@api_view(["GET"])
+def metrics(request):
+    """
+    Returns stage timing totals of process_file and apply_conversion requests
+    (and background jobs) since the server started, and the latest requests.
+    Only local requests are answered unless DEBUG is on.
+    """
+    if not settings.DEBUG and request.META.get("REMOTE_ADDR") not in ("127.0.0.1", "::1"):
+        return Response({"error": "Metrics are available locally only"}, status=403)
+    return Response(instrumentation.metrics())
+
+
+@api_view(["GET"])
+def job_status(request, job_id):
+    """
+    Returns state of a background process_file job: status, progress of its stages
+    and the process_file response as "result" when done, or "error" when failed.
+    """
+    job = jobs.get_job(job_id)
+    if job is None:
+        return Response({"error": f"Job {job_id} not found"}, status=404)
+    return Response(job.to_dict())
+
+
+def ingest_upload(
+    file_obj, stream=False, compact=False, progress=None, sheets=None, out_of_core=False
+):
+    """
+    Reads, infers and persists an upload, returns process_file response.
+
+    Args:
+        file_obj: uploaded file.
+        stream (bool): read CSV or Excel in chunks, see use_streaming.
+        compact (bool): convert to memory-compact dtypes, see use_compact.
+        progress (jobs.JobProgress, optional): reports stages progress.
+        sheets (list, optional): names of Excel sheets to ingest, see ingest_excel.
+        out_of_core (bool): convert CSV or Excel into a column store on disk, see
+            use_out_of_core. Other formats can't be read in chunks and are converted in memory.
+
+    Raises:
+        jobs.JobError: the file can't be read.
+    """
+    progress = progress or jobs.JobProgress()
+
+    # the same upload converted before is not parsed again
+    with instrumentation.stage("hash"):
+        content_hash = ff.content_hash(file_obj)
+    result_key = dss.result_key(content_hash, engine=result_engine(compact))
+    if not sheets and not out_of_core:
+        response = reuse_result(content_hash, result_key, compact, progress)
+        if response is not None:
+            return response
+
+    # format is detected from the first bytes of the file
+    try:
+        with instrumentation.stage("read"):
+            file_format = ff.sniff_format(file_obj)
+    except Exception as e:
+        raise jobs.JobError(f"Unknown file format: {str(e)}")
+
+    if file_format.kind == "excel" and (stream or sheets or out_of_core):
+        return ingest_excel(
+            file_obj, file_format, content_hash, sheets, compact, progress, out_of_core
+        )
+    if sheets:
+        raise jobs.JobError(f"{file_format.label} file has no sheets")
+
+    progress.start("read")
+    if file_format.kind == "csv" and out_of_core:
+        file_name = DataFrameModel.new_file_name()
+        try:
+            with instrumentation.stage("read"):
+                store = read_csv_out_of_core(file_obj, file_name, file_format, progress)
+        except Exception as e:
+            raise jobs.JobError(f"Failed to read CSV format: {str(e)}")
+        progress.finish("read")
+
+        progress.start("infer", total=len(store.columns))
+        progress.finish("infer")
+        return finish_out_of_core(store, file_name, content_hash, compact, progress)
+
+    if file_format.kind == "csv" and stream:
+        # large CSV is read, inferred and converted chunk by chunk
+        file_name = DataFrameModel.new_file_name()
+        try:
+            with instrumentation.stage("read"):
+                df = read_csv_streaming(
+                    file_obj, DataFrameModel.file_path(file_name), file_format, progress
                 )
+        except Exception as e:
+            raise jobs.JobError(f"Failed to read CSV format: {str(e)}")
+        progress.finish("read")
 
         if df.empty:
-            return Response(
-                {"error": "No Excel or CSV data"}, status=422
-            )  # 204 no-content no thrown exception
+            raise jobs.JobError("No Excel or CSV data")
+
+        progress.start("infer", total=len(df.columns))
+        progress.finish("infer")
+        return finish_streamed(df, file_name, content_hash, result_key, compact, progress)
+
+    try:
+        with instrumentation.stage("read"):
+            df = ff.read_upload(file_obj, file_format)
+    except Exception as e:
+        raise jobs.JobError(f"Failed to read {file_format.label} format: {str(e)}")
+    progress.advance("read", len(df))
+    progress.finish("read")
 
-        # Persists DataFrame to db to use for explicit conversion.
-        # one record only
-        persist_to_model(df.to_json())
+    if df.empty:
+        raise jobs.JobError("No Excel or CSV data")
 
-        return Response(convert_and_return_data(df))
+    # Persists DataFrame to use for explicit conversion.
+    file_name = DataFrameModel.new_file_name()
+    with instrumentation.stage("persist"):
+        dfs.write_dataframe(df, DataFrameModel.file_path(file_name))
+        dataset_id = persist_to_model(file_name, content_hash, compact)
+    # conversion replaces columns of df, the cached raw frame is a shallow copy
+    dss.put_dataset(dataset_id, df.copy(deep=False))
 
+    progress.start("infer", total=len(df.select_dtypes(include=["object"]).columns))
+    df = convert_data(df, on_column=lambda col: progress.advance("infer"))
+    df, memory = compact_data(df, compact)
+    progress.finish("infer")
 
+    progress.start("serialize")
+    converted = dss.put_converted(dataset_id, df, memory=memory)
+    response = format_response(df, dataset_id, profiles=converted.profile(), memory=memory)
+    dss.put_result(result_key, converted)
+    progress.finish("serialize")
+    return response
+
+
+def finish_streamed(df, file_name, content_hash, result_key, compact, progress):
+    """
+    Persists a dataset converted by streaming ingestion, its raw data is already written
+    to file_name. Returns process_file response.
+    """
+    # raw frame is not in memory, it's cached on first apply_conversion
+    progress.start("serialize")
+    dataset_id = persist_to_model(file_name, content_hash, compact)
+    df, memory = compact_data(df, compact)
+    converted = dss.put_converted(dataset_id, df, memory=memory)
+    response = format_response(df, dataset_id, profiles=converted.profile(), memory=memory)
+    dss.put_result(result_key, converted)
+    progress.finish("serialize")
+    return response
+
+
+def finish_out_of_core(store, file_name, content_hash, compact, progress):
+    """
+    Persists an out-of-core dataset, its raw data is written to file_name and converted
+    columns to store. Returns process_file response.
+
+    The store belongs to the dataset (conversions replace its columns), it's not shared
+    through the result cache with other uploads of the same content.
+    """
+    if not len(store) or not store.columns:
+        shutil.rmtree(store.directory, ignore_errors=True)
+        raise jobs.JobError("No Excel or CSV data")
+    progress.start("serialize")
+    dataset_id = persist_to_model(file_name, content_hash, compact, out_of_core=True)
+    store, memory = compact_store(store, compact)
+    converted = dss.put_converted(dataset_id, None, memory=memory, store=store)
+    response = format_response(
+        converted.frame(stop=page_size()),
+        dataset_id,
+        profiles=converted.profile(),
+        memory=memory,
+        total_rows=len(store),
+    )
+    progress.finish("serialize")
+    return response
+
+
+def ingest_excel(
+    file_obj, file_format, content_hash, sheets, compact, progress, out_of_core=False
+):
+    """
+    Ingests sheets of an Excel workbook in streaming mode, each sheet is a dataset of its own.
+
+    Without sheets the first sheet is ingested as the upload (with its content hash),
+    a selected sheet has a content hash of its own, see file_format.sheet_hash.
+
+    Returns:
+        dict: process_file response of the first sheet with "sheets": all sheets of the
+            workbook (see excel_reader.list_sheets) with "dataset_id" of ingested ones,
+            the other ingested sheets have their process_file response as "result".
+    """
+    try:
+        with instrumentation.stage("read"):
+            listing = excel.list_sheets(file_obj, file_format)
+    except Exception as e:
+        raise jobs.JobError(f"Failed to read Excel format: {str(e)}")
+    names = [sheet["name"] for sheet in listing]
+    unknown = [name for name in sheets or [] if name not in names]
+    if unknown:
+        raise jobs.JobError(f"Unknown sheets: {unknown}")
+    if not names:
+        raise jobs.JobError("No Excel or CSV data")
+
+    selected = list(dict.fromkeys(sheets)) if sheets else names[:1]
+    results = {}
+    for name in selected:
+        sheet_hash = ff.sheet_hash(content_hash, name) if sheets else content_hash
+        result_key = dss.result_key(sheet_hash, engine=result_engine(compact))
+        response = None
+        if not out_of_core:
+            response = reuse_result(sheet_hash, result_key, compact, progress)
+        if response is None:
+            response = ingest_sheet(
+                file_obj,
+                file_format,
+                name,
+                sheet_hash,
+                result_key,
+                compact,
+                progress,
+                out_of_core,
+            )
+        results[name] = response
+
+    response = results[selected[0]]
+    response["sheets"] = []
+    for sheet in listing:
+        sheet = dict(sheet)
+        if sheet["name"] in results:
+            sheet["dataset_id"] = results[sheet["name"]]["dataset_id"]
+            if sheet["name"] != selected[0]:
+                sheet["result"] = results[sheet["name"]]
+        response["sheets"].append(sheet)
+    return response
+
+
+def ingest_sheet(
+    file_obj, file_format, sheet, content_hash, result_key, compact, progress, out_of_core=False
+):
+    """
+    Reads an Excel sheet row by row into raw Arrow file of a new dataset, then infers and
+    converts it chunk by chunk from that file, so the workbook is parsed once and never
+    held in memory. out_of_core: converted chunks are written to a column store, see
+    convert_to_store. Returns process_file response.
+    """
+    file_name = DataFrameModel.new_file_name()
+    raw_path = DataFrameModel.file_path(file_name)
+    chunksize = getattr(settings, "STREAM_INGEST_CHUNK_ROWS", ci.DEFAULT_CHUNK_ROWS)
+
+    progress.start("read")
+    try:
+        with instrumentation.stage("read"):
+            with dfs.ChunkWriter(raw_path, as_text=True) as writer:
+                for chunk in excel.read_sheet_chunks(file_obj, file_format, sheet, chunksize):
+                    writer.write(chunk)
+                    progress.advance("read", len(chunk))
+    except Exception as e:
+        raise jobs.JobError(f"Failed to read Excel sheet {sheet}: {str(e)}")
+    progress.finish("read")
+
+    if writer.schema is None:
+        raise jobs.JobError(f"No data in Excel sheet {sheet}")
+
+    progress.start("infer", total=len(writer.schema))
+    if out_of_core:
+        with instrumentation.stage("infer"):
+            store = convert_to_store(raw_path, DataFrameModel.store_path(file_name))
+        progress.finish("infer")
+        return finish_out_of_core(store, file_name, content_hash, compact, progress)
+
+    with instrumentation.stage("infer"):
+        df, _ = ci.infer_and_convert_chunks(
+            lambda usecols=None: dfs.read_batches(raw_path, usecols)
+        )
+    progress.finish("infer")
+    return finish_streamed(df, file_name, content_hash, result_key, compact, progress)
+
+
+def reuse_result(content_hash, result_key, compact, progress):
+    """
+    Makes a new dataset of an upload converted before: its stored file is linked and
+    the cached conversion result is used. Returns process_file response or None on cache miss.
+    """
+    cached = dss.get_result(result_key)
+    if cached is None:
+        return None
+    source = (
+        DataFrameModel.objects.filter(content_hash=content_hash)
+        .exclude(file="")
+        .first()
+    )
+    if source is None or not os.path.exists(source.file.path):
+        return None
+
+    file_name = DataFrameModel.new_file_name()
+    with instrumentation.stage("persist"):
+        link_file(source.file.path, DataFrameModel.file_path(file_name))
+        dataset_id = persist_to_model(file_name, content_hash, compact)
+    for stage in jobs.STAGES[:-1]:
+        progress.finish(stage)
+
+    progress.start("serialize")
+    converted = dss.put_converted(
+        dataset_id, cached.df, cached.col_def, cached.profiles, cached.memory
+    )
+    response = format_response(
+        cached.df, dataset_id, profiles=converted.profile(), memory=cached.memory
+    )
+    progress.finish("serialize")
+    return response
+
+
+def link_file(source, target):
+    """Hard links a stored file under a new name, copies it where links aren't supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def save_upload(file_obj):
+    """Copies uploaded file to a temporary file, returns its path."""
+    with tempfile.NamedTemporaryFile(suffix=".upload", delete=False) as copy:
+        for chunk in file_obj.chunks():
+            copy.write(chunk)
+    return copy.name
+
+
+def ingest_saved_upload(upload_path, stream, compact, sheets, out_of_core, progress):
+    """Job function: ingest_upload of an upload copy, the copy is removed afterwards."""
+    trace = instrumentation.Trace("process_file:async")
+    try:
+        with open(upload_path, "rb") as file_obj, instrumentation.activate(trace):
+            return ingest_upload(file_obj, stream, compact, progress, sheets, out_of_core)
+    finally:
+        instrumentation.record(trace)
+        os.remove(upload_path)
+        # job threads are not request threads, Django doesn't close their connection
+        connection.close()
+
+
+@instrumentation.instrumented("apply_conversion")
 @api_view(["POST"])
+@renderer_classes(DATA_RENDERERS)
 def apply_conversion(request):
     """
     Reads a Pandas DataFrame that was previously persisted to a database.
     Uses the request's column definitions to explicitly convert columns to user-defined types.
+    Request body: {"dataset_id": ..., "col_def": [...]}, a plain col_def list applies to the latest dataset.
     Returns a well-formatted response object containing the processed data and column definitions.
+    Only columns whose type changed are converted and returned (first page of rows),
+    the response is marked "partial".
+    With an Accept header of a streamed format (see process_file) all rows of the returned
+    columns are streamed, see rows_response.
+    Time of the stages is sent in the Server-Timing header, see metrics.
     """
 
     if request.method == "POST":
+        if isinstance(request.data, list):
+            col_def, dataset_id = request.data, None
+        else:
+            col_def = request.data.get("col_def", [])
+            dataset_id = request.data.get("dataset_id")
+
         try:
-            df = DataFrameModel.load_dataframe()
+            if dataset_id:
+                converted = get_converted_dataset(dataset_id)
+            else:
+                with instrumentation.stage("load"):
+                    df = DataFrameModel.load_dataframe()
+                if df is None:
+                    return Response({"error": "No dataset uploaded"}, status=404)
+        except (DataFrameModel.DoesNotExist, ValidationError):
+            return Response({"error": f"Dataset {dataset_id} not found"}, status=404)
         except Exception as e:
             return Response(
                 {"error": f"Failed to read DataFrame from db: {str(e)}"}, status=422
             )
-        col_def = request.data
+
+        if dataset_id:
+            try:
+                response = convert_changed_columns(dataset_id, converted, col_def)
+            except DataFrameModel.DoesNotExist:
+                # pruned since its converted frame was cached
+                return Response({"error": f"Dataset {dataset_id} not found"}, status=404)
+            if streams_rows(request):
+                fields = [d["field"] for d in response["columns_def"]]
+                rows = get_converted_dataset(dataset_id).rows_of(fields)
+                return rows_response(request, {**response, "limit": len(rows)}, rows)
+            return Response(response)
+
         # apply conversion with explicitly defined column types and return response
-        return Response(convert_and_return_data(df, col_def))
+        df = convert_data(df, col_def)
+        if streams_rows(request):
+            return rows_response(request, {**format_response(df), "limit": len(df)}, df)
+        return Response(format_response(df))
 
 
-def persist_to_model(json_data):
-    # save json to db. For testing purpose and simplicity it is only the one first record
-    model = DataFrameModel.objects.first()
-    if not model:
-        model = DataFrameModel(data=json_data)  # create new
-    else:
-        model.data = json_data
-    model.save()
+@api_view(["GET"])
+@renderer_classes(DATA_RENDERERS)
+def dataset_rows(request, dataset_id):
+    """
+    Returns a window of rows of the converted dataset for server side paging of the DataGrid.
+    Query params: offset (default 0), limit (default PAGE_SIZE, at most MAX_PAGE_SIZE),
+    columns - comma separated names to return only these columns.
+    With an Accept header of a streamed format (see process_file) the rows of the window
+    are streamed, see rows_response.
+    Only the columns and rows of the window are read from the store of out-of-core datasets.
+    """
+    try:
+        offset = max(int(request.query_params.get("offset", 0)), 0)
+        limit = min(
+            max(int(request.query_params.get("limit", page_size())), 0),
+            getattr(settings, "MAX_PAGE_SIZE", 10000),
+        )
+    except ValueError:
+        return Response({"error": "offset and limit must be integers"}, status=400)
+
+    try:
+        converted = get_converted_dataset(dataset_id)
+    except DataFrameModel.DoesNotExist:
+        return Response({"error": f"Dataset {dataset_id} not found"}, status=404)
+
+    columns = request.query_params.get("columns")
+    if columns:
+        columns = columns.split(",")
+        unknown = [col for col in columns if col not in converted.columns]
+        if unknown:
+            return Response({"error": f"Unknown columns: {unknown}"}, status=400)
 
+    response = {
+        "dataset_id": str(dataset_id),
+        "total_rows": converted.rows,
+        "offset": offset,
+        "limit": limit,
+    }
+    if streams_rows(request):
+        rows = converted.rows_of(columns or None, offset, offset + limit)
+        return rows_response(request, response, rows)
+    with instrumentation.stage("load"):
+        page = converted.frame(columns or None, offset, offset + limit)
+    response["data"] = rows_json(page, 0, limit)
+    return Response(response)
 
-def convert_and_return_data(df, col_def=[]):
-    # apply conversion
-    df = idt.infer_and_convert_data_types(df, col_def)
 
-    # Convert DataFrame to JSON
-    df_json = df.to_json(orient="records", date_format="iso")
+@instrumentation.instrumented("dataset_query")
+@api_view(["POST"])
+@renderer_classes(DATA_RENDERERS)
+def dataset_query(request, dataset_id):
+    """
+    Queries the converted dataset on server: projection, filters, sort and group-by
+    aggregates, see dataset_query module for the request body.
+    The body also takes offset (default 0) and limit (default PAGE_SIZE, at most
+    MAX_PAGE_SIZE) of the page of results, total_rows is the number of all results.
+    columns_def has the field and df_type of the result columns.
+    With an Accept header of a streamed format (see process_file) the page is streamed,
+    see rows_response.
+    Out-of-core datasets read the columns the query refers to from their store.
+    """
+    query = request.data
+    if not isinstance(query, dict):
+        return Response({"error": "Query must be a JSON object"}, status=400)
+    try:
+        offset = max(int(query.get("offset", 0)), 0)
+        limit = min(
+            max(int(query.get("limit", page_size())), 0),
+            getattr(settings, "MAX_PAGE_SIZE", 10000),
+        )
+    except (TypeError, ValueError):
+        return Response({"error": "offset and limit must be integers"}, status=400)
+
+    try:
+        converted = get_converted_dataset(dataset_id)
+    except DataFrameModel.DoesNotExist:
+        return Response({"error": f"Dataset {dataset_id} not found"}, status=404)
+
+    df = converted.df
+    if df is None:
+        with instrumentation.stage("load"):
+            df = converted.frame(dq.query_fields(query, converted.columns))
+
+    try:
+        with instrumentation.stage("query"):
+            page, total_rows = dq.run_query(df, query, offset, limit)
+    except dq.QueryError as e:
+        return Response({"error": str(e)}, status=400)
+
+    response = {
+        "dataset_id": str(dataset_id),
+        "columns_def": [{"field": col, "df_type": str(dt)} for col, dt in page.dtypes.items()],
+        "total_rows": total_rows,
+        "offset": offset,
+        "limit": limit,
+    }
+    if streams_rows(request):
+        return rows_response(request, response, page)
+    response["data"] = rows_json(page, 0, limit)
+    return Response(response)
+
+
+def persist_to_model(file_name, content_hash="", compact=False, out_of_core=False):
+    # save stored DataFrame file name to db as a new dataset, only DATASET_MAX_STORED latest are kept
+    with instrumentation.stage("persist"):
+        model = DataFrameModel(
+            content_hash=content_hash, compact=compact, out_of_core=out_of_core
+        )
+        model.file.name = file_name
+        model.save()
+        DataFrameModel.prune(keep=getattr(settings, "DATASET_MAX_STORED", 100))
+    return str(model.dataset_id)
+
+
+def use_streaming(request, file_obj):
+    """
+    Streaming ingestion (CSV and xlsx) is used for uploads larger than STREAM_INGEST_THRESHOLD
+    or when explicitly requested with ?stream=1
+    """
+    if request.query_params.get("stream") in ("1", "true"):
+        return True
+    return file_obj.size > getattr(settings, "STREAM_INGEST_THRESHOLD", float("inf"))
+
+
+def use_compact(request):
+    """
+    Memory-compact dtypes are used when COMPACT_DTYPES setting is on
+    or when explicitly requested with ?compact=1
+    """
+    if request.query_params.get("compact") in ("1", "true"):
+        return True
+    return getattr(settings, "COMPACT_DTYPES", False)
+
+
+def use_out_of_core(request, file_obj):
+    """
+    Out-of-core conversion (CSV and xlsx) into an on-disk column store is used for uploads
+    larger than OUT_OF_CORE_THRESHOLD or when explicitly requested with ?out_of_core=1
+    """
+    if request.query_params.get("out_of_core") in ("1", "true"):
+        return True
+    return file_obj.size > getattr(settings, "OUT_OF_CORE_THRESHOLD", float("inf"))
+
+
+def read_csv_streaming(file_obj, raw_path, file_format, progress=None):
+    """
+    Reads CSV upload of the sniffed file_format in chunks with chunked_inference
+    and returns converted DataFrame.
+    Raw text chunks are written to Arrow file at raw_path as they are read,
+    so the initial DataFrame is never held in memory at once.
+    progress (jobs.JobProgress, optional): "read" stage counts rows of converted chunks.
+    """
+
+    def on_raw_chunk(chunk):
+        writer.write(chunk)
+        if progress:
+            progress.advance("read", len(chunk))
+
+    with dfs.ChunkWriter(raw_path, as_text=True) as writer:
+        df, _ = ci.stream_infer_and_convert(
+            file_obj,
+            chunksize=getattr(settings, "STREAM_INGEST_CHUNK_ROWS", ci.DEFAULT_CHUNK_ROWS),
+            on_raw_chunk=on_raw_chunk,
+            read_options=file_format.csv_options(),
+        )
+    return df
+
+
+def read_csv_out_of_core(file_obj, file_name, file_format, progress=None):
+    """
+    Reads CSV upload of the sniffed file_format in chunks with chunked_inference like
+    read_csv_streaming, converted chunks are written to the column store of file_name
+    as they are converted. Returns column_store.ColumnStore.
+    """
+
+    def on_raw_chunk(chunk):
+        writer.write(chunk)
+        if progress:
+            progress.advance("read", len(chunk))
+
+    chunksize = getattr(settings, "STREAM_INGEST_CHUNK_ROWS", ci.DEFAULT_CHUNK_ROWS)
+    read_options = file_format.csv_options()
+    with dfs.ChunkWriter(DataFrameModel.file_path(file_name), as_text=True) as writer:
+        with cs.StoreWriter(DataFrameModel.store_path(file_name)) as store_writer:
+            ci.infer_and_write_chunks(
+                lambda usecols=None: ci.read_csv_chunks(
+                    file_obj, chunksize, usecols, read_options
+                ),
+                store_writer.write,
+                on_raw_chunk=on_raw_chunk,
+            )
+    return store_writer.store
+
+
+def convert_to_store(raw_path, store_path, col_def=[]):
+    """
+    Infers and converts raw Arrow file chunk by chunk (record batch by record batch) into
+    a new column store, columns of col_def are converted to their type afterwards, one at
+    a time. Returns column_store.ColumnStore.
+    """
+    with cs.StoreWriter(store_path) as writer:
+        ci.infer_and_write_chunks(
+            lambda usecols=None: dfs.read_batches(raw_path, usecols), writer.write
+        )
+    store = writer.store
+    for d in col_def:
+        raw = dfs.read_dataframe(raw_path, columns=[d["field"]])
+        store = store.write_columns(convert_data(raw, [d]))
+    return store
+
+
+def inference_engine():
+    return getattr(settings, "INFERENCE_ENGINE", "classifier")
+
+
+def result_engine(compact):
+    """Engine part of result keys, compact results are cached apart from the others."""
+    return f"{inference_engine()}:compact" if compact else inference_engine()
+
+
+def compact_data(df, compact):
+    """Returns df with compact dtypes and its memory report, or df and None when not compact."""
+    if not compact:
+        return df, None
+    with instrumentation.stage("compact"):
+        return cd.compact_dataframe(df)
+
+
+def compact_store(store, compact):
+    """
+    compact_data of a column store, column by column: returns the store with compacted
+    columns written back and its memory report, or store and None when not compact.
+    """
+    if not compact:
+        return store, None
+    memory = {"before": 0, "after": 0}
+    with instrumentation.stage("compact"):
+        for col in store.columns:
+            df = store.read([col])
+            part, report = cd.compact_dataframe(df)
+            memory = {key: memory[key] + report[key] for key in memory}
+            if not part.dtypes.equals(df.dtypes):
+                store = store.write_columns(part)
+    return store, memory
 
-    # Generate columns definition
-    columns_def = [
-        {
-            "field": col,
-            "df_type": str(dt),
-            "width": max(df[col].astype(str).str.len()),
+
+def convert_data(df, col_def=[], on_column=None):
+    # apply conversion, converters of columns are 'infer:<type>' and 'convert:<type>' stages
+    with instrumentation.stage("infer"):
+        return idt.infer_and_convert_data_types(
+            df,
+            col_def,
+            engine=inference_engine(),
+            workers=getattr(settings, "INFERENCE_WORKERS", 1),
+            on_column=on_column,
+        )
+
+
+def get_converted_dataset(dataset_id):
+    """
+    Returns cached ConvertedDataset, on cache miss the raw dataset is converted again
+    with its persisted column definitions. The column store of an out-of-core dataset
+    is opened instead, see open_store.
+
+    Raises:
+        DataFrameModel.DoesNotExist: no dataset with the id.
+    """
+    converted = dss.get_converted(dataset_id)
+    if converted is None:
+        model = DataFrameModel.objects.get(dataset_id=dataset_id)
+        if model.out_of_core:
+            return dss.put_converted(dataset_id, None, model.col_def, store=open_store(model))
+        result_key = dss.result_key(
+            model.content_hash, model.col_def, result_engine(model.compact)
+        )
+        cached = dss.get_result(result_key) if model.content_hash else None
+        if cached is not None:
+            df, profiles, memory = cached.df, cached.profiles, cached.memory
+            sizes = cached.column_sizes
+        else:
+            with instrumentation.stage("load"):
+                raw = dss.get_dataset(dataset_id)
+            df = convert_data(raw, model.col_def)
+            df, memory = compact_data(df, model.compact)
+            profiles = sizes = None
+        converted = dss.put_converted(
+            dataset_id, df, model.col_def, profiles, memory, column_sizes=sizes
+        )
+        if model.content_hash and cached is None:
+            dss.put_result(result_key, converted)
+    return converted
+
+
+def open_store(model):
+    """
+    Opens the column store of an out-of-core dataset, a missing store is converted again
+    from the raw file with the persisted column definitions.
+    """
+    path = DataFrameModel.store_path(model.file.name)
+    if os.path.exists(os.path.join(path, cs.MANIFEST)):
+        return cs.ColumnStore(path)
+    with instrumentation.stage("infer"):
+        store = convert_to_store(model.file.path, path, model.col_def)
+    store, _ = compact_store(store, model.compact)
+    return store
+
+
+def convert_changed_columns(dataset_id, converted, col_def):
+    """
+    Converts from raw data only the columns whose col_def type changed since the last conversion,
+    updates cached and persisted converted dataset state and
+    returns partial response with the changed columns only.
+    Out-of-core datasets read only these columns of their raw file and write the converted
+    ones to their store, see convert_stored_columns.
+
+    Raises:
+        DataFrameModel.DoesNotExist: the dataset is not stored anymore.
+    """
+    changed = converted.changed(col_def)
+    fields = [d["field"] for d in changed]
+
+    if changed and converted.store is not None:
+        part, converted = convert_stored_columns(dataset_id, converted, changed)
+        DataFrameModel.objects.filter(dataset_id=dataset_id).update(
+            col_def=converted.col_def
+        )
+    elif changed:
+        # columns converted the same way for an upload with the same content are reused
+        stored = (
+            DataFrameModel.objects.filter(dataset_id=dataset_id)
+            .values_list("content_hash", "compact")
+            .first()
+        )
+        if stored is None:
+            raise DataFrameModel.DoesNotExist(f"Dataset {dataset_id} not found")
+        content_hash, compact = stored
+        result_key = dss.result_key(
+            content_hash, converted.col_def + changed, result_engine(compact)
+        )
+        cached = dss.get_result(result_key) if content_hash else None
+        if cached is not None:
+            part = cached.df[fields]
+        else:
+            with instrumentation.stage("load"):
+                raw = dss.get_dataset(dataset_id)
+            part, _ = compact_data(convert_data(raw[fields].copy(), changed), compact)
+
+        # replace columns of a shallow copy, concurrent readers keep the previous frame
+        df = converted.df.copy(deep=False)
+        for field in fields:
+            df[field] = part[field]
+        profiles = {
+            col: profile
+            for col, profile in converted.profiles.items()
+            if col not in fields
         }
-        for col, dt in df.dtypes.items()
-    ]
+        # only the replaced columns are measured for the caches
+        converted = dss.put_converted(
+            dataset_id,
+            df,
+            converted.col_def + changed,
+            profiles,
+            column_sizes=converted.unchanged_sizes(fields),
+        )
+        DataFrameModel.objects.filter(dataset_id=dataset_id).update(
+            col_def=converted.col_def
+        )
+        if content_hash and cached is None:
+            dss.put_result(result_key, converted)
+    else:
+        part = converted.frame([])
+
+    return format_response(
+        part, dataset_id, partial=True, profiles=converted.profile(fields)
+    )
+
+
+def convert_stored_columns(dataset_id, converted, changed):
+    """
+    Converts changed columns of an out-of-core dataset: only these columns are read from
+    the memory-mapped raw file, the converted ones replace them in a new store snapshot.
 
-    return {"columns_def": columns_def, "data": df_json}
+    Returns:
+        tuple (pd.DataFrame, ConvertedDataset): converted columns and the updated dataset.
+    """
+    fields = [d["field"] for d in changed]
+    model = DataFrameModel.objects.get(dataset_id=dataset_id)
+    with instrumentation.stage("load"):
+        raw = model.to_dataframe(columns=fields)
+    part, _ = compact_data(convert_data(raw, changed), model.compact)
+    with instrumentation.stage("persist"):
+        store = converted.store.write_columns(part)
+    profiles = {
+        col: profile for col, profile in converted.profiles.items() if col not in fields
+    }
+    converted = dss.put_converted(
+        dataset_id, None, converted.col_def + changed, profiles, store=store
+    )
+    return part, converted
+
+
+def page_size():
+    return getattr(settings, "PAGE_SIZE", 100)
+
+
+def row_streams():
+    """Generators of streamed formats of rows by media type: generator(header, df)."""
+    ndjson_rows = getattr(settings, "NDJSON_CHUNK_ROWS", ndjson.DEFAULT_CHUNK_ROWS)
+    return {
+        ndjson.MEDIA_TYPE: lambda header, df: ndjson.ndjson_lines(header, df, ndjson_rows),
+        columnar.ARROW_MEDIA_TYPE: columnar.arrow_stream,
+        columnar.COLUMNAR_MEDIA_TYPE: columnar.columnar_json,
+    }
+
+
+def accepted_media_type(request):
+    renderer = getattr(request, "accepted_renderer", None)
+    return renderer.media_type if renderer is not None else None
+
+
+def streams_rows(request):
+    """True when content negotiation picked a streamed format (Accept header or ?format=)."""
+    return accepted_media_type(request) in row_streams()
+
+
+def rows_response(request, response, df):
+    """
+    Streams a JSON response and all rows of df in the accepted format:
+        NDJSON - the response without "data" is the first line, then a line per row;
+        Arrow IPC stream - record batches, the response without "data" in schema metadata;
+        columnar JSON - the response without "data" with "columns" of typed value arrays.
+    Rows are serialized chunk by chunk (or column by column) while the response is sent,
+    they are not held in memory as one JSON string. df may be column_store.StoreRows of
+    an out-of-core dataset, its chunks (or columns) are read from store as they are sent.
+    """
+    media_type = accepted_media_type(request)
+    header = {key: value for key, value in response.items() if key != "data"}
+    return StreamingHttpResponse(row_streams()[media_type](header, df), content_type=media_type)
+
+
+def rows_json(df, offset, limit):
+    """JSON records of a window of DataFrame rows."""
+    with instrumentation.stage("serialize:rows"):
+        return df.iloc[offset : offset + limit].to_json(orient="records", date_format="iso")
+
+
+def format_response(
+    df, dataset_id=None, partial=False, profiles=None, memory=None, total_rows=None
+):
+    """
+    Formats already converted DataFrame into the response with column definitions and
+    the first page of data, the other pages are read with dataset_rows.
+    partial: df holds only the columns changed by the request, the rest didn't change.
+    profiles: column profiles of df cached with the dataset, computed if omitted.
+    memory: memory report of compact dtypes, added to the response as "memory".
+    total_rows: rows of the dataset when df is its first page only (out-of-core datasets).
+    """
+    with instrumentation.stage("serialize"):
+        # Convert first page of DataFrame to JSON
+        limit = page_size()
+        df_json = rows_json(df, 0, limit)
+
+        if profiles is None:
+            with instrumentation.stage("serialize:profile"):
+                profiles = cp.profile_dataframe(df)
+
+        # Generate columns definition
+        columns_def = [
+            {
+                "field": col,
+                "df_type": str(dt),
+                "width": profiles[col]["width"],
+                "profile": {k: v for k, v in profiles[col].items() if k != "width"},
+            }
+            for col, dt in df.dtypes.items()
+        ]
+
+        response = {
+            "dataset_id": dataset_id,
+            "partial": partial,
+            "columns_def": columns_def,
+            "total_rows": len(df) if total_rows is None else total_rows,
+            "offset": 0,
+            "limit": limit,
+            "data": df_json,
+        }
+        if memory:
+            response["memory"] = memory
+        return response
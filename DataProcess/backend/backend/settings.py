@@ -124,7 +124,61 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded DataFrames are stored as Arrow IPC files under MEDIA_ROOT/dataframes
+MEDIA_ROOT = BASE_DIR / "mediafiles"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# DataProcess type inference engine of apiapp.infer_data_types:
+# 'classifier' (default), 'cascade' or 'sample' (decides on a sample, fastest on large files)
+INFERENCE_ENGINE = "classifier"
+# worker processes inferring columns of large frames in parallel, 1 - serial
+INFERENCE_WORKERS = 1
+# converted frames use memory-compact dtypes (smallest numeric widths, nullable integers,
+# Arrow-backed strings), also enabled per upload with process-file/?compact=1
+COMPACT_DTYPES = False
+
+# DataProcess CSV ingestion
+# uploads larger than this (bytes) are read, inferred and converted in chunks
+STREAM_INGEST_THRESHOLD = 50 * 1024 * 1024
+# rows per chunk of streaming ingestion
+STREAM_INGEST_CHUNK_ROWS = 100_000
+# uploads larger than this (bytes) are converted out of core: chunk by chunk into a column
+# store on disk, requests read only the columns and rows they need (also ?out_of_core=1)
+OUT_OF_CORE_THRESHOLD = 1024 * 1024 * 1024
+
+# DataProcess datasets
+# uploads kept on disk, the oldest are deleted
+DATASET_MAX_STORED = 100
+# in-process LRU cache of raw upload frames: total size and seconds since last use
+DATASET_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DATASET_CACHE_TTL = 60 * 60
+
+# rows returned with process-file/apply-conversion and by default per datasets/<id>/rows/ page
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+
+# background process-file jobs (?async=1): worker threads and seconds finished jobs are kept
+JOB_WORKERS = 2
+JOB_TTL = 60 * 60
+
+# conversion results by upload content hash, a repeated upload skips parsing and inference
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_TTL = 24 * 60 * 60
+
+# stages of process-file/apply-conversion requests are logged as JSON lines, see api/metrics/
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "apiapp.instrumentation": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# rows serialized at once by streaming NDJSON responses (Accept: application/x-ndjson)
+NDJSON_CHUNK_ROWS = 10_000
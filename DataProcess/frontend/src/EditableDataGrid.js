@@ -1,16 +1,36 @@
-import React, { useState } from 'react'
+import React, { useState, useEffect } from 'react'
 import { DataGrid } from '@mui/x-data-grid';
 import {dateFormatter, durationFormatter, numberFormatter, complexFormatter, stringFormatter} from './DataGridUtils';
 
 
-const EditableDataGrid = ({ headers, data, onApply }) => {
+// rows per page, the server sends the first page with the data
+const PAGE_SIZE = 100;
+
+// Generate unique id based on row position in dataset to fulfil DataGrid requirment
+const withIds = (data, offset) => data.map((row, index) => ({ ...row, id: offset + index + 1 }));
+
+const EditableDataGrid = ({ headers, data, totalRows, onPageChange, onApply }) => {
   
   const [columns, setColumns] = useState(headers);
-  const [rows, setRows] = useState(data.map((row, index) => ({
-    ...row,
-    // Generate unique id based on index to fulfil DataGrid requirment 
-    id: ++index,
-  })));
+  const [rows, setRows] = useState(withIds(data, 0));
+  // rows are paged on server, only the current page is kept
+  const [paginationModel, setPaginationModel] = useState({ page: 0, pageSize: PAGE_SIZE });
+  const [loading, setLoading] = useState(false);
+
+  useEffect(() => {
+    const { page, pageSize } = paginationModel;
+    if (page === 0 && pageSize === PAGE_SIZE) {
+      setRows(withIds(data, 0));
+      return;
+    }
+    let active = true; // ignore responses of pages already left
+    setLoading(true);
+    onPageChange(page * pageSize, pageSize)
+      .then(pageRows => active && setRows(withIds(pageRows, page * pageSize)))
+      .catch(console.error)
+      .finally(() => active && setLoading(false));
+    return () => { active = false; };
+  }, [paginationModel]);
 
   //flag if any field type changed to enable 'Apply' button
   const [typeChanged, setTypeChanged] = useState(false);
@@ -110,6 +130,12 @@ const EditableDataGrid = ({ headers, data, onApply }) => {
         // Key changes when column's type changed (newType), in SetColumns, it forces DataGrid rerender
         key={JSON.stringify(columns)} 
         rows={rows}
+        rowCount={totalRows}
+        loading={loading}
+        paginationMode="server"
+        paginationModel={paginationModel}
+        onPaginationModelChange={setPaginationModel}
+        pageSizeOptions={[25, 50, PAGE_SIZE]}
         columns={columns.map((column) => ({
           ...column,
           renderHeader: renderCustomHeader,
@@ -1,8 +1,12 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import EditableDataGrid from './EditableDataGrid';
 import {durationFormatter, complexFormatter, numberFormatter, dateFormatter} from './DataGridUtils';
 
+// files larger than this are processed as background jobs on server, progress is polled
+const ASYNC_UPLOAD_SIZE = 10 * 1024 * 1024;
+const POLL_INTERVAL_MS = 500;
+
 const FileUpload = () => {
 
   const test_csv = 
@@ -23,6 +27,12 @@ const FileUpload = () => {
   const [htmlErrorMessage, setHtmlErrorMessage] = useState('');
   const [responseData, setResponseData] = useState(null);
   const [columnsDef, setColumnsDef] = useState(null);
+  // number of rows of the dataset on server, DataGrid shows them page by page
+  const [totalRows, setTotalRows] = useState(0);
+  // id of the uploaded dataset on server, conversions are applied to it
+  const [datasetId, setDatasetId] = useState(null);
+  // last shown columns and first page rows, partial conversion responses are merged into them
+  const lastResult = useRef({ columns: [], rows: [] });
   
   useEffect(() => {
     handleUpload(); // For test purpose to load Call handleUpload function when the component mounts
@@ -49,7 +59,9 @@ const FileUpload = () => {
   }  
 
   const mapColumnType = (pandasType) => {
-    if (pandasType.startsWith('int') || pandasType.startsWith('uint') || pandasType.startsWith('float')) {
+    // compact dtypes include nullable 'Int64', 'UInt8' ...
+    const numericType = pandasType.toLowerCase();
+    if (numericType.startsWith('int') || numericType.startsWith('uint') || numericType.startsWith('float')) {
       return 'number'; // Map all integer and float types to 'number'
     } else if (pandasType.startsWith('complex')) {
       return 'complex'; 
@@ -82,6 +94,7 @@ const FileUpload = () => {
       'http://localhost:8000/api/process-file/',
       formData,
       {
+        params: selectedFile.size > ASYNC_UPLOAD_SIZE ? { async: 1 } : {},
         headers: {
           'Content-Type': 'multipart/form-data',
         },
@@ -96,11 +109,39 @@ const FileUpload = () => {
         },
       }
     )
+     // 202 Accepted: the file is processed in background job
+     .then(response => response.status === 202 ? pollJob(response.data.job_id) : response)
      .then(handleResponse)
      .catch(handleException)
      .finally(() => setIsUploading(false));
   };
 
+  // polls background job status until it's done, resolves to the process-file response
+  const pollJob = async (jobId) => {
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+      // rest api url hardcoded
+      const response = await axios.get(`http://localhost:8000/api/jobs/${jobId}/`);
+      const job = response.data;
+      if (job.status === 'done')
+        return { ...response, data: job.result };
+      if (job.status === 'failed') {
+        const error = new Error(job.error);
+        error.response = { data: { error: job.error } };
+        throw error;
+      }
+      setUploadMessage(jobMessage(job.stages));
+    }
+  };
+
+  const jobMessage = (stages) => {
+    const [name, stage] = Object.entries(stages).find(([, stage]) => stage.status === 'running') || [];
+    if (!name)
+      return 'Processing file on server...';
+    const count = stage.total ? `${stage.done}/${stage.total}` : stage.done || '';
+    return `Processing file on server: ${name} ${count}`;
+  };
+
   const handleException = ex => {
     console.error(ex);
     if (ex.response){
@@ -135,18 +176,48 @@ const FileUpload = () => {
       valueFormatter: applyFormatter(mapColumnType(item.df_type)),
     }));
 
-    // Convert date fields (json) to Date objects to be presented in DataGrid
-    data.forEach(row => {
-      columns_def_mapped.forEach(column => {
+    parseDates(data, columns_def_mapped);
+
+    let columns = columns_def_mapped;
+    let rows = data;
+    if (response.data.partial) {
+      // only columns with changed type were converted and sent, the others stay as they are
+      columns = lastResult.current.columns.map(
+        column => columns_def_mapped.find(item => item.field === column.field) || column
+      );
+      rows = lastResult.current.rows.map((row, index) => ({ ...row, ...data[index] }));
+    }
+    lastResult.current = { columns, rows };
+
+    setDatasetId(response.data.dataset_id);
+    setTotalRows(response.data.total_rows);
+    setColumnsDef(columns);
+    setResponseData(rows);
+    setUploadMessage('');
+  };
+
+  // Convert date fields (json) to Date objects to be presented in DataGrid
+  const parseDates = (rows, columns) => {
+    rows.forEach(row => {
+      columns.forEach(column => {
         if (column.type === 'date' && !!row[column.field]) {
           row[column.field] = new Date(row[column.field]);
         }
       });
     });
+  };
 
-    setColumnsDef(columns_def_mapped);
-    setResponseData(data);
-    setUploadMessage('');
+  // page change event from 'child' EditableDataGrid component
+  // get a window of converted dataset rows from server
+  const fetchPage = async (offset, limit) => {
+    const response = await axios.get(
+      // rest api url hardcoded
+      `http://localhost:8000/api/datasets/${datasetId}/rows/`,
+      { params: { offset, limit } }
+    );
+    const rows = JSON.parse(response.data.data);
+    parseDates(rows, columnsDef);
+    return rows;
   };
 
   // apply conversion event from 'child' EditableDataGrid component 
@@ -157,7 +228,7 @@ const FileUpload = () => {
     axios.post(
       // rest api url hardcoded
      'http://localhost:8000/api/apply-conversion/',
-      cols
+      { dataset_id: datasetId, col_def: cols }
    ).then(handleResponse)
     .catch(handleException)
     .finally(() => setIsUploading(false));
@@ -177,7 +248,8 @@ const FileUpload = () => {
       {!!!errorMessage && !!!htmlErrorMessage && uploadMessage && <p>{uploadMessage}</p>}
 
       <div className='mt-3' style={{ height: '100%', width: '100%' }}>
-        { responseData && <EditableDataGrid headers={columnsDef} data={responseData} onApply={handleApplyConversion}/> }
+        { responseData && <EditableDataGrid headers={columnsDef} data={responseData} totalRows={totalRows}
+                                          onPageChange={fetchPage} onApply={handleApplyConversion}/> }
       </div>
     </div>
   );